@@ -25,8 +25,17 @@ class Settings(BaseSettings):
     TEMPERATURE: float = 0.7
     MAX_TOKENS: int = 400
     
+    # 모델 캐스케이드 (간단한 문서 기반 질문은 SEARCH_MODEL로 답변)
+    CASCADE_ENABLED: bool = False
+    CASCADE_SIMPLE_MAX_CHARS: int = 40
+    CASCADE_MIN_KEYWORD_COVERAGE: float = 0.6
+    CASCADE_COMPLEX_KEYWORDS: list[str] = ["비교", "차이", "계산", "동시에", "각각", "여러", "모두", "예외", "중복"]
+    
     # Embedding 설정
     EMBEDDING_MODEL: str = "solar-embedding-1-large"
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5
     
     # 검색 설정
     TOP_K_VECTOR: int = 2
@@ -34,18 +43,97 @@ class Settings(BaseSettings):
     MAX_DOCS_LIMIT: int = 8
     MAX_CONTEXT_DOCS: int = 4
     CONTEXT_CHAR_LIMIT: int = 600
+    BM25_TOKENIZER: str = "whitespace"  # whitespace(기본), morpheme(조사 제거), ngram(문자 2-gram) - 평가에서 나아진 것이 확인되면 변경
+    
+    # 검색 결과 캐시 ((질문, 선택 법률, 검색 설정, 인덱스 세대) -> 문서 ID와 점수, 인덱스가 다시 로드되면 무효화)
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = 5000
+    RETRIEVAL_CACHE_TTL_SECONDS: int | None = None
+    
+    # 근사 중복 청크 제거 (SimHash 해밍 거리 기준, 인덱스 빌드와 검색 결과 병합에 적용)
+    DEDUP_ENABLED: bool = True
+    DEDUP_MAX_HAMMING: int = 3
     
     # 병렬 처리 설정
     MAX_WORKERS: int = 3
     
+    # 스트리밍 중 클라이언트 연결 종료 확인 간격 (청크마다 확인하지 않음)
+    DISCONNECT_POLL_INTERVAL_SECONDS: float = 0.25
+    
+    # 업스트림 호출 보호 (요청 데드라인, 헤지 요청, 서킷 브레이커)
+    REQUEST_DEADLINE_SECONDS: float = 30.0
+    # 단계별 예산 = 전체 예산 x 비율 (남은 시간을 넘지 않음)
+    STAGE_BUDGET_RATIOS: dict[str, float] = {
+        "law_selection": 0.2,
+        "embedding": 0.1,
+        "relevance": 0.15,
+        "web_search": 0.25,
+    }
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_RETRIES: int = 1
+    EMBEDDING_TIMEOUT_SECONDS: float = 5.0
+    HEDGE_ENABLED: bool = True
+    HEDGE_PERCENTILE: float = 95
+    HEDGE_MIN_SAMPLES: int = 20
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    
+    # 관리자 프로파일링 (ADMIN_TOKEN이 없으면 /admin 엔드포인트 비활성화)
+    ADMIN_TOKEN: str | None = None
+    SLOW_REQUEST_THRESHOLD_MS: float = 5000
+    SLOW_TRACE_BUFFER_SIZE: int = 100
+    PROFILE_MAX_SECONDS: float = 60
+
+    # 트래픽 캡처/재생 (개인정보를 가린 요청과 업스트림 응답을 JSONL로 기록, REPLAY_LOG_PATH를 주면 재생 모드)
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_PATH: str = "./capture/traffic.jsonl"
+    CAPTURE_SAMPLE_RATE: float = 1.0
+    REPLAY_LOG_PATH: str | None = None
+    REPLAY_UPSTREAM_LATENCY: bool = False  # 재생 시 기록된 업스트림 지연시간만큼 기다림
+    
+    # 시작 설정 (독립적인 초기화 단계를 동시에 실행)
+    STARTUP_CONCURRENT_INIT: bool = True
+    
+    # 워밍업 설정 (시작 시 합성 질의로 검색 경로와 업스트림 커넥션을 미리 준비)
+    WARMUP_ENABLED: bool = True
+    WARMUP_QUERIES: list[str] = ["종합소득세 세율은 얼마인가요?", "부가가치세 신고 기한은 언제인가요?"]
+    
+    # 서버 설정 (python -m app.serve)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0  # 0이면 CPU 코어 수
+    SERVER_MAX_REQUESTS: int = 5000  # 워커당 처리 요청 수를 넘으면 교체
+    SERVER_MAX_REQUESTS_JITTER: int = 500
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_TIMEOUT: int = 120
+    
+    # 배치 질의 설정 (/ask/batch)
+    BATCH_MAX_QUESTIONS: int = 500
+    BATCH_MAX_CONCURRENCY: int = 8
+    
     # 웹 검색 설정
     TAVILY_MAX_RESULTS: int = 3
     TAVILY_SEARCH_DEPTH: str = "basic"
+    WEB_SEARCH_CACHE_MAX_ENTRIES: int = 1000
+    WEB_SEARCH_CACHE_TTL_SECONDS: int = 60 * 60 * 6
+    WEB_SEARCH_CACHE_STALE_SECONDS: int = 60 * 60 * 24  # TTL 이후 이 시간 동안은 기존 결과를 주고 백그라운드 갱신
+    WEB_SEARCH_CACHE_DB_PATH: str | None = None  # 지정하면 디스크에도 캐시
     
     # 앙상블 가중치
     VECTOR_WEIGHT: float = 0.6
     BM25_WEIGHT: float = 0.4
     
+    # 세션 설정
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_TTL_SECONDS: int = 60 * 60 * 24
+    SESSION_HISTORY_MESSAGES: int = 6
+    SESSION_DB_PATH: str | None = None  # 지정하면 SQLite에 세션을 영속화
+    
+    # 요약 설정 (요약되지 않은 메시지가 기준을 넘으면 백그라운드 요약 시작)
+    SUMMARY_TRIGGER_MESSAGES: int = 6
+    SUMMARY_TRIGGER_TOKENS: int = 1500
+    SUMMARY_MAX_ENTRIES: int = 10000
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
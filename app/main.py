@@ -1,17 +1,19 @@
 """
 FastAPI 메인 애플리케이션
 """
+import asyncio
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from app.routes import health_router, rag_router
-from app.services.retriever import initialize_retriever
-from app.services.generator import initialize_llm
-from app.services.workflow import initialize_workflow
-from app.services.summarization import initialize_summary_llm
+from app.routes import health_router, rag_router, session_router, admin_router
+from app.services.startup import initialize_services, log_startup_profile
+from app.services.readiness import run_warmup
+from app.services.tracing import SlowRequestTraceMiddleware
+from app.services.capture import TrafficCaptureMiddleware
 
 # 환경 변수 로드
 load_dotenv()
@@ -22,27 +24,26 @@ async def lifespan(app: FastAPI):
     """
     앱 시작/종료 시 실행되는 함수
     """
-    # 시작 시 초기화
+    # 시작 시 초기화 (pre-fork 서버에서는 워커마다 실행됨)
     print("\n" + "="*60)
-    print("Tax RAG API 초기화 시작")
+    print(f"Tax RAG API 초기화 시작 (pid={os.getpid()})")
     print("="*60 + "\n")
 
-    initialize_summary_llm()
-
     try:
-        # 1. 검색 시스템 초기화 (벡터스토어, BM25)
-        initialize_retriever()
-        
-        # 2. LLM 초기화 (반드시 retriever_chain 전에)
-        initialize_llm()
+        # 1. 벡터스토어, BM25, LLM 클라이언트, 웹 검색 도구, 그래프를 동시에 초기화
+        # 2. LLM 의존 체인 초기화 (법률 선택, 관련성 체크)
+        initialize_services()
         
-        # 3. 워크플로우 초기화 (LLM 의존)
-        initialize_workflow()
+        # 3. import/초기화 단계별 소요 시간
+        log_startup_profile()
         
         print("="*60)
-        print("✅ Tax RAG API 준비 완료!")
+        print("✅ Tax RAG API 초기화 완료! (워밍업 후 /health/ready 응답)")
         print("="*60 + "\n")
         
+        # 4. 워밍업 (liveness는 바로 응답하고, readiness는 워밍업이 끝난 뒤 true)
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(run_warmup))
+        
     except Exception as e:
         print(f"\n❌ 초기화 실패: {e}\n")
         import traceback
@@ -73,10 +74,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 느린 요청 단계별 추적 (/admin/traces)
+app.add_middleware(SlowRequestTraceMiddleware)
+
+# 트래픽 캡처/재생 (CAPTURE_ENABLED, REPLAY_LOG_PATH)
+app.add_middleware(TrafficCaptureMiddleware)
+
 
 # 라우터 등록
 app.include_router(health_router, tags=["Health"])
 app.include_router(rag_router, tags=["RAG"])
+app.include_router(session_router, tags=["Session"])
+app.include_router(admin_router, tags=["Admin"])
 
 
 # 루트 엔드포인트
@@ -3,6 +3,8 @@
 """
 from .health import router as health_router
 from .rag import router as rag_router
+from .session import router as session_router
+from .admin import router as admin_router
 
 
-__all__ = ["health_router", "rag_router"]
\ No newline at end of file
+__all__ = ["health_router", "rag_router", "session_router", "admin_router"]
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+관리자 전용 프로파일링/통계 엔드포인트
+
+ADMIN_TOKEN이 설정된 경우에만 활성화되며, X-Admin-Token 헤더로 인증합니다.
+"""
+import asyncio
+import os
+import secrets
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.schemas import CascadeStatsResponse, SlowTraceListResponse
+from app.services import cascade
+from app.services.profiler import ProfilerBusyError, sample_cpu_profile
+from app.services.tracing import slow_traces
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="관리자 기능이 비활성화되어 있습니다.")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="관리자 토큰이 올바르지 않습니다.")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/traces", response_model=SlowTraceListResponse)
+async def get_slow_traces(limit: int = Query(default=20, ge=1, le=1000)) -> SlowTraceListResponse:
+    """
+    SLOW_REQUEST_THRESHOLD_MS를 넘긴 최근 요청의 단계별 추적 기록을 최신순으로 반환합니다.
+    (워커별 기록이므로 pre-fork 서버에서는 요청을 받은 워커의 기록만 보입니다)
+    """
+    traces = list(slow_traces)[-limit:]
+    return SlowTraceListResponse(
+        pid=os.getpid(),
+        threshold_ms=settings.SLOW_REQUEST_THRESHOLD_MS,
+        traces=[trace.to_dict() for trace in reversed(traces)]
+    )
+
+
+@router.get("/cascade", response_model=CascadeStatsResponse)
+async def get_cascade_stats(limit: int = Query(default=50, ge=1, le=1000)) -> CascadeStatsResponse:
+    """
+    답변 모델 캐스케이드의 선택 횟수, 결정 이유별 지연시간/답변 길이, 최근 결정을 반환합니다.
+    (워커별 기록이므로 pre-fork 서버에서는 요청을 받은 워커의 기록만 보입니다)
+    """
+    decisions = list(cascade.cascade_log)[-limit:]
+    return CascadeStatsResponse(
+        pid=os.getpid(),
+        enabled=settings.CASCADE_ENABLED,
+        counts=dict(cascade.cascade_stats),
+        by_reason=cascade.cascade_summary(),
+        decisions=list(reversed(decisions))
+    )
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def cpu_profile(
+    seconds: float = Query(default=10, gt=0),
+    interval_ms: float = Query(default=5, ge=1, le=1000)
+) -> PlainTextResponse:
+    """
+    이 워커의 CPU 프로파일을 seconds 동안 샘플링하여 collapsed stack 파일로 내려받습니다.
+
+    flamegraph.pl profile.collapsed > profile.svg 또는 speedscope에서 바로 열 수 있습니다.
+    """
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds는 최대 {settings.PROFILE_MAX_SECONDS}초입니다.")
+
+    try:
+        collapsed = await asyncio.to_thread(sample_cpu_profile, seconds, interval_ms)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    filename = f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+    return PlainTextResponse(
+        collapsed,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
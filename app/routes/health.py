@@ -2,17 +2,50 @@
 헬스체크 엔드포인트
 """
 from fastapi import APIRouter
-from app.schemas import HealthResponse
+from fastapi.responses import JSONResponse
+from app.schemas import HealthResponse, ReadinessResponse, StartupProfileResponse
+from app.services.readiness import subsystem_status, is_ready, warmup_state
+from app.services.startup import startup_profile
+from app.services.resilience import resilience_stats
 
 router = APIRouter()
 
 
 @router.get("/health", response_model=HealthResponse)
+@router.get("/health/live", response_model=HealthResponse)
 async def health() -> HealthResponse:
     """
-    서버 상태를 확인합니다.
+    서버 프로세스가 살아 있는지 확인합니다. (liveness)
     """
     return HealthResponse(
         status="ok",
         message="Tax RAG API is running"
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/health/ready", response_model=ReadinessResponse)
+async def ready():
+    """
+    요청을 받을 준비가 되었는지 확인합니다. (readiness)
+    
+    인덱스/LLM/그래프 초기화와 워밍업이 끝나기 전에는 503을 반환합니다.
+    """
+    response = ReadinessResponse(
+        ready=is_ready(),
+        subsystems=subsystem_status(),
+        warmup=warmup_state["status"],
+        warmup_ms=warmup_state["elapsed_ms"],
+        circuits=resilience_stats()
+    )
+    return JSONResponse(
+        status_code=200 if response.ready else 503,
+        content=response.model_dump()
+    )
+
+
+@router.get("/health/startup", response_model=StartupProfileResponse)
+async def startup() -> StartupProfileResponse:
+    """
+    시작 프로파일 (import 및 초기화 단계별 소요 시간)을 반환합니다.
+    """
+    return StartupProfileResponse(**startup_profile)
@@ -1,68 +1,263 @@
 """
 RAG 엔드포인트
 """
+import asyncio
+import json
+import threading
 import time
-from fastapi import APIRouter,HTTPException
+import uuid
+from fastapi import APIRouter,HTTPException,BackgroundTasks,Request
 from fastapi.responses import StreamingResponse
-from typing import AsyncGenerator
-from app.schemas import AskRequest, AskResponse,SummarizeResponse, SummarizeRequest
-from app.services.workflow import run_workflow, stream_workflow
-from app.services.summarization import generate_summary
+from starlette.background import BackgroundTask
+from typing import AsyncGenerator, List, Dict, Optional, Tuple
+from app.config import settings
+from app.schemas import AskRequest, AskResponse,SummarizeResponse, SummarizeRequest, SummaryJobResponse, BatchAskRequest, BatchAskResult
+from app.services.workflow import run_workflow, stream_workflow, stream_workflow_events, run_batch_workflow
+from app.services import summarization
+from app.services import session as session_service
+from app.services.tracing import annotate_trace
+from app.services.capture import record_context
 router = APIRouter()
 
 
+def resolve_context(req: AskRequest) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    """
+    session_id가 있으면 서버에 저장된 대화 내역/요약을, 없으면 요청 값을 사용합니다.
+    세션 대화 내역은 복사본을 넘겨 답변 생성 중 다른 요청의 append_turn과 섞이지 않게 합니다.
+    """
+    if not req.session_id:
+        return req.history, req.summary
+
+    session = session_service.session_store.get_or_create(req.session_id)
+    history = list(session.history)
+    record_context(history, session.summary)
+    return history, session.summary
+
+
+def annotate_request(req: AskRequest, history: Optional[List[Dict]], summary: Optional[str]):
+    """느린 요청 추적에 입력 크기를 남깁니다."""
+    annotate_trace(
+        question_chars=len(req.question),
+        history_messages=len(history or []),
+        summary_chars=len(summary or ""),
+        session=bool(req.session_id)
+    )
+
+
+async def record_session_turn(session_id: str, question: str, answer: str):
+    """답변을 세션에 추가하고, 밀려난 대화는 요약에 누적합니다."""
+    overflow = session_service.session_store.append_turn(session_id, question, answer)
+    if overflow:
+        session_service.summarize_session_overflow(session_id, overflow)
+
+
 @router.post("/summarize", response_model=SummarizeResponse)
 async def summarize_conversation(req: SummarizeRequest) -> SummarizeResponse:
     """
-    대화 내용을 요약합니다.
+    대화 내용을 백그라운드에서 누적 요약합니다.
+    
+    conversationId를 넘기면 즉시 응답하며, 요약 결과는 job_id로 조회하거나 스트리밍으로 받을 수 있습니다.
+    이때 이전 호출에서 이미 요약한 메시지는 다시 요약하지 않습니다.
+    conversationId가 없으면 이어서 누적할 대화가 없으므로 요약이 끝날 때까지 기다렸다가 결과를 돌려줍니다.
     
     스프링에서 호출 예시:
     POST /history/summarize
     {
+        "conversationId": "room-123",
         "messages": [
             {"role": "user", "content": "소득세율은?"},
             {"role": "assistant", "content": "소득세율은..."}
         ]
     }
     """
-    print("요약을 실시합니다!!!!!")
     if not req.messages:
         raise HTTPException(
             status_code=400,
             detail="messages 필드가 비어있습니다."
         )
     
-    summary = generate_summary(req.messages, req.previousSummary)
+    manager = summarization.summary_job_manager
+    conversation_id = req.conversationId or uuid.uuid4().hex
+    job, summary = manager.submit_transcript(
+        conversation_id,
+        req.messages,
+        req.previousSummary,
+        force=req.force or not req.conversationId
+    )
+    
+    if job is None:
+        return SummarizeResponse(summary=summary or "", message_count=len(req.messages), status="skipped")
+    
+    if req.wait or not req.conversationId:
+        await manager.wait(job)
+        summary = job.summary if job.status == "done" else summary
     
     return SummarizeResponse(
-        summary=summary,
-        message_count=len(req.messages)
+        summary=summary or "",
+        message_count=len(req.messages),
+        job_id=job.job_id,
+        status=job.status
+    )
+
+
+@router.get("/summarize/jobs/{job_id}", response_model=SummaryJobResponse)
+async def get_summary_job(job_id: str) -> SummaryJobResponse:
+    """요약 작업의 상태와 결과를 조회합니다."""
+    job = summarization.summary_job_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="요약 작업을 찾을 수 없습니다.")
+    
+    return SummaryJobResponse(
+        job_id=job.job_id,
+        conversation_id=job.conversation_id,
+        status=job.status,
+        summary=job.summary,
+        error=job.error
+    )
+
+
+@router.get("/summarize/jobs/{job_id}/stream")
+async def stream_summary_job(job_id: str) -> StreamingResponse:
+    """요약 작업의 결과를 생성되는 대로 스트리밍합니다."""
+    job = summarization.summary_job_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="요약 작업을 찾을 수 없습니다.")
+    
+    return StreamingResponse(
+        summarization.summary_job_manager.stream(job),
+        media_type="text/plain",
+        headers={"Cache-Control": "no-cache"},
     )
 
 @router.post("/ask", response_model=AskResponse)
-async def ask(req: AskRequest) -> AskResponse:
+async def ask(req: AskRequest, background_tasks: BackgroundTasks) -> AskResponse:
     start_time = time.time()
     
     # history, summary 전달
-    result = run_workflow(req.question, req.history, req.summary)
+    history, summary = resolve_context(req)
+    annotate_request(req, history, summary)
+    result = run_workflow(req.question, history, summary)
     
     elapsed_time = time.time() - start_time
     
+    # 응답을 보낸 뒤 세션에 기록 (요약이 필요하면 함께 수행)
+    if req.session_id:
+        background_tasks.add_task(record_session_turn, req.session_id, req.question, result['answer'])
+    
     return AskResponse(
         answer=result['answer'],
         elapsed_time=round(elapsed_time, 2),
-        is_web_search=result['is_web_search']
+        is_web_search=result['is_web_search'],
+        session_id=req.session_id
     )
 
 
+async def watch_disconnect(request: Request):
+    """DISCONNECT_POLL_INTERVAL_SECONDS마다 연결을 확인하다가 끊기면 반환합니다."""
+    while True:
+        await asyncio.sleep(settings.DISCONNECT_POLL_INTERVAL_SECONDS)
+        if await request.is_disconnected():
+            return
+
+
+async def stop_on_disconnect(request: Request, stream: AsyncGenerator) -> AsyncGenerator:
+    """
+    클라이언트 연결이 끊기면 스트림을 즉시 닫습니다.
+    
+    연결 확인은 별도 감시 태스크가 DISCONNECT_POLL_INTERVAL_SECONDS마다 하고, 다음 항목을 기다리는 것과
+    경쟁시킵니다. 그래서 검색이나 첫 토큰을 기다리느라 항목이 한동안 나오지 않아도 끊긴 즉시 멈춥니다.
+    기다리던 항목은 취소되고, 닫힌 스트림은 진행 중인 LLM 스트림과 검색 작업을 정리합니다.
+    (Starlette가 응답 태스크를 취소하는 경우에도 같은 경로로 정리됩니다.)
+    """
+    watcher = asyncio.create_task(watch_disconnect(request))
+    next_item = None
+    try:
+        while True:
+            next_item = asyncio.ensure_future(stream.__anext__())
+            await asyncio.wait([next_item, watcher], return_when=asyncio.FIRST_COMPLETED)
+            if not next_item.done():
+                break
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                break
+            yield item
+    finally:
+        watcher.cancel()
+        if next_item is not None and not next_item.done():
+            # 기다리던 항목을 취소하고 생성기가 정리를 마칠 때까지 기다린 뒤 닫습니다.
+            next_item.cancel()
+            await asyncio.gather(next_item, return_exceptions=True)
+        await stream.aclose()
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Server-Sent Events 형식으로 직렬화합니다."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.post("/ask/stream")
-async def ask_stream(req: AskRequest) -> StreamingResponse:
+async def ask_stream(req: AskRequest, request: Request) -> StreamingResponse:
+    """
+    답변을 스트리밍합니다.
+    
+    Accept: text/event-stream 헤더를 보내면 Server-Sent Events로 진행 상황
+    (start, laws, references, web_search, token, done)을 함께 받을 수 있고,
+    그 외에는 기존처럼 답변 텍스트만 text/plain으로 스트리밍합니다.
+    """
+    history, summary = resolve_context(req)
+    annotate_request(req, history, summary)
+    answer_chunks = []
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+    
+    cancel_event = threading.Event()
+    
     async def plain_stream() -> AsyncGenerator[str, None]:
-        async for chunk in stream_workflow(req.question, req.history, req.summary):
+        chunks = stream_workflow(req.question, history, summary, cancel_event)
+        async for chunk in stop_on_disconnect(request, chunks):
+            answer_chunks.append(chunk)
             yield chunk
     
+    async def event_stream() -> AsyncGenerator[str, None]:
+        events = stream_workflow_events(req.question, history, summary, cancel_event)
+        async for event in stop_on_disconnect(request, events):
+            if event['event'] == 'token':
+                answer_chunks.append(event['data']['delta'])
+            yield format_sse(event['event'], event['data'])
+    
+    async def record_streamed_turn():
+        # 중간에 끊긴 답변은 세션에 남기지 않습니다.
+        if answer_chunks and not cancel_event.is_set():
+            await record_session_turn(req.session_id, req.question, "".join(answer_chunks))
+    
     return StreamingResponse(
-        plain_stream(),
-        media_type="text/plain",
+        event_stream() if use_sse else plain_stream(),
+        media_type="text/event-stream" if use_sse else "text/plain",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(record_streamed_turn) if req.session_id else None,
+    )
+
+
+@router.post("/ask/batch")
+async def ask_batch(req: BatchAskRequest) -> StreamingResponse:
+    """
+    여러 질문을 한 번에 처리합니다. (FAQ 사전 생성 등 대량 작업용)
+    
+    답변이 완료되는 순서대로 한 줄에 하나씩 NDJSON으로 내보내며,
+    각 결과의 index로 요청 순서를 복원할 수 있습니다.
+    """
+    if len(req.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"질문은 한 번에 최대 {settings.BATCH_MAX_QUESTIONS}개까지 요청할 수 있습니다."
+        )
+    
+    async def ndjson_stream() -> AsyncGenerator[str, None]:
+        async for result in run_batch_workflow(req.questions):
+            yield BatchAskResult(**result).model_dump_json() + "\n"
+    
+    return StreamingResponse(
+        ndjson_stream(),
+        media_type="application/x-ndjson",
         headers={"Cache-Control": "no-cache"},
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,43 @@
+"""
+대화 세션 엔드포인트
+"""
+from fastapi import APIRouter, HTTPException
+
+from app.schemas import SessionResponse
+from app.services import session as session_service
+
+router = APIRouter()
+
+
+@router.post("/sessions", response_model=SessionResponse)
+async def create_session() -> SessionResponse:
+    """
+    새 대화 세션을 만듭니다.
+
+    반환된 session_id를 /ask, /ask/stream 요청에 넣으면
+    history/summary를 매번 보내지 않아도 서버가 대화 맥락을 유지합니다.
+    """
+    session = session_service.session_store.create()
+    return SessionResponse(session_id=session.session_id)
+
+
+@router.get("/sessions/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str) -> SessionResponse:
+    """세션에 저장된 최근 대화와 요약을 조회합니다."""
+    session = session_service.session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다.")
+
+    return SessionResponse(
+        session_id=session.session_id,
+        history=session.history,
+        summary=session.summary
+    )
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """세션을 삭제합니다."""
+    if not session_service.session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다.")
+    return {"deleted": True}
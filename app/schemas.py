@@ -9,23 +9,85 @@ class HealthResponse(BaseModel):
     message: str = "Tax RAG API is running"
 
 
+class StartupProfileResponse(BaseModel):
+    imports: Dict[str, float] = Field(..., description="모듈별 첫 import 소요 시간 (ms)")
+    steps: Dict[str, float] = Field(..., description="초기화 단계별 소요 시간 (ms)")
+    total_ms: Optional[float] = None
+
+
+class SlowTraceListResponse(BaseModel):
+    pid: int
+    threshold_ms: float
+    traces: List[Dict] = Field(..., description="단계별 추적 기록 (최신순)")
+
+
+class CascadeStatsResponse(BaseModel):
+    pid: int
+    enabled: bool
+    counts: Dict[str, int] = Field(..., description="모델별 선택 횟수 (main, light)")
+    by_reason: Dict[str, Dict] = Field(..., description="모델:결정 이유별 건수, 평균 지연시간, 평균 답변 길이 (최근 기록 기준)")
+    decisions: List[Dict] = Field(..., description="최근 라우팅 결정과 실제 지연시간 (최신순)")
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    subsystems: Dict[str, bool] = Field(..., description="하위 시스템별 초기화 여부")
+    warmup: str = Field(..., description="pending, running, done, failed, skipped")
+    warmup_ms: Optional[float] = None
+    circuits: Dict[str, Dict] = Field(default_factory=dict, description="업스트림별 서킷 상태 (열려 있어도 대체 경로로 응답)")
+
+
 class AskRequest(BaseModel):
     question: str
     history: Optional[List[Dict]] = None
     summary: Optional[str] = None
+    session_id: Optional[str] = Field(None, description="지정하면 서버에 저장된 대화 내역과 요약을 사용")
 
 
 class AskResponse(BaseModel):
     answer: str
     elapsed_time: float
     is_web_search: bool = False
+    session_id: Optional[str] = None
+
+
+class BatchAskRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, description="한 번에 처리할 질문 리스트")
+
+
+class BatchAskResult(BaseModel):
+    index: int = Field(..., description="요청 questions 내 순서")
+    question: str
+    answer: Optional[str] = None
+    is_web_search: bool = False
+    elapsed_time: float = Field(..., description="배치 시작부터 이 답변 완료까지 걸린 시간")
+    error: Optional[str] = None
 
 
 class SummarizeRequest(BaseModel):
     messages: List[Dict] = Field(..., description="요약할 대화 메시지 리스트")
     previousSummary: Optional[str] = Field(None, description="이전 요약 내용")
+    conversationId: Optional[str] = Field(None, description="대화 ID (지정하면 이미 요약한 메시지는 건너뜀)")
+    wait: bool = Field(False, description="true면 요약이 끝날 때까지 기다렸다가 응답 (conversationId가 없으면 항상 기다림)")
+    force: bool = Field(False, description="true면 메시지/토큰 기준과 관계없이 요약 시작")
 
 
 class SummarizeResponse(BaseModel):
-    summary: str
-    message_count: int
\ No newline at end of file
+    summary: str = Field(..., description="현재까지 완료된 요약 (wait=true면 이번 요약 결과, 아직 없으면 빈 문자열)")
+    message_count: int
+    job_id: Optional[str] = None
+    status: str = Field("done", description="pending, running, done, failed, skipped")
+
+
+class SummaryJobResponse(BaseModel):
+    job_id: str
+    conversation_id: str
+    status: str
+    summary: Optional[str] = None
+    error: Optional[str] = None
+
+
+class SessionResponse(BaseModel):
+    session_id: str
+    history: List[Dict] = Field(default_factory=list, description="서버에 보관 중인 최근 대화")
+    summary: Optional[str] = None
@@ -0,0 +1,83 @@
+"""
+프로덕션 서버 실행 (pre-fork 멀티 프로세스)
+
+부모 프로세스가 BM25 인덱스를 한 번만 로드한 뒤 워커를 fork하므로
+워커들은 인덱스 메모리를 copy-on-write로 공유합니다.
+워커는 max_requests마다 교체되며, 새 워커도 부모에서 fork되어 인덱스를 다시 읽지 않습니다.
+
+실행:
+    python -m app.serve
+"""
+import gc
+import os
+
+from dotenv import load_dotenv
+from gunicorn.app.base import BaseApplication
+
+from app.config import settings
+
+
+def when_ready(server):
+    """워커를 fork하기 전에 부모 프로세스에서 인덱스를 로드합니다."""
+    from app.services.retriever import preload_indexes
+    from app.services.startup import preimport_modules
+
+    print(f"\n📦 [master {os.getpid()}] 공유 인덱스 로드 중...")
+    preimport_modules()
+    preload_indexes()
+
+    # 이후 생성되는 객체만 GC가 추적하도록 하여, GC가 공유 페이지를 건드려
+    # copy-on-write 복사가 일어나는 것을 막습니다.
+    gc.collect()
+    gc.freeze()
+    print(f"✅ [master {os.getpid()}] 공유 인덱스 준비 완료, 워커 {server.cfg.workers}개 시작\n")
+
+
+def post_fork(server, worker):
+    print(f"🚀 워커 시작 (pid={worker.pid})")
+
+
+def worker_exit(server, worker):
+    print(f"👋 워커 종료 (pid={worker.pid})")
+
+
+class PreforkServer(BaseApplication):
+    """gunicorn + uvicorn 워커 기반 pre-fork 서버"""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+        return app
+
+
+def main():
+    load_dotenv()
+
+    workers = settings.SERVER_WORKERS or os.cpu_count() or 1
+    options = {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": workers,
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        # 앱 모듈은 부모에서 import하되, lifespan(LLM 클라이언트 등)은 워커마다 실행됩니다.
+        "preload_app": True,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "timeout": settings.SERVER_TIMEOUT,
+        "when_ready": when_ready,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }
+    PreforkServer(options).run()
+
+
+if __name__ == "__main__":
+    main()
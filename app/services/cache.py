@@ -0,0 +1,201 @@
+"""
+공용 캐시 유틸 (LRU + TTL + 선택적 디스크 저장)
+"""
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키로 쓰기 위해 질문의 공백/대소문자/유니코드 표기를 정규화합니다."""
+    query = unicodedata.normalize("NFKC", query)
+    query = re.sub(r"\s+", " ", query).strip().lower()
+    return query.rstrip("?？.!")
+
+
+class TTLCache:
+    """
+    크기 제한(LRU)과 만료 시간(TTL)이 있는 스레드 안전 캐시
+
+    - ttl_seconds가 지나기 전의 값은 그대로 반환합니다.
+    - stale_seconds를 주면 TTL이 지난 뒤에도 그 시간 동안은 기존 값을 바로 반환하고
+      백그라운드에서 값을 새로 불러옵니다 (stale-while-revalidate).
+    - db_path를 주면 SQLite 디스크 계층에도 저장하여 재시작 후에도 재사용합니다.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        ttl_seconds: Optional[float] = None,
+        stale_seconds: float = 0,
+        db_path: Optional[str] = None
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresher = None
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def _table(self) -> str:
+        return re.sub(r"\W", "_", self.name)
+
+    # ---------- 내부 유틸 ----------
+    def _age_state(self, stored_at: float, now: float) -> str:
+        if self.ttl_seconds is None:
+            return "fresh"
+        age = now - stored_at
+        if age < self.ttl_seconds:
+            return "fresh"
+        if age < self.ttl_seconds + self.stale_seconds:
+            return "stale"
+        return "expired"
+
+    def _put_memory(self, key: Hashable, value: Any, stored_at: float):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_disk(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            f"SELECT value, stored_at FROM {self._table} WHERE key = ?", (str(key),)
+        ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def _store_disk(self, key: Hashable, value: Any, stored_at: float):
+        if self._db is None:
+            return
+        self._db.execute(
+            f"INSERT OR REPLACE INTO {self._table} (key, value, stored_at) VALUES (?, ?, ?)",
+            (str(key), pickle.dumps(value), stored_at)
+        )
+        self._db.commit()
+
+    def _lookup(self, key: Hashable, stale_is_hit: bool = False) -> Tuple[Any, str]:
+        """값과 상태(fresh, stale, miss)를 반환하고, 같은 잠금 안에서 적중/실패 횟수를 셉니다."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load_disk(key)
+                if entry is not None:
+                    self._put_memory(key, *entry)
+            state = "miss" if entry is None else self._age_state(entry[1], now)
+            if state == "expired":
+                self._entries.pop(key, None)
+                state = "miss"
+
+            if state == "miss":
+                self.misses += 1
+                return None, state
+            if state == "stale" and not stale_is_hit:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0], state
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], should_cache: Callable[[Any], bool]):
+        try:
+            value = loader()
+            if should_cache(value):
+                self.set(key, value)
+        except Exception as e:
+            print(f"⚠️ {self.name} 캐시 갱신 실패: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key: Hashable, loader: Callable[[], Any], should_cache: Callable[[Any], bool]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"{self._table}-refresh")
+        self._refresher.submit(self._refresh, key, loader, should_cache)
+
+    # ---------- 공개 API ----------
+    def get(self, key: Hashable) -> Optional[Any]:
+        """캐시된 값을 반환합니다. 없거나 만료되었으면 None을 반환합니다."""
+        value, _ = self._lookup(key, stale_is_hit=True)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        stored_at = time.time()
+        with self._lock:
+            self._put_memory(key, value, stored_at)
+            self._store_disk(key, value, stored_at)
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        should_cache: Callable[[Any], bool] = lambda value: value is not None
+    ) -> Any:
+        """캐시에 있으면 반환하고, 없으면 loader로 불러와 저장합니다."""
+        value, state = self._lookup(key)
+
+        if state == "fresh":
+            return value
+
+        if state == "stale":
+            self._schedule_refresh(key, loader, should_cache)
+            return value
+
+        value = loader()
+        if should_cache(value):
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """특정 키 또는 전체 캐시를 비웁니다."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                if self._db is not None:
+                    self._db.execute(f"DELETE FROM {self._table}")
+                    self._db.commit()
+            else:
+                self._entries.pop(key, None)
+                if self._db is not None:
+                    self._db.execute(f"DELETE FROM {self._table} WHERE key = ?", (str(key),))
+                    self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+            }
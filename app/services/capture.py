@@ -0,0 +1,344 @@
+"""
+트래픽 캡처 및 재생
+
+CAPTURE_ENABLED=true이면 /ask, /ask/stream, /summarize 요청을 개인정보를 가린 뒤
+검색 결정과 업스트림 응답(법률 선택, 임베딩, 관련성 체크, 웹 검색, 답변/요약 생성)과 함께
+CAPTURE_PATH에 JSONL로 한 줄씩 기록합니다.
+
+REPLAY_LOG_PATH를 지정해 서버를 띄우면 X-Replay-Id 헤더가 붙은 요청은 업스트림을 호출하지 않고
+기록된 응답을 돌려받습니다. 재생 도구는 app/services/replay.py를 참고하세요.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.config import settings
+from app.services.capture_log import REPLAY_HEADER, load_capture_log
+
+
+CAPTURED_PATHS = ("/ask", "/ask/stream", "/summarize")
+
+# 재생 중 기록에 없는 호출을 나타내는 값 (기록된 응답이 None일 수도 있으므로 별도 값 사용)
+NOT_RECORDED = object()
+
+_current_exchange: ContextVar[Optional["Exchange"]] = ContextVar("current_exchange", default=None)
+_write_lock = threading.Lock()
+_replay_records: Optional[Dict[str, dict]] = None
+_replay_lock = threading.Lock()
+_finishing_tasks = set()  # 저장을 미룬 기록 (태스크가 GC되지 않도록 참조 유지)
+
+
+# ============================================================
+# 개인정보 마스킹
+# ============================================================
+PII_PATTERNS = [
+    (re.compile(r"\d{6}\s*-\s*[1-4]\d{6}"), "<주민등록번호>"),
+    (re.compile(r"\d{3}-\d{2}-\d{5}"), "<사업자등록번호>"),
+    (re.compile(r"\d{4}[- ]\d{4}[- ]\d{4}[- ]\d{4}"), "<카드번호>"),
+    (re.compile(r"01[016789][- ]?\d{3,4}[- ]?\d{4}"), "<전화번호>"),
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "<이메일>"),
+]
+
+
+def sanitize_text(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return text
+    for pattern, replacement in PII_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _hash_id(value: Optional[str]) -> Optional[str]:
+    # 같은 대화끼리 묶을 수 있도록 원래 ID 대신 해시를 남깁니다.
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16] if value else value
+
+
+def _sanitize_messages(messages: Optional[List[Dict]]) -> Optional[List[Dict]]:
+    if messages is None:
+        return None
+    return [{**message, "content": sanitize_text(message.get("content"))} for message in messages]
+
+
+def _sanitize_value(value: Any) -> Any:
+    # 업스트림 응답(답변, 웹 검색 결과 등)도 질문의 개인정보를 인용할 수 있으므로 문자열마다 가립니다.
+    if isinstance(value, str):
+        return sanitize_text(value)
+    if isinstance(value, list):
+        return [_sanitize_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _sanitize_value(item) for key, item in value.items()}
+    return value
+
+
+def sanitize_payload(body: dict) -> dict:
+    """요청 본문의 자유 텍스트에서 개인정보를 가리고 세션/대화 ID는 해시로 바꿉니다."""
+    body = dict(body)
+    for key in ("question", "summary", "previousSummary"):
+        if key in body:
+            body[key] = sanitize_text(body[key])
+    for key in ("history", "messages"):
+        if key in body:
+            body[key] = _sanitize_messages(body[key])
+    for key in ("session_id", "conversationId"):
+        if key in body:
+            body[key] = _hash_id(body[key])
+    return body
+
+
+# ============================================================
+# 요청 단위 기록
+# ============================================================
+@dataclass
+class Exchange:
+    capture_id: str
+    path: str
+    started_at: float
+    replay: bool = False
+    accept: Optional[str] = None
+    request: Optional[dict] = None
+    upstream: Dict[str, List[dict]] = field(default_factory=lambda: defaultdict(list))
+    decisions: Dict[str, Any] = field(default_factory=dict)
+    context: Optional[dict] = None
+    status_code: Optional[int] = None
+    latency_ms: Optional[float] = None
+    completed_ms: Optional[float] = None
+    _cursor: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    _deferred: List[asyncio.Task] = field(default_factory=list)
+
+    def to_record(self) -> dict:
+        return {
+            "capture_id": self.capture_id,
+            "path": self.path,
+            "started_at": self.started_at,
+            "accept": self.accept,
+            "request": self.request,
+            "upstream": dict(self.upstream),
+            "decisions": self.decisions,
+            "context": self.context,
+            "status_code": self.status_code,
+            "latency_ms": self.latency_ms,
+            "completed_ms": self.completed_ms,
+        }
+
+
+def is_replaying() -> bool:
+    exchange = _current_exchange.get()
+    return exchange is not None and exchange.replay
+
+
+def record_upstream(name: str, response: Any, elapsed_seconds: float):
+    """캡처 중인 요청이면 업스트림 응답을 호출 순서대로 기록합니다."""
+    exchange = _current_exchange.get()
+    if exchange is not None and not exchange.replay:
+        exchange.upstream[name].append({"response": response, "ms": round(elapsed_seconds * 1000, 1)})
+
+
+def record_decision(**decisions):
+    """캡처 중인 요청이면 검색 결정(선택 법률, 검색된 문서 등)을 기록합니다."""
+    exchange = _current_exchange.get()
+    if exchange is not None and not exchange.replay:
+        exchange.decisions.update(decisions)
+
+
+def record_context(history: Optional[List[Dict]], summary: Optional[str]):
+    """
+    세션에서 불러온 대화 기록/요약을 기록합니다.
+    session_id는 해시로 바뀌어 재생 서버에서 같은 세션을 찾을 수 없으므로, 재생 시에는 이 값을 요청에 직접 넣습니다.
+    """
+    exchange = _current_exchange.get()
+    if exchange is not None and not exchange.replay:
+        exchange.context = {"history": list(history) if history is not None else None, "summary": summary}
+
+
+def defer_capture(task: asyncio.Task):
+    """
+    응답 이후에도 이어지는 작업(백그라운드 요약 등)이 끝날 때까지 기록 저장을 미룹니다.
+    (작업의 업스트림 응답과 완료 시간을 같은 기록에 남기기 위함)
+    """
+    exchange = _current_exchange.get()
+    if exchange is not None and not exchange.replay:
+        exchange._deferred.append(task)
+
+
+def _next_replayed(name: str) -> Optional[dict]:
+    exchange = _current_exchange.get()
+    if exchange is None or not exchange.replay:
+        return None
+    calls = exchange.upstream.get(name, [])
+    index = exchange._cursor[name]
+    if index >= len(calls):
+        return None
+    exchange._cursor[name] += 1
+    return calls[index]
+
+
+def replay_lookup(name: str) -> Any:
+    """재생 중이면 같은 이름의 다음 기록 응답을 반환합니다. 없으면 NOT_RECORDED"""
+    call = _next_replayed(name)
+    if call is None:
+        return NOT_RECORDED
+    if settings.REPLAY_UPSTREAM_LATENCY:
+        time.sleep(call["ms"] / 1000)
+    return call["response"]
+
+
+async def areplay_lookup(name: str) -> Any:
+    """replay_lookup의 비동기 버전 (기록된 지연을 이벤트 루프를 막지 않고 재현)"""
+    call = _next_replayed(name)
+    if call is None:
+        return NOT_RECORDED
+    if settings.REPLAY_UPSTREAM_LATENCY:
+        await asyncio.sleep(call["ms"] / 1000)
+    return call["response"]
+
+
+async def _paced_chunks(chunks: List[str], total_ms: float) -> AsyncIterator[str]:
+    interval = total_ms / 1000 / max(len(chunks), 1) if settings.REPLAY_UPSTREAM_LATENCY else 0
+    for chunk in chunks:
+        if interval:
+            await asyncio.sleep(interval)
+        yield chunk
+
+
+def replay_stream_lookup(name: str) -> Optional[AsyncIterator[str]]:
+    """
+    재생 중이면 기록된 스트리밍 응답 청크를 순서대로 내보내는 이터레이터를 반환합니다. 없으면 None
+    (REPLAY_UPSTREAM_LATENCY이면 기록된 전체 시간을 청크 사이에 나눠 기다립니다)
+    """
+    call = _next_replayed(name)
+    if call is None:
+        return None
+    return _paced_chunks(call["response"], call["ms"])
+
+
+# ============================================================
+# 기록 파일
+# ============================================================
+def _write_record(record: dict):
+    record["upstream"] = _sanitize_value(record["upstream"])
+    record["context"] = _sanitize_value(record["context"])
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    directory = os.path.dirname(settings.CAPTURE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 한 줄을 한 번의 write로 추가하므로 pre-fork 워커들이 같은 파일에 써도 줄이 섞이지 않습니다.
+    with _write_lock, open(settings.CAPTURE_PATH, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def _replay_record(capture_id: str) -> Optional[dict]:
+    global _replay_records
+    with _replay_lock:
+        if _replay_records is None:
+            _replay_records = {record["capture_id"]: record for record in load_capture_log(settings.REPLAY_LOG_PATH)}
+            print(f"▶️ 재생 기록 {len(_replay_records)}건 로드: {settings.REPLAY_LOG_PATH}")
+    return _replay_records.get(capture_id)
+
+
+# ============================================================
+# ASGI 미들웨어
+# ============================================================
+class TrafficCaptureMiddleware:
+    """
+    캡처 모드에서는 요청 본문과 업스트림 응답을 기록하고,
+    재생 모드에서는 X-Replay-Id에 해당하는 기록을 요청 컨텍스트에 올려 둡니다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in CAPTURED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        replay_id = dict(scope["headers"]).get(REPLAY_HEADER)
+        if replay_id and settings.REPLAY_LOG_PATH:
+            await self._replay(scope, receive, send, replay_id.decode())
+        elif settings.CAPTURE_ENABLED and random.random() < settings.CAPTURE_SAMPLE_RATE:
+            await self._capture(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _replay(self, scope, receive, send, replay_id: str):
+        record = _replay_record(replay_id)
+        if record is None:
+            print(f"⚠️ 재생 기록 없음: {replay_id} -> 업스트림 호출 없이 대체 경로 사용")
+            record = {"upstream": {}}
+        exchange = Exchange(
+            capture_id=replay_id,
+            path=scope["path"],
+            started_at=time.time(),
+            replay=True,
+            upstream=defaultdict(list, record["upstream"]),
+        )
+        token = _current_exchange.set(exchange)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_exchange.reset(token)
+
+    async def _capture(self, scope, receive, send):
+        accept = dict(scope["headers"]).get(b"accept")
+        exchange = Exchange(
+            capture_id=uuid.uuid4().hex,
+            path=scope["path"],
+            started_at=time.time(),
+            accept=accept.decode() if accept else None,
+        )
+        body = bytearray()
+        start_time = time.perf_counter()
+
+        async def capturing_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                body.extend(message.get("body", b""))
+            return message
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                exchange.status_code = message["status"]
+            await send(message)
+
+        token = _current_exchange.set(exchange)
+        try:
+            await self.app(scope, capturing_receive, capturing_send)
+        finally:
+            _current_exchange.reset(token)
+            exchange.latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
+            try:
+                exchange.request = sanitize_payload(json.loads(body or b"{}"))
+            except Exception as e:
+                print(f"⚠️ 트래픽 캡처 실패: {e}")
+            else:
+                if exchange._deferred:
+                    # 응답은 이미 보냈으므로 이어지는 작업은 연결을 붙잡지 않고 따로 기다립니다.
+                    task = asyncio.create_task(self._finish_deferred(exchange, start_time))
+                    _finishing_tasks.add(task)
+                    task.add_done_callback(_finishing_tasks.discard)
+                else:
+                    await self._save(exchange)
+
+    async def _finish_deferred(self, exchange: Exchange, start_time: float):
+        # 끝난 작업이 다음 작업을 이어서 시작할 수 있으므로 목록이 빌 때까지 기다립니다.
+        while exchange._deferred:
+            await asyncio.gather(*exchange._deferred.copy(), return_exceptions=True)
+            exchange._deferred = [task for task in exchange._deferred if not task.done()]
+        exchange.completed_ms = round((time.perf_counter() - start_time) * 1000, 1)
+        await self._save(exchange)
+
+    async def _save(self, exchange: Exchange):
+        try:
+            await asyncio.to_thread(_write_record, exchange.to_record())
+        except Exception as e:
+            print(f"⚠️ 트래픽 캡처 실패: {e}")
@@ -0,0 +1,18 @@
+"""
+캡처 기록 형식
+
+서버(capture.py)와 재생 도구(replay.py)가 함께 쓰는 값입니다.
+재생 도구는 API 키 없이도 실행되어야 하므로 이 모듈은 설정(app.config)에 의존하지 않습니다.
+"""
+import json
+from typing import List
+
+
+# 재생할 캡처 기록 ID를 담는 요청 헤더
+REPLAY_HEADER = b"x-replay-id"
+
+
+def load_capture_log(path: str) -> List[dict]:
+    """CAPTURE_PATH 형식의 JSONL 캡처 기록을 읽습니다."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
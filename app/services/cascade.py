@@ -0,0 +1,148 @@
+"""
+답변 모델 캐스케이드 (간단한 질문은 SEARCH_MODEL, 복잡한 질문은 MAIN_MODEL)
+"""
+import hashlib
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Optional
+
+from langchain_core.documents import Document
+
+from app.config import settings
+
+
+ARTICLE_PATTERN = re.compile(r"제\s*\d+\s*조(?:\s*의\s*\d+)?")
+FOLLOW_UP_WORDS = ("아까", "전에", "그거", "그것", "위에서", "앞에서")
+
+
+# ============================================================
+# 라우팅 결정
+# ============================================================
+@dataclass
+class CascadeDecision:
+    model: str
+    reason: str
+    features: Dict = field(default_factory=dict)
+
+    @property
+    def use_light_model(self) -> bool:
+        return self.model == settings.SEARCH_MODEL
+
+
+cascade_log = deque(maxlen=1000)
+cascade_stats = {"main": 0, "light": 0}
+
+
+def _normalize_article(article: str) -> str:
+    return re.sub(r"\s+", "", article)
+
+
+def _keywords(text: str) -> List[str]:
+    # 조사가 붙어 있어도 앞 두 글자 이상이 겹치면 같은 단어로 봅니다.
+    return [token[:2] for token in re.findall(r"[가-힣A-Za-z0-9]{2,}", text)]
+
+
+def _laws_in_context(context: List[Document]) -> List[str]:
+    laws = []
+    for doc in context:
+        source = doc.metadata.get("source", "") if isinstance(doc, Document) and doc.metadata else ""
+        law = os.path.splitext(os.path.basename(source))[0]
+        if law and law not in laws:
+            laws.append(law)
+    return laws
+
+
+def extract_features(query: str, context: List[Document], history: Optional[List[Dict]] = None) -> Dict:
+    """라우팅 판단에 쓰는 가벼운 로컬 특징을 계산합니다. (프롬프트에 들어가는 MAX_CONTEXT_DOCS개 문서 기준)"""
+    context = context[:settings.MAX_CONTEXT_DOCS]
+    top_content = context[0].page_content if context and isinstance(context[0], Document) else ""
+    keywords = _keywords(query)
+    covered = sum(1 for keyword in keywords if keyword in top_content)
+
+    query_articles = {_normalize_article(a) for a in ARTICLE_PATTERN.findall(query)}
+    context_articles = {
+        _normalize_article(a)
+        for doc in context if isinstance(doc, Document)
+        for a in ARTICLE_PATTERN.findall(doc.page_content)
+    }
+
+    return {
+        "question_chars": len(query),
+        "law_count": len(_laws_in_context(context)),
+        "keyword_coverage": round(covered / len(keywords), 2) if keywords else 0.0,
+        "article_hit": bool(query_articles & context_articles),
+        "complex_keyword": next((k for k in settings.CASCADE_COMPLEX_KEYWORDS if k in query), None),
+        "follow_up": bool(history) and any(word in query for word in FOLLOW_UP_WORDS),
+    }
+
+
+def choose_answer_model(
+    query: str,
+    context: List[Document],
+    history: Optional[List[Dict]] = None
+) -> CascadeDecision:
+    """
+    문서 기반 답변에 사용할 모델을 고릅니다.
+
+    복잡도 신호(여러 법률, 비교/계산 키워드, 이전 대화 참조)가 있으면 MAIN_MODEL,
+    조항 직접 매칭이나 짧은 질문 + 높은 키워드 커버리지면 SEARCH_MODEL을 사용합니다.
+    """
+    if not settings.CASCADE_ENABLED:
+        return CascadeDecision(settings.MAIN_MODEL, "cascade_disabled")
+
+    features = extract_features(query, context, history)
+
+    if features["law_count"] > 1:
+        decision = CascadeDecision(settings.MAIN_MODEL, "multi_law", features)
+    elif features["complex_keyword"]:
+        decision = CascadeDecision(settings.MAIN_MODEL, "complex_keyword", features)
+    elif features["follow_up"]:
+        decision = CascadeDecision(settings.MAIN_MODEL, "follow_up", features)
+    elif features["article_hit"]:
+        decision = CascadeDecision(settings.SEARCH_MODEL, "direct_article_hit", features)
+    elif (
+        features["question_chars"] <= settings.CASCADE_SIMPLE_MAX_CHARS
+        and features["keyword_coverage"] >= settings.CASCADE_MIN_KEYWORD_COVERAGE
+    ):
+        decision = CascadeDecision(settings.SEARCH_MODEL, "short_high_coverage", features)
+    else:
+        decision = CascadeDecision(settings.MAIN_MODEL, "default", features)
+
+    cascade_stats["light" if decision.use_light_model else "main"] += 1
+    print(f"🔀 모델 선택: {decision.model} ({decision.reason})")
+    return decision
+
+
+def record_cascade_result(decision: CascadeDecision, query: str, started_at: float, answer_chars: int):
+    """
+    결정과 실제 지연시간을 남겨 비용/지연/품질 비교에 사용합니다.
+    질문 원문은 남기지 않고 같은 질문끼리 묶을 수 있는 해시만 남깁니다. (길이는 features에 있음)
+    """
+    if decision.reason == "cascade_disabled":
+        return
+    cascade_log.append({
+        **asdict(decision),
+        "question_hash": hashlib.sha256(query.encode("utf-8")).hexdigest()[:16],
+        "latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+        "answer_chars": answer_chars,
+        "timestamp": time.time(),
+    })
+
+
+def cascade_summary() -> Dict[str, Dict]:
+    """최근 기록(cascade_log)을 모델/결정 이유별로 묶어 건수와 평균 지연시간, 평균 답변 길이를 계산합니다."""
+    groups: Dict[str, List[Dict]] = {}
+    for entry in cascade_log:
+        groups.setdefault(f"{entry['model']}:{entry['reason']}", []).append(entry)
+
+    return {
+        key: {
+            "count": len(entries),
+            "avg_latency_ms": round(sum(e["latency_ms"] for e in entries) / len(entries), 1),
+            "avg_answer_chars": round(sum(e["answer_chars"] for e in entries) / len(entries), 1),
+        }
+        for key, entries in groups.items()
+    }
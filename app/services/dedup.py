@@ -0,0 +1,174 @@
+"""
+근사 중복 청크 제거 (SimHash)
+
+corporation_* 컬렉션은 기본 법률 컬렉션과 내용이 많이 겹쳐, 두 법률이 함께 선택되면
+거의 같은 청크가 컨텍스트 자리를 차지합니다. 청크마다 64비트 SimHash 서명을 만들어 두고
+해밍 거리가 max_distance 이하인 청크를 같은 내용으로 봅니다.
+
+서명을 max_distance + 1개 밴드로 나누면 근사 중복은 적어도 한 밴드가 정확히 같으므로
+(비둘기집 원리) 후보마다 밴드 수만큼의 dict 조회로 중복 여부를 확인할 수 있습니다.
+"""
+import hashlib
+import os
+import pickle
+import re
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.startup import lazy_import
+from app.services.tokenizer import normalize_text
+
+
+SIGNATURE_BITS = 64
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# 청크 내용 -> 서명 (BM25 인덱스를 만들거나 로드할 때 미리 계산)
+signature_by_content: Dict[str, int] = {}
+_signature_lock = threading.Lock()
+
+
+# ============================================================
+# 서명 계산
+# ============================================================
+def _shingles(text: str, size: int) -> List[str]:
+    # 표(HTML)와 본문 텍스트로 같은 내용이 저장된 경우도 같게 보도록 태그와 공백을 제거합니다.
+    text = re.sub(r"\s+", "", normalize_text(HTML_TAG_PATTERN.sub(" ", text)))
+    if len(text) <= size:
+        return [text] if text else []
+    return [text[i:i + size] for i in range(len(text) - size + 1)]
+
+
+def _hash64(shingle: str) -> int:
+    # 내장 hash()는 프로세스마다 달라지므로 디스크에 저장할 수 있는 안정적인 해시를 씁니다.
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """문자 n-gram 기반 64비트 SimHash 서명을 계산합니다."""
+    shingles = set(_shingles(text, shingle_size))
+    if not shingles:
+        return 0
+
+    np = lazy_import("numpy")
+    hashes = np.array([_hash64(shingle) for shingle in shingles], dtype="<u8")
+    # (shingle 수, 64) 비트 행렬에서 비트별로 1이 과반이면 서명 비트를 1로 둡니다.
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def signature_of(doc: Document) -> int:
+    """미리 계산된 서명을 사용하고, 없으면 (Chroma에만 있는 청크 등) 새로 계산합니다."""
+    signature = signature_by_content.get(doc.page_content)
+    if signature is None:
+        signature = simhash(doc.page_content)
+    return signature
+
+
+# ============================================================
+# 근사 중복 인덱스
+# ============================================================
+class SimHashIndex:
+    """
+    서명을 밴드별 버킷에 넣어 두고 해밍 거리 max_distance 이내의 서명을 찾습니다.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self.band_count = max_distance + 1
+        self.band_bits = SIGNATURE_BITS // self.band_count
+        self._band_mask = (1 << self.band_bits) - 1
+        self._buckets: Dict[tuple, List[int]] = defaultdict(list)
+
+    def _bands(self, signature: int):
+        for band in range(self.band_count):
+            yield band, signature >> (band * self.band_bits) & self._band_mask
+
+    def find(self, signature: int) -> Optional[int]:
+        """근사 중복인 서명이 있으면 반환합니다."""
+        for key in self._bands(signature):
+            for candidate in self._buckets.get(key, ()):
+                if hamming_distance(signature, candidate) <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, signature: int):
+        for key in self._bands(signature):
+            self._buckets[key].append(signature)
+
+
+def collapse_near_duplicates(
+    docs: List[Document],
+    get_signature: Callable[[Document], int] = signature_of,
+    max_distance: Optional[int] = None
+) -> List[Document]:
+    """
+    순서를 유지하며 앞선 청크와 근사 중복인 청크를 제거합니다.
+    순위가 높은 청크를 남기려면 점수 순으로 정렬해서 넘겨야 합니다.
+    DEDUP_ENABLED가 꺼져 있으면 page_content가 완전히 같은 청크만 제거합니다.
+    """
+    if not settings.DEDUP_ENABLED:
+        seen = set()
+        unique_docs = []
+        for doc in docs:
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                unique_docs.append(doc)
+        return unique_docs
+
+    index = SimHashIndex(settings.DEDUP_MAX_HAMMING if max_distance is None else max_distance)
+    unique_docs = []
+    for doc in docs:
+        signature = get_signature(doc)
+        if index.find(signature) is not None:
+            continue
+        index.add(signature)
+        unique_docs.append(doc)
+    return unique_docs
+
+
+# ============================================================
+# 빌드 시 서명 계산 및 캐시
+# ============================================================
+def signature_cache_path(law_name: str) -> str:
+    return os.path.join(settings.BM25_CACHE_DIR, f"{law_name}_simhash.pkl")
+
+
+def _docs_digest(docs: List[Document]) -> str:
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(hashlib.sha256(doc.page_content.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def load_signatures(law_name: str, docs: List[Document]) -> List[int]:
+    """
+    법률 인덱스 청크의 서명을 캐시에서 읽거나 계산해 저장하고, 쿼리 시 조회용으로 등록합니다.
+    캐시는 청크 내용(순서 포함)의 해시가 같을 때만 재사용합니다. (청크가 바뀌면 새로 계산)
+    """
+    cache_path = signature_cache_path(law_name)
+    digest = _docs_digest(docs)
+    signatures = None
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if isinstance(cached, dict) and cached.get("digest") == digest:
+            signatures = cached["signatures"]
+
+    if signatures is None:
+        signatures = [simhash(doc.page_content) for doc in docs]
+        with open(cache_path, 'wb') as f:
+            pickle.dump({"digest": digest, "signatures": signatures}, f)
+
+    with _signature_lock:
+        for doc, signature in zip(docs, signatures):
+            signature_by_content[doc.page_content] = signature
+    return signatures
@@ -0,0 +1,128 @@
+"""
+쿼리 임베딩 마이크로 배치
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, List
+
+from langchain_core.embeddings import Embeddings
+
+if TYPE_CHECKING:
+    from langchain_upstage import UpstageEmbeddings
+
+
+# Upstage 임베딩 API가 한 번에 받을 수 있는 최대 입력 수
+EMBED_BATCH_SIZE = 100
+
+
+def embed_query_batch(embedding: "UpstageEmbeddings", queries: List[str]) -> List[List[float]]:
+    """여러 질문을 Upstage query 모델 배치 요청으로 임베딩합니다."""
+    if not queries:
+        return []
+
+    # UpstageEmbeddings.embed_documents는 passage 모델을 쓰므로 query 모델로 직접 호출합니다.
+    # 모델 이름과 추가 파라미터는 embed_query와 같도록 감싼 임베딩 객체의 설정을 그대로 씁니다.
+    model = embedding.model.replace("-query", "").replace("-passage", "")
+    params = {"model": f"{model}-query", **embedding.model_kwargs}
+    if embedding.dimensions is not None:
+        params["dimensions"] = embedding.dimensions
+    vectors = []
+    for i in range(0, len(queries), EMBED_BATCH_SIZE):
+        response = embedding.client.create(input=queries[i:i + EMBED_BATCH_SIZE], **params)
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return vectors
+
+
+class QueryEmbeddingBatcher(Embeddings):
+    """
+    동시에 들어온 쿼리 임베딩 요청을 모아 한 번의 배치 요청으로 보냅니다.
+
+    첫 요청이 들어온 뒤 max_wait_ms 동안(또는 max_batch_size개가 찰 때까지) 요청을 모으고,
+    같은 문장은 한 번만 임베딩하여 각 호출자에게 결과를 나눠 줍니다.
+    Chroma의 embedding_function으로 그대로 사용할 수 있습니다.
+    """
+
+    def __init__(
+        self,
+        embedding: "UpstageEmbeddings",
+        max_batch_size: int,
+        max_wait_ms: float,
+        max_concurrent_batches: int = 4
+    ):
+        self.embedding = embedding
+        self.max_batch_size = min(max_batch_size, EMBED_BATCH_SIZE)
+        self.max_wait_seconds = max_wait_ms / 1000
+
+        self.batches_sent = 0
+        self.queries_embedded = 0
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._sender = ThreadPoolExecutor(
+            max_workers=max_concurrent_batches,
+            thread_name_prefix="embedding-batch"
+        )
+        self._collector = threading.Thread(
+            target=self._collect_loop,
+            name="embedding-batcher",
+            daemon=True
+        )
+        self._collector.start()
+
+    # ---------- 내부 유틸 ----------
+    def _submit(self, text: str) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_seconds
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # 전송은 별도 스레드에서 하여 응답을 기다리는 동안에도 다음 배치를 모읍니다.
+            self._sender.submit(self._send, batch)
+
+    def _send(self, batch: List[tuple]):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = dict(zip(texts, embed_query_batch(self.embedding, texts)))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches_sent += 1
+        self.queries_embedded += len(batch)
+        for text, future in batch:
+            future.set_result(vectors[text])
+
+    # ---------- Embeddings 인터페이스 ----------
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._submit(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedding.aembed_documents(texts)
+
+    def stats(self) -> dict:
+        return {
+            "batches_sent": self.batches_sent,
+            "queries_embedded": self.queries_embedded,
+        }
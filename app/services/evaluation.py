@@ -0,0 +1,359 @@
+"""
+검색 품질 대비 지연시간 오프라인 평가
+
+라벨링된 질문 세트(질문, 정답 법률, 정답 조항)를 검색 단계에만 통과시키고
+검색 파라미터 조합별로 recall@k, MRR, 법률 선택 정확도, 지연시간, 프롬프트 토큰 수를 비교합니다.
+
+쿼리 임베딩과 법률 선택 결과는 캐시 파일에서 읽으므로 네트워크 없이 실행됩니다.
+캐시는 --record 옵션으로 한 번만 채우면 됩니다.
+
+실행 예시:
+    python -m app.services.evaluation --record
+    python -m app.services.evaluation --top-k-vector 1,2,3 --top-k-bm25 1,2 --vector-weight 0.5,0.6,0.7
+    python -m app.services.evaluation --max-context-docs 2,3,4,6 --context-char-limit 400,600
+"""
+import argparse
+import itertools
+import json
+import os
+import pickle
+import re
+import statistics
+import time
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.tokens import count_tokens
+
+
+DEFAULT_QUESTIONS_PATH = "./eval/retrieval_questions.jsonl"
+DEFAULT_CACHE_PATH = "./eval/retrieval_cache.pkl"
+
+
+# ============================================================
+# 평가 데이터 구조
+# ============================================================
+@dataclass
+class EvalQuestion:
+    question: str
+    expected_law: str
+    expected_article: Optional[str] = None
+
+
+@dataclass
+class EvalConfig:
+    top_k_vector: int
+    top_k_bm25: int
+    vector_weight: float
+    bm25_weight: float
+    max_docs_limit: int
+    max_context_docs: int
+    context_char_limit: int
+
+
+@dataclass
+class EvalResult:
+    config: EvalConfig
+    recall_at_1: float
+    recall_at_k: float  # k = config.max_context_docs (LLM에 전달되는 문서 수)
+    mrr: float
+    routing_accuracy: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    avg_prompt_tokens: float
+
+
+# ============================================================
+# 입출력
+# ============================================================
+def load_questions(path: str) -> List[EvalQuestion]:
+    """JSONL 형식의 라벨링된 질문 세트를 읽습니다."""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            questions.append(EvalQuestion(
+                question=row["question"],
+                expected_law=row["expected_law"],
+                expected_article=row.get("expected_article"),
+            ))
+    return questions
+
+
+def load_cache(path: str) -> Dict[str, Dict]:
+    """쿼리 임베딩/법률 선택 캐시를 읽습니다."""
+    if not os.path.exists(path):
+        return {"embeddings": {}, "routes": {}}
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_cache(path: str, cache: Dict[str, Dict]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(cache, f)
+
+
+def record_cache(questions: List[EvalQuestion], cache: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    캐시에 없는 질문의 임베딩과 법률 선택 결과를 실제 API로 채웁니다.
+    (네트워크가 필요한 유일한 단계)
+    """
+    from langchain_upstage import UpstageEmbeddings
+    from app.services.generator import initialize_llm
+    from app.services import retriever
+
+    initialize_llm()
+    retriever.setup_retriever_chain()
+    embedding = UpstageEmbeddings(model=settings.EMBEDDING_MODEL)
+
+    for item in questions:
+        if item.question not in cache["embeddings"]:
+            cache["embeddings"][item.question] = embedding.embed_query(item.question)
+        if item.question not in cache["routes"]:
+            result = retriever.retriever_chain.invoke({'query': item.question})
+            cache["routes"][item.question] = list(result.targets)
+        print(f"📝 기록 완료: {item.question}")
+
+    return cache
+
+
+# ============================================================
+# 지표 계산
+# ============================================================
+def _article_pattern(article: str) -> re.Pattern:
+    # "제55조"가 "제55조의2"나 "제550조"와 매칭되지 않도록 뒤쪽 경계를 둡니다.
+    normalized = re.sub(r"\s+", "", article)
+    return re.compile(re.escape(normalized) + r"(?![\d의])")
+
+
+def is_relevant(law_name: str, doc: Document, item: EvalQuestion) -> bool:
+    """문서가 정답 법률(및 조항)에 해당하는지 판단합니다."""
+    if law_name != item.expected_law:
+        return False
+    if not item.expected_article:
+        return True
+    content = re.sub(r"\s+", "", doc.page_content)
+    return bool(_article_pattern(item.expected_article).search(content))
+
+
+def first_relevant_rank(ranked: List[Tuple[str, Document]], item: EvalQuestion) -> Optional[int]:
+    for rank, (law_name, doc) in enumerate(ranked, start=1):
+        if is_relevant(law_name, doc, item):
+            return rank
+    return None
+
+
+def count_prompt_tokens(question: str, docs: List[Document], max_docs: int, char_limit: int) -> int:
+    """generate_answer와 동일한 방식으로 문서 기반 프롬프트를 만들어 토큰 수를 셉니다."""
+    from app.services.generator import TAX_LAW_PROMPT, limit_context
+
+    messages = TAX_LAW_PROMPT.format_messages(
+        question=question,
+        context=limit_context(docs, max_docs=max_docs, char_limit=char_limit),
+        history="",
+        summary=""
+    )
+    return count_tokens("\n".join(message.content for message in messages))
+
+
+# ============================================================
+# 평가 실행
+# ============================================================
+def retrieve_for_config(
+    item: EvalQuestion,
+    laws: List[str],
+    query_vector: List[float],
+    config: EvalConfig
+) -> List[Tuple[str, Document]]:
+    """retrieve_from_laws와 같은 방식(RRF 점수 정렬 후 근사 중복 제거, 개수 제한)으로 검색합니다."""
+    from app.services.retriever import collapse_ranked, rank_single_law_by_vector
+
+    scored_docs = []
+    law_by_doc = {}
+    for law_name in laws:
+        for doc, score in rank_single_law_by_vector(
+            law_name,
+            item.question,
+            query_vector,
+            top_k_vector=config.top_k_vector,
+            top_k_bm25=config.top_k_bm25,
+            vector_weight=config.vector_weight,
+            bm25_weight=config.bm25_weight,
+        ):
+            scored_docs.append((doc, score))
+            law_by_doc[id(doc)] = law_name
+
+    ranked = [(law_by_doc[id(doc)], doc) for doc in collapse_ranked(scored_docs)]
+    return ranked[:config.max_docs_limit]
+
+
+def evaluate_config(
+    questions: List[EvalQuestion],
+    cache: Dict[str, Dict],
+    config: EvalConfig,
+    oracle_routing: bool = False
+) -> EvalResult:
+    """하나의 파라미터 조합으로 질문 세트 전체를 평가합니다."""
+    recall_at_1 = 0
+    recall_at_k = 0
+    reciprocal_ranks = []
+    routing_hits = 0
+    latencies = []
+    prompt_tokens = []
+
+    for item in questions:
+        routed_laws = cache["routes"][item.question]
+        routing_hits += int(item.expected_law in routed_laws)
+        laws = [item.expected_law] if oracle_routing else routed_laws
+
+        start = time.perf_counter()
+        ranked = retrieve_for_config(item, laws, cache["embeddings"][item.question], config)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        # 실제로 LLM에 전달되는 문서는 max_context_docs개까지입니다.
+        rank = first_relevant_rank(ranked, item)
+        if rank is not None:
+            reciprocal_ranks.append(1 / rank)
+            recall_at_1 += int(rank == 1)
+            recall_at_k += int(rank <= config.max_context_docs)
+        else:
+            reciprocal_ranks.append(0.0)
+
+        prompt_tokens.append(count_prompt_tokens(
+            item.question, [doc for _, doc in ranked], config.max_context_docs, config.context_char_limit
+        ))
+
+    total = len(questions)
+    latencies.sort()
+    return EvalResult(
+        config=config,
+        recall_at_1=recall_at_1 / total,
+        recall_at_k=recall_at_k / total,
+        mrr=sum(reciprocal_ranks) / total,
+        routing_accuracy=routing_hits / total,
+        latency_p50_ms=statistics.median(latencies),
+        latency_p95_ms=latencies[min(total - 1, int(total * 0.95))],
+        avg_prompt_tokens=sum(prompt_tokens) / total,
+    )
+
+
+def build_configs(args: argparse.Namespace) -> List[EvalConfig]:
+    return [
+        EvalConfig(*values)
+        for values in itertools.product(
+            args.top_k_vector,
+            args.top_k_bm25,
+            args.vector_weight,
+            args.bm25_weight,
+            args.max_docs_limit,
+            args.max_context_docs,
+            args.context_char_limit,
+        )
+    ]
+
+
+def pick_recommended(results: List[EvalResult], max_recall_drop: float) -> EvalResult:
+    """최고 recall@k에서 허용 범위 안에 있는 설정 중 가장 빠르고 저렴한 설정을 고릅니다."""
+    best_recall = max(result.recall_at_k for result in results)
+    candidates = [r for r in results if r.recall_at_k >= best_recall - max_recall_drop]
+    return min(candidates, key=lambda r: (r.latency_p50_ms, r.avg_prompt_tokens))
+
+
+def print_report(results: List[EvalResult], recommended: EvalResult):
+    header = (
+        f"{'vec_k':>5} {'bm25_k':>6} {'vec_w':>5} {'bm25_w':>6} {'docs':>4} {'ctx':>3} {'chars':>5} | "
+        f"{'R@1':>5} {'R@ctx':>5} {'MRR':>5} {'route':>5} "
+        f"{'p50ms':>7} {'p95ms':>7} {'tokens':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in sorted(results, key=lambda r: (-r.recall_at_k, r.latency_p50_ms)):
+        c = r.config
+        mark = " ⭐" if r is recommended else ""
+        print(
+            f"{c.top_k_vector:>5} {c.top_k_bm25:>6} {c.vector_weight:>5.2f} {c.bm25_weight:>6.2f} "
+            f"{c.max_docs_limit:>4} {c.max_context_docs:>3} {c.context_char_limit:>5} | "
+            f"{r.recall_at_1:>5.2f} {r.recall_at_k:>5.2f} {r.mrr:>5.2f} {r.routing_accuracy:>5.2f} "
+            f"{r.latency_p50_ms:>7.1f} {r.latency_p95_ms:>7.1f} {r.avg_prompt_tokens:>7.0f}{mark}"
+        )
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def _float_list(value: str) -> List[float]:
+    return [float(v) for v in value.split(",")]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="검색 파라미터별 품질/지연시간 오프라인 평가")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS_PATH)
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--record", action="store_true", help="캐시에 없는 임베딩/법률 선택 결과를 API로 채웁니다")
+    parser.add_argument("--oracle-routing", action="store_true", help="법률 선택 대신 정답 법률로 검색합니다")
+    parser.add_argument("--top-k-vector", type=_int_list, default=[settings.TOP_K_VECTOR])
+    parser.add_argument("--top-k-bm25", type=_int_list, default=[settings.TOP_K_BM25])
+    parser.add_argument("--vector-weight", type=_float_list, default=[settings.VECTOR_WEIGHT])
+    parser.add_argument("--bm25-weight", type=_float_list, default=[settings.BM25_WEIGHT])
+    parser.add_argument("--max-docs-limit", type=_int_list, default=[settings.MAX_DOCS_LIMIT])
+    parser.add_argument("--max-context-docs", type=_int_list, default=[settings.MAX_CONTEXT_DOCS], help="LLM에 전달할 문서 수 (recall@k의 k)")
+    parser.add_argument("--context-char-limit", type=_int_list, default=[settings.CONTEXT_CHAR_LIMIT])
+    parser.add_argument("--max-recall-drop", type=float, default=0.0, help="추천 설정이 허용하는 recall@k 감소폭")
+    parser.add_argument("--output", help="결과를 JSON으로 저장할 경로")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.services.retriever import load_vector_stores, load_bm25_retrievers
+
+    load_dotenv()
+    args = parse_args(argv)
+    questions = load_questions(args.questions)
+    cache = load_cache(args.cache)
+
+    if args.record:
+        cache = record_cache(questions, cache)
+        save_cache(args.cache, cache)
+
+    missing = [
+        item.question for item in questions
+        if item.question not in cache["embeddings"] or item.question not in cache["routes"]
+    ]
+    if missing:
+        raise SystemExit(f"❌ 캐시에 없는 질문 {len(missing)}개가 있습니다. --record로 먼저 기록하세요.")
+
+    load_vector_stores()
+    load_bm25_retrievers()
+
+    configs = build_configs(args)
+    print(f"\n📊 질문 {len(questions)}개 x 설정 {len(configs)}개 평가\n")
+    results = [
+        evaluate_config(questions, cache, config, oracle_routing=args.oracle_routing)
+        for config in configs
+    ]
+
+    recommended = pick_recommended(results, args.max_recall_drop)
+    print_report(results, recommended)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"results": [asdict(r) for r in results], "recommended": asdict(recommended)},
+                f,
+                ensure_ascii=False,
+                indent=2
+            )
+        print(f"\n✅ 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
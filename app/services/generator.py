@@ -2,12 +2,17 @@
 """
 답변 생성 관련 로직
 """
-from typing import List,Dict
-from langchain_openai import ChatOpenAI
+import time
+from typing import List,Dict,Optional,Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
+from langchain_core.runnables import Runnable
 
 from app.config import settings
+from app.services.startup import lazy_import
+from app.services.tracing import trace_stage, count_trace
+from app.services.capture import NOT_RECORDED, is_replaying, record_upstream, replay_lookup, replay_stream_lookup
+from app.services.cascade import CascadeDecision, choose_answer_model, record_cascade_result
 
 
 # ============================================================
@@ -17,49 +22,73 @@ llm = None
 search_llm = None
 
 
+# 재생 중 기록에 없는 답변 생성 요청에 돌려줄 답변 (재생 중에는 LLM을 호출하지 않음)
+REPLAY_MISSING_ANSWER = "재생 기록에 답변이 없습니다."
+
+
 # ============================================================
 # 프롬프트 템플릿
 # ============================================================
-TAX_LAW_PROMPT = ChatPromptTemplate.from_messages([
-    ("system", """당신은 세법 전문가입니다. 주어진 법률 조항과 대화 맥락을 바탕으로 명확한 답변을 제공하세요.
-
-{summary}
-
-{history}
-
-답변 규칙:
-- 사용자가 "아까", "전에", "그거" 등 이전 대화를 언급하면 위의 대화 요약과 최근 대화 내역, 그리고 찾아온 문서를 바탕으로을 참고하여 답변하세요.
+# 고정된 지시문을 맨 앞에 두고, 바뀌는 내용은 변경 빈도가 낮은 순서
+# (대화 요약 -> 최근 대화 -> 참고 문서 -> 질문)로 뒤에 붙입니다.
+# 고정 지시문만으로는 OpenAI 프롬프트 캐싱 최소 길이(1024 토큰)에 못 미치므로(약 130 토큰)
+# 서로 다른 질문 사이에는 캐시가 적용되지 않습니다. 같은 세션의 후속 질문처럼
+# 지시문 + 요약 + 최근 대화가 같고 그 길이가 최소 길이를 넘을 때만 캐시될 수 있으며,
+# 실제 적용 여부는 prompt_cache_stats(cached_tokens)로 확인합니다.
+ANSWER_RULES = """답변 규칙:
+- 사용자가 "아까", "전에", "그거" 등 이전 대화를 언급하면 아래의 대화 요약과 최근 대화 내역, 그리고 찾아온 문서를 참고하여 답변하세요.
 - 이전에 나눴던 대화 내용과 연결지어 답변하세요
 - 결론 제시
 - 구체적인 관련 법률 조항 명시 (ex. 소득세법 제55조 2항)
 - 핵심 내용 간결하게 설명
-- 구체적 수치/기준 제시
+- 구체적 수치/기준 제시"""
 
-참고 문서:
-{context}"""),
-    ("user", "{question}")
-])
 
+def assemble_prompt(instruction: str, context_label: str) -> ChatPromptTemplate:
+    """고정 지시문을 앞에, 요청마다 바뀌는 내용을 뒤에 배치한 프롬프트를 만듭니다."""
+    return ChatPromptTemplate.from_messages([
+        ("system", f"{instruction}\n\n{ANSWER_RULES}"),
+        ("system", "{summary}\n\n{history}\n\n" + context_label + ":\n{context}"),
+        ("user", "{question}")
+    ])
 
-WEB_SEARCH_PROMPT = ChatPromptTemplate.from_messages([
-    ("system", """당신은 세금 질문에 답변하는 AI입니다. 웹 검색 결과와 대화 맥락을 바탕으로 답변하세요.
 
-{summary}
+TAX_LAW_PROMPT = assemble_prompt(
+    "당신은 세법 전문가입니다. 주어진 법률 조항과 대화 맥락을 바탕으로 명확한 답변을 제공하세요.",
+    "참고 문서"
+)
 
-{history}
 
-답변 규칙:
-- 사용자가 "아까", "전에", "그거" 등 이전 대화를 언급하면 위의 대화 요약과 최근 대화 내역, 그리고 찾아온 문서를 바탕으로을 참고하여 답변하세요.
-- 이전에 나눴던 대화 내용과 연결지어 답변하세요
-- 결론 제시
-- 구체적인 관련 법률 조항 명시 (ex. 소득세법 제55조 2항)
-- 핵심 내용 간결하게 설명
-- 구체적 수치/기준 제시
+WEB_SEARCH_PROMPT = assemble_prompt(
+    "당신은 세금 질문에 답변하는 AI입니다. 웹 검색 결과와 대화 맥락을 바탕으로 답변하세요.",
+    "검색 결과"
+)
+
+
+# ============================================================
+# 프롬프트 캐시 사용량
+# ============================================================
+prompt_cache_stats = {"calls": 0, "input_tokens": 0, "cached_tokens": 0}
+
+
+def record_prompt_usage(usage_metadata: Optional[dict]):
+    """OpenAI가 응답에 돌려준 입력/캐시 토큰 수를 누적 기록합니다."""
+    if not usage_metadata:
+        return
+    
+    input_tokens = usage_metadata.get("input_tokens", 0)
+    cached_tokens = (usage_metadata.get("input_token_details") or {}).get("cache_read", 0) or 0
+    count_trace(
+        input_tokens=input_tokens,
+        cached_tokens=cached_tokens,
+        output_tokens=usage_metadata.get("output_tokens", 0)
+    )
+    
+    prompt_cache_stats["calls"] += 1
+    prompt_cache_stats["input_tokens"] += input_tokens
+    prompt_cache_stats["cached_tokens"] += cached_tokens
+    print(f"💾 프롬프트 캐시: {cached_tokens}/{input_tokens} 토큰")
 
-검색 결과:
-{context}"""),
-    ("user", "{question}")
-])
 
 # ============================================================
 # LLM 초기화
@@ -70,16 +99,25 @@ def initialize_llm():
     
     print("LLM 초기화 중...")
     
+    ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
+    
+    # stream_usage: 스트리밍 응답에서도 마지막 청크로 토큰 사용량(캐시 토큰 포함)을 받습니다.
     llm = ChatOpenAI(
         model=settings.MAIN_MODEL,
         temperature=settings.TEMPERATURE,
-        max_tokens=settings.MAX_TOKENS
+        max_tokens=settings.MAX_TOKENS,
+        stream_usage=True,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES
     )
     
     search_llm = ChatOpenAI(
         model=settings.SEARCH_MODEL,
         temperature=settings.TEMPERATURE,
-        max_tokens=settings.MAX_TOKENS
+        max_tokens=settings.MAX_TOKENS,
+        stream_usage=True,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES
     )
     
     print("✅ LLM 초기화 완료")
@@ -89,49 +127,102 @@ def initialize_llm():
 # ============================================================
 # 답변 생성 함수
 # ============================================================
+def limit_context(
+    context: List,
+    max_docs: Optional[int] = None,
+    char_limit: Optional[int] = None
+) -> List[Document]:
+    """프롬프트에 넣을 문서 수와 문서별 길이를 제한합니다."""
+    max_docs = settings.MAX_CONTEXT_DOCS if max_docs is None else max_docs
+    char_limit = settings.CONTEXT_CHAR_LIMIT if char_limit is None else char_limit
 
-def generate_answer(
-    query: str,
-    context: List[Document],
-    is_web_search: bool,
-    history: List[Dict] = None,
-    summary: str = None
-) -> str:
-    if not context:
-        return "관련 정보를 찾을 수 없습니다."
-    
-    limited_context = [
+    return [
         Document(
-            page_content=doc.page_content[:settings.CONTEXT_CHAR_LIMIT] if isinstance(doc, Document) else str(doc)[:settings.CONTEXT_CHAR_LIMIT],
+            page_content=doc.page_content[:char_limit] if isinstance(doc, Document) else str(doc)[:char_limit],
             metadata=doc.metadata if isinstance(doc, Document) and hasattr(doc, 'metadata') else {}
         )
-        for doc in context[:settings.MAX_CONTEXT_DOCS]
+        for doc in context[:max_docs]
     ]
-    
-    if is_web_search:
-        chain = WEB_SEARCH_PROMPT | search_llm
-    else:
-        chain = TAX_LAW_PROMPT | llm
-    
+
+
+def build_prompt_inputs(
+    query: str,
+    context: List[Document],
+    history: List[Dict] = None,
+    summary: str = None
+) -> dict:
+    """프롬프트 변수(질문, 문서, 최근 대화, 요약)를 만듭니다."""
     # history, summary 포맷팅
     history_text = ""
     if history:
         history_text = "이전 대화:\n" + "\n".join([
             f"{'사용자' if msg['role'] == 'user' else 'AI'}: {msg['content']}" 
             for msg in history[-3:]
-        ])    
+        ])
+    
     summary_text = ""
     if summary:
         summary_text = f"대화 요약:\n{summary}"
     
-    response = chain.invoke({
+    return {
         'question': query,
-        'context': limited_context,
+        'context': limit_context(context),
         'history': history_text,
         'summary': summary_text
-    })
+    }
+
+
+def select_answer_chain(
+    query: str,
+    context: List[Document],
+    is_web_search: bool,
+    history: List[Dict] = None
+) -> Tuple[Runnable, Optional[CascadeDecision]]:
+    """
+    답변 체인을 고릅니다.
     
-    return response.content
+    웹 검색 답변은 항상 search_llm, 문서 기반 답변은 캐스케이드 규칙에 따라
+    llm(MAIN_MODEL) 또는 search_llm(SEARCH_MODEL)을 사용합니다.
+    """
+    if is_web_search:
+        return WEB_SEARCH_PROMPT | search_llm, None
+    
+    decision = choose_answer_model(query, context, history)
+    answer_llm = search_llm if decision.use_light_model else llm
+    return TAX_LAW_PROMPT | answer_llm, decision
+
+
+def generate_answer(
+    query: str,
+    context: List[Document],
+    is_web_search: bool,
+    history: List[Dict] = None,
+    summary: str = None
+) -> str:
+    if not context:
+        return "관련 정보를 찾을 수 없습니다."
+    
+    started_at = time.perf_counter()
+    chain, decision = select_answer_chain(query, context, is_web_search, history)
+    
+    with trace_stage("generation") as stage:
+        stage["context_docs"] = len(context)
+        stage["model"] = decision.model if decision else settings.SEARCH_MODEL
+        answer = replay_lookup("generation")
+        if answer is NOT_RECORDED:
+            if is_replaying():
+                answer = REPLAY_MISSING_ANSWER
+            else:
+                response = chain.invoke(build_prompt_inputs(query, context, history, summary))
+                record_prompt_usage(response.usage_metadata)
+                answer = response.content
+                record_upstream("generation", answer, time.perf_counter() - started_at)
+        stage["answer_chars"] = len(answer)
+    
+    if decision:
+        record_cascade_result(decision, query, started_at, len(answer))
+    
+    return answer
 
 
 async def stream_generate_answer(
@@ -145,36 +236,38 @@ async def stream_generate_answer(
         yield "관련 정보를 찾을 수 없습니다."
         return
     
-    limited_context = [
-        Document(
-            page_content=doc.page_content[:settings.CONTEXT_CHAR_LIMIT] if isinstance(doc, Document) else str(doc)[:settings.CONTEXT_CHAR_LIMIT],
-            metadata=doc.metadata if isinstance(doc, Document) and hasattr(doc, 'metadata') else {}
-        )
-        for doc in context[:settings.MAX_CONTEXT_DOCS]
-    ]
+    started_at = time.perf_counter()
+    chain, decision = select_answer_chain(query, context, is_web_search, history)
+    answer_chars = 0
     
-    if is_web_search:
-        chain = WEB_SEARCH_PROMPT | search_llm
-    else:
-        chain = TAX_LAW_PROMPT | llm
+    replayed = replay_stream_lookup("generation")
+    if replayed is None and is_replaying():
+        yield REPLAY_MISSING_ANSWER
+        return
     
-    # history, summary 포맷팅
-    history_text = ""
-    if history:
-        history_text = "이전 대화:\n" + "\n".join([
-            f"{'사용자' if msg['role'] == 'user' else 'AI'}: {msg['content']}" 
-            for msg in history[-3:]
-        ])
-        
-    summary_text = ""
-    if summary:
-        summary_text = f"대화 요약:\n{summary}"
+    stream = replayed or chain.astream(build_prompt_inputs(query, context, history, summary))
+    chunks = []
+    with trace_stage("generation") as stage:
+        stage["context_docs"] = len(context)
+        stage["model"] = decision.model if decision else settings.SEARCH_MODEL
+        try:
+            async for chunk in stream:
+                if replayed is not None:
+                    answer_chars += len(chunk)
+                    yield chunk
+                    continue
+                if chunk.usage_metadata:
+                    record_prompt_usage(chunk.usage_metadata)
+                if chunk.content:
+                    answer_chars += len(chunk.content)
+                    chunks.append(chunk.content)
+                    yield chunk.content
+            if replayed is None:
+                record_upstream("generation", chunks, time.perf_counter() - started_at)
+        finally:
+            # 클라이언트가 중간에 끊으면 OpenAI 스트림 연결도 바로 닫습니다.
+            await stream.aclose()
+            stage["answer_chars"] = answer_chars
     
-    async for chunk in chain.astream({
-        'question': query,
-        'context': limited_context,
-        'history': history_text,
-        'summary': summary_text
-    }):
-        if chunk.content:
-            yield chunk.content
\ No newline at end of file
+    if decision:
+        record_cascade_result(decision, query, started_at, answer_chars)
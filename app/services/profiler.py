@@ -0,0 +1,68 @@
+"""
+샘플링 CPU 프로파일러
+
+지정한 시간 동안 일정 간격으로 모든 스레드의 호출 스택을 샘플링하여
+flamegraph.pl / speedscope에서 바로 읽을 수 있는 collapsed stack 형식
+("스레드;바깥 함수;...;안쪽 함수 샘플수")으로 반환합니다.
+별도 패키지 없이 sys._current_frames()만 사용하므로 재배포 없이 운영 워커에서 실행할 수 있습니다.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List
+
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path_parts = code.co_filename.replace("\\", "/").split("/")
+    short_path = "/".join(path_parts[-2:])
+    return f"{code.co_name} ({short_path}:{code.co_firstlineno})"
+
+
+def _collapse_stack(thread_name: str, frame) -> str:
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+def sample_cpu_profile(seconds: float, interval_ms: float) -> str:
+    """
+    seconds 동안 interval_ms 간격으로 스택을 샘플링해 collapsed stack 텍스트를 반환합니다.
+    한 워커에서 동시에 하나의 프로파일만 실행할 수 있습니다.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("이미 프로파일링이 진행 중입니다.")
+
+    try:
+        own_thread_id = threading.get_ident()
+        interval = interval_ms / 1000
+        stacks = Counter()
+        samples = 0
+
+        print(f"🔬 CPU 프로파일 시작 (pid={os.getpid()}, {seconds}초, {interval_ms}ms 간격)")
+        end_time = time.monotonic() + seconds
+        while time.monotonic() < end_time:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+                stacks[_collapse_stack(thread_names.get(thread_id, f"thread-{thread_id}"), frame)] += 1
+            samples += 1
+            time.sleep(interval)
+
+        print(f"✅ CPU 프로파일 완료 (샘플 {samples}회, 고유 스택 {len(stacks)}개)")
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    finally:
+        _profile_lock.release()
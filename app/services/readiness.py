@@ -0,0 +1,71 @@
+"""
+서버 준비 상태 확인 및 시작 시 워밍업
+"""
+import time
+from typing import Dict
+
+from app.config import settings
+
+
+warmup_state = {"status": "pending", "elapsed_ms": None, "error": None}
+
+
+def subsystem_status() -> Dict[str, bool]:
+    """각 하위 시스템이 초기화되었는지 확인합니다."""
+    from app.services import retriever, generator, workflow, summarization, session
+
+    return {
+        "vector_stores": len(retriever.vector_stores) > 0,
+        "bm25": len(retriever.bm25_retrievers) > 0
+                and set(retriever.vector_stores) <= set(retriever.bm25_retrievers),
+        "llm_clients": generator.llm is not None
+                       and generator.search_llm is not None
+                       and summarization.summary_llm is not None,
+        "law_router": retriever.retriever_chain is not None,
+        "web_search": workflow.tavily_search_tool is not None,
+        "graph": workflow.graph is not None,
+        "sessions": session.session_store is not None,
+    }
+
+
+def is_ready() -> bool:
+    """모든 하위 시스템이 준비되고 워밍업이 끝났으면 True (워밍업 실패는 준비를 막지 않음)"""
+    return all(subsystem_status().values()) and warmup_state["status"] in ("done", "failed", "skipped")
+
+
+def run_warmup():
+    """
+    합성 질의로 검색 경로를 한 번씩 실행하여 첫 사용자 요청의 지연을 없앱니다.
+
+    - 법률 선택(OpenAI), 임베딩(Upstage) 커넥션을 미리 엽니다.
+    - 모든 법률 컬렉션의 HNSW 인덱스와 BM25 인덱스를 한 번씩 검색해 지연 로드를 끝냅니다.
+    """
+    from app.services import retriever
+
+    # 재생 모드는 업스트림을 호출하지 않고 기록된 응답만 쓰므로 워밍업도 건너뜁니다.
+    if not settings.WARMUP_ENABLED or not settings.WARMUP_QUERIES or settings.REPLAY_LOG_PATH:
+        warmup_state["status"] = "skipped"
+        return
+
+    warmup_state["status"] = "running"
+    start_time = time.perf_counter()
+    print("🔥 워밍업 시작...")
+
+    try:
+        for query in settings.WARMUP_QUERIES:
+            retriever.get_retriever_parallel(query)
+
+        query = settings.WARMUP_QUERIES[0]
+        query_vector = retriever.query_embedding.embed_query(query)
+        for law_name in retriever.vector_stores:
+            retriever.retrieve_from_single_law_by_vector(law_name, query, query_vector)
+
+        warmup_state["status"] = "done"
+    except Exception as e:
+        warmup_state["status"] = "failed"
+        warmup_state["error"] = str(e)
+        print(f"⚠️ 워밍업 실패: {e}")
+    finally:
+        warmup_state["elapsed_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+
+    print(f"✅ 워밍업 {warmup_state['status']} ({warmup_state['elapsed_ms']}ms)")
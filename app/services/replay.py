@@ -0,0 +1,245 @@
+"""
+캡처한 트래픽 재생 (부하/회귀 테스트)
+
+CAPTURE_ENABLED=true로 기록한 JSONL을 원래 요청 간격(--speed 배속) 또는 최대 속도로
+대상 서버에 다시 보내고, 경로별 지연시간 p50/p95/p99, 스트리밍 첫 바이트 시간(TTFB),
+처리량, 오류 수를 보고합니다. --compare로 이전 결과 파일과 비교할 수 있습니다.
+
+대상 서버를 REPLAY_LOG_PATH=<같은 JSONL>로 띄우면 X-Replay-Id 헤더로 기록된 업스트림 응답을 쓰므로
+OpenAI/Upstage/Tavily를 호출하지 않고, 업스트림 변동 없이 서버 자체의 변화만 비교할 수 있습니다.
+
+실행 예시:
+    REPLAY_LOG_PATH=./capture/traffic.jsonl python -m app.serve
+    python -m app.services.replay ./capture/traffic.jsonl --speed 0 --concurrency 16 --output after.json
+    python -m app.services.replay ./capture/traffic.jsonl --speed 2 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from app.services.capture_log import load_capture_log, REPLAY_HEADER
+
+
+DEFAULT_TARGET = "http://localhost:8000"
+
+
+@dataclass
+class ReplayResult:
+    capture_id: str
+    path: str
+    status: Optional[int]
+    latency_ms: float
+    ttfb_ms: Optional[float]
+    response_bytes: int
+    captured_latency_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+# ============================================================
+# 재생
+# ============================================================
+def build_replay_request(record: dict) -> dict:
+    """
+    기록된 요청을 재생용 요청 본문으로 바꿉니다.
+
+    - 세션 요청: session_id는 해시라 재생 서버에 세션이 없으므로, 원래 요청이 세션에서 읽은
+      대화 기록/요약을 직접 넣고 session_id는 뺍니다. (같은 프롬프트 크기로 재생되고 세션도 만들지 않음)
+    - /summarize: 응답 후 끝난 요약 작업까지 지연시간에 포함되도록 wait=true로 보냅니다.
+    """
+    body = dict(record["request"])
+    context = record.get("context")
+    if body.get("session_id") and context is not None:
+        body.pop("session_id")
+        body["history"] = context["history"]
+        body["summary"] = context["summary"]
+    if record["path"] == "/summarize":
+        body["wait"] = True
+    return body
+
+
+def captured_latency(record: dict) -> Optional[float]:
+    """원래 요청의 지연시간 (응답 후 이어진 작업이 있으면 그 작업이 끝난 시점까지)"""
+    return record.get("completed_ms") or record.get("latency_ms")
+
+
+async def replay_one(session: aiohttp.ClientSession, target: str, record: dict) -> ReplayResult:
+    headers = {REPLAY_HEADER.decode(): record["capture_id"]}
+    if record.get("accept"):
+        headers["Accept"] = record["accept"]
+
+    start_time = time.perf_counter()
+    ttfb_ms = None
+    response_bytes = 0
+    status = None
+    error = None
+    try:
+        async with session.post(target + record["path"], json=build_replay_request(record), headers=headers) as response:
+            status = response.status
+            async for chunk in response.content.iter_any():
+                if ttfb_ms is None:
+                    ttfb_ms = (time.perf_counter() - start_time) * 1000
+                response_bytes += len(chunk)
+        if status >= 400:
+            error = f"HTTP {status}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    return ReplayResult(
+        capture_id=record["capture_id"],
+        path=record["path"],
+        status=status,
+        latency_ms=(time.perf_counter() - start_time) * 1000,
+        ttfb_ms=ttfb_ms,
+        response_bytes=response_bytes,
+        captured_latency_ms=captured_latency(record),
+        error=error,
+    )
+
+
+async def replay_log(records: List[dict], target: str, speed: float, concurrency: int) -> List[ReplayResult]:
+    """
+    기록을 재생합니다. speed > 0이면 원래 요청 간격을 speed배로 줄여 보내고,
+    speed == 0이면 간격 없이 concurrency 한도까지 동시에 보냅니다.
+    """
+    records = sorted(records, key=lambda record: record["started_at"])
+    semaphore = asyncio.Semaphore(concurrency)
+    first_started_at = records[0]["started_at"]
+    replay_started = time.perf_counter()
+
+    async def scheduled(session: aiohttp.ClientSession, record: dict) -> ReplayResult:
+        if speed > 0:
+            offset = (record["started_at"] - first_started_at) / speed
+            await asyncio.sleep(max(offset - (time.perf_counter() - replay_started), 0))
+        async with semaphore:
+            return await replay_one(session, target, record)
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        return await asyncio.gather(*(scheduled(session, record) for record in records))
+
+
+# ============================================================
+# 보고
+# ============================================================
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * percentile / 100), len(values) - 1)]
+
+
+def summarize_results(results: List[ReplayResult], wall_seconds: float) -> Dict[str, dict]:
+    """경로별(그리고 전체) 요약 통계"""
+    groups = defaultdict(list)
+    for result in results:
+        groups[result.path].append(result)
+        groups["all"].append(result)
+
+    summary = {}
+    for path, group in groups.items():
+        latencies = [r.latency_ms for r in group if r.error is None]
+        ttfbs = [r.ttfb_ms for r in group if r.error is None and r.ttfb_ms is not None]
+        captured = [r.captured_latency_ms for r in group if r.captured_latency_ms is not None]
+        summary[path] = {
+            "count": len(group),
+            "errors": sum(1 for r in group if r.error is not None),
+            "p50_ms": statistics.median(latencies) if latencies else None,
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+            "ttfb_p50_ms": statistics.median(ttfbs) if ttfbs else None,
+            "ttfb_p95_ms": _percentile(ttfbs, 95),
+            "captured_p50_ms": statistics.median(captured) if captured else None,
+            "throughput_rps": len(group) / wall_seconds if wall_seconds > 0 else None,
+        }
+    return summary
+
+
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+
+def _fmt_delta(value: Optional[float], baseline: Optional[float]) -> str:
+    if value is None or baseline is None or baseline == 0:
+        return ""
+    return f" ({(value - baseline) / baseline * 100:+.1f}%)"
+
+
+def print_report(summary: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None):
+    header = (
+        f"{'path':<14} {'count':>5} {'err':>4} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} "
+        f"{'ttfb50':>8} {'ttfb95':>8} {'orig50':>8} {'rps':>6}"
+    )
+    print(header)
+    print("-" * len(header))
+    for path, s in summary.items():
+        print(
+            f"{path:<14} {s['count']:>5} {s['errors']:>4} {_fmt(s['p50_ms'])} {_fmt(s['p95_ms'])} {_fmt(s['p99_ms'])} "
+            f"{_fmt(s['ttfb_p50_ms'])} {_fmt(s['ttfb_p95_ms'])} {_fmt(s['captured_p50_ms'])} "
+            f"{s['throughput_rps'] or 0:>6.2f}"
+        )
+
+    if not baseline:
+        return
+
+    print("\n📊 이전 결과 대비")
+    for path, s in summary.items():
+        base = baseline.get(path)
+        if base is None:
+            continue
+        print(
+            f"{path:<14} p50 {_fmt(s['p50_ms'])}{_fmt_delta(s['p50_ms'], base['p50_ms'])}"
+            f"  p95 {_fmt(s['p95_ms'])}{_fmt_delta(s['p95_ms'], base['p95_ms'])}"
+            f"  p99 {_fmt(s['p99_ms'])}{_fmt_delta(s['p99_ms'], base['p99_ms'])}"
+            f"  errors {s['errors']} (이전 {base['errors']})"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="캡처한 트래픽 재생 및 지연시간 비교")
+    parser.add_argument("log", help="CAPTURE_PATH에 기록된 JSONL")
+    parser.add_argument("--target", default=DEFAULT_TARGET)
+    parser.add_argument("--speed", type=float, default=1.0, help="원래 요청 간격 대비 배속 (0이면 간격 없이 최대 속도)")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시에 보낼 최대 요청 수")
+    parser.add_argument("--limit", type=int, help="앞에서부터 재생할 요청 수")
+    parser.add_argument("--compare", help="비교할 이전 --output 결과 파일")
+    parser.add_argument("--output", help="요약과 요청별 결과를 JSON으로 저장할 경로")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    records = load_capture_log(args.log)[:args.limit]
+    if not records:
+        raise SystemExit(f"❌ 재생할 기록이 없습니다: {args.log}")
+
+    print(f"▶️ {len(records)}건 재생 -> {args.target} (speed={args.speed}, concurrency={args.concurrency})\n")
+    start_time = time.perf_counter()
+    results = asyncio.run(replay_log(records, args.target, args.speed, args.concurrency))
+    summary = summarize_results(results, time.perf_counter() - start_time)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+    print_report(summary, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"summary": summary, "results": [asdict(r) for r in results]},
+                f,
+                ensure_ascii=False,
+                indent=2
+            )
+        print(f"\n✅ 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+업스트림 호출 보호 (요청 데드라인, 헤지 요청, 서킷 브레이커)
+
+OpenAI/Upstage/Tavily 중 하나가 느려지거나 실패해도 요청 전체가 멈추지 않도록
+- 요청마다 전체 시간 예산(Deadline)을 두고 단계별로 나눠 쓰며,
+- 지연이 큰 호출은 지연 백분위수가 지나면 같은 요청을 한 번 더 보내고(헤지),
+- 연속으로 실패하는 호출은 서킷을 열어 잠시 호출하지 않고 대체 경로를 씁니다.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+from app.services.capture import NOT_RECORDED, areplay_lookup, is_replaying, record_upstream, replay_lookup
+
+
+# ============================================================
+# 요청 데드라인
+# ============================================================
+class Deadline:
+    """요청 전체의 시간 예산. 각 단계는 전체 예산의 일정 비율과 남은 시간 중 작은 값을 씁니다."""
+
+    def __init__(self, total_seconds: Optional[float] = None):
+        self.total_seconds = settings.REQUEST_DEADLINE_SECONDS if total_seconds is None else total_seconds
+        self.expires_at = time.monotonic() + self.total_seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, stage: str) -> float:
+        ratio = settings.STAGE_BUDGET_RATIOS.get(stage, 1.0)
+        return min(self.total_seconds * ratio, self.remaining())
+
+
+def stage_timeout(deadline: Optional[Deadline], stage: str) -> float:
+    """단계 제한 시간 (데드라인이 없으면 새 요청 기준의 단계 예산)"""
+    return (deadline or Deadline()).budget(stage)
+
+
+# ============================================================
+# 서킷 브레이커
+# ============================================================
+class CircuitBreaker:
+    """
+    failure_threshold번 연속 실패하면 reset_seconds 동안 서킷을 열어 호출을 건너뜁니다.
+    이후 한 번의 시험 호출(half-open)이 성공하면 다시 닫습니다.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                return True
+            self.short_circuited += 1
+            return False
+
+    def release_trial(self):
+        """시험 호출이 성공/실패를 남기지 않고 끝났으면 (취소 등) 다음 호출이 다시 시험하도록 open으로 되돌립니다."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"🔌 서킷 닫힘: {self.name}")
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"🔌 서킷 열림: {self.name} ({self.reset_seconds}초 동안 대체 경로 사용)")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "short_circuited": self.short_circuited}
+
+
+# ============================================================
+# 지연 추적 (헤지 시점 계산)
+# ============================================================
+class LatencyTracker:
+    """최근 성공 호출의 지연시간으로 헤지 요청을 보낼 시점(백분위수)을 계산합니다."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self.hedged = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        if not settings.HEDGE_ENABLED or len(self._samples) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        samples = sorted(self._samples)
+        index = min(int(len(samples) * settings.HEDGE_PERCENTILE / 100), len(samples) - 1)
+        return samples[index]
+
+
+circuit_breakers: Dict[str, CircuitBreaker] = {}
+latency_trackers: Dict[str, LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+# 제한 시간이 지난 동기 호출은 스레드에서 끝까지 실행되므로 요청 스레드와 분리된 풀에서 실행합니다.
+_upstream_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="upstream")
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _registry_lock:
+        if name not in circuit_breakers:
+            circuit_breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+                reset_seconds=settings.CIRCUIT_RESET_SECONDS,
+            )
+            latency_trackers[name] = LatencyTracker()
+        return circuit_breakers[name]
+
+
+def resilience_stats() -> dict:
+    return {
+        name: {**breaker.stats(), "hedged": latency_trackers[name].hedged}
+        for name, breaker in circuit_breakers.items()
+    }
+
+
+# ============================================================
+# 보호된 호출
+# ============================================================
+def _timed(fn: Callable[[], Any]) -> Callable[[], tuple]:
+    def run():
+        start_time = time.monotonic()
+        return fn(), time.monotonic() - start_time
+    return run
+
+
+def call_upstream(
+    name: str,
+    fn: Callable[[], Any],
+    timeout: float,
+    fallback: Callable[[], Any],
+    hedge: bool = False
+) -> Any:
+    """
+    서킷 브레이커와 제한 시간을 적용해 동기 업스트림 호출을 실행합니다.
+
+    서킷이 열려 있거나, 제한 시간을 넘기거나, 예외가 나면 fallback()의 결과를 반환합니다.
+    hedge=True이면 지연 백분위수가 지나도 응답이 없을 때 같은 호출을 한 번 더 보내 먼저 온 응답을 씁니다.
+    재생 중인 요청은 업스트림 대신 기록된 응답을 반환합니다. (기록이 없으면 fallback)
+    """
+    replayed = replay_lookup(name)
+    if replayed is not NOT_RECORDED:
+        return replayed
+    if is_replaying():
+        return fallback()
+
+    breaker = get_breaker(name)
+    tracker = latency_trackers[name]
+    # 시간이 남지 않았으면 서킷 상태를 바꾸지 않도록 allow()보다 먼저 확인합니다.
+    if timeout <= 0 or not breaker.allow():
+        return fallback()
+    # half_open은 시험 호출 하나만 허용하므로 이 상태면 이 호출이 시험 호출입니다.
+    trial = breaker.state == "half_open"
+
+    deadline = time.monotonic() + timeout
+    futures = [_upstream_executor.submit(_timed(fn))]
+    hedge_delay = tracker.hedge_delay() if hedge else None
+    error = None
+    recorded = False
+    try:
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                tracker.hedged += 1
+                futures.append(_upstream_executor.submit(_timed(fn)))
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                error = TimeoutError(f"{timeout:.1f}초 초과")
+                break
+            for future in done:
+                if future.exception() is None:
+                    result, elapsed = future.result()
+                    tracker.record(elapsed)
+                    breaker.record_success()
+                    recorded = True
+                    record_upstream(name, result, elapsed)
+                    return result
+                error = future.exception()
+
+        breaker.record_failure()
+        recorded = True
+    finally:
+        for future in futures:
+            future.cancel()
+        if trial and not recorded:
+            breaker.release_trial()
+
+    print(f"⚠️ {name} 호출 실패: {error} -> 대체 경로 사용")
+    return fallback()
+
+
+async def acall_upstream(
+    name: str,
+    make_call: Callable[[], Awaitable[Any]],
+    timeout: float,
+    fallback: Callable[[], Any],
+    hedge: bool = False
+) -> Any:
+    """call_upstream의 비동기 버전 (남은 시도는 취소되어 LLM 호출도 함께 중단됨)"""
+    replayed = await areplay_lookup(name)
+    if replayed is not NOT_RECORDED:
+        return replayed
+    if is_replaying():
+        return fallback()
+
+    breaker = get_breaker(name)
+    tracker = latency_trackers[name]
+    # 시간이 남지 않았으면 서킷 상태를 바꾸지 않도록 allow()보다 먼저 확인합니다.
+    if timeout <= 0 or not breaker.allow():
+        return fallback()
+    # half_open은 시험 호출 하나만 허용하므로 이 상태면 이 호출이 시험 호출입니다.
+    trial = breaker.state == "half_open"
+
+    async def timed_call():
+        start_time = time.monotonic()
+        return await make_call(), time.monotonic() - start_time
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    tasks = [asyncio.create_task(timed_call())]
+    hedge_delay = tracker.hedge_delay() if hedge else None
+    error = None
+    recorded = False
+    try:
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                tracker.hedged += 1
+                tasks.append(asyncio.create_task(timed_call()))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(deadline - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                error = TimeoutError(f"{timeout:.1f}초 초과")
+                break
+            for task in done:
+                if task.exception() is None:
+                    result, elapsed = task.result()
+                    tracker.record(elapsed)
+                    breaker.record_success()
+                    recorded = True
+                    record_upstream(name, result, elapsed)
+                    return result
+                error = task.exception()
+
+        breaker.record_failure()
+        recorded = True
+    finally:
+        for task in tasks:
+            task.cancel()
+        # 요청 취소 등으로 결과 없이 끝난 시험 호출이 서킷을 half_open에 묶어 두지 않게 합니다.
+        if trial and not recorded:
+            breaker.release_trial()
+
+    print(f"⚠️ {name} 호출 실패: {error} -> 대체 경로 사용")
+    return fallback()
@@ -0,0 +1,122 @@
+"""
+검색 결과 캐시
+
+같은 질문을 같은 법률, 같은 검색 설정, 같은 인덱스로 검색하면 결과가 같으므로
+(정규화한 질문, 선택 법률, top-k/가중치 설정, 인덱스 세대)를 키로 순위가 매겨진 문서 ID와 점수를 저장합니다.
+대화 기록이나 요약이 달라 답변은 새로 만들어야 하는 후속 질문도 임베딩과 검색을 건너뜁니다.
+
+문서 본문은 캐시에 넣지 않고 ID만 저장하며, ID는 이미 메모리에 있는 인덱스 문서로 되돌립니다.
+인덱스가 새로 로드되면 세대가 바뀌어 이전 결과는 더 이상 조회되지 않고,
+문서 등록도 현재 인덱스 문서로 다시 만들어 이전 인덱스의 문서를 메모리에 남기지 않습니다.
+"""
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.cache import TTLCache, normalize_query
+from app.services.capture import NOT_RECORDED, is_replaying, record_upstream, replay_lookup
+
+
+retrieval_cache = TTLCache(
+    name="retrieval",
+    max_entries=settings.RETRIEVAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+)
+
+# 문서 ID -> 문서 (BM25 인덱스 문서와 벡터 검색으로 받은 문서)
+document_registry: Dict[str, Document] = {}
+index_generation = 0
+_registry_lock = threading.Lock()
+
+
+def document_id(doc: Document) -> str:
+    """청크 본문으로 만든 문서 ID (인덱스를 다시 만들어도 같은 청크는 같은 ID)"""
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:16]
+
+
+def register_documents(docs: List[Document]):
+    with _registry_lock:
+        for doc in docs:
+            document_registry.setdefault(document_id(doc), doc)
+
+
+def bump_index_generation(reason: str, documents: Optional[Iterable[Document]] = None):
+    """
+    인덱스가 바뀌었을 때 호출합니다. 이전 세대의 검색 결과는 모두 버립니다.
+
+    documents(현재 BM25 인덱스 문서)를 넘기면 문서 등록을 그 문서로 다시 만듭니다.
+    BM25 문서가 그대로인 경우(벡터스토어만 로드)에는 넘기지 않아야 pre-fork 워커가
+    부모에서 물려받은 등록을 건드리지 않아 copy-on-write 공유가 유지됩니다.
+    """
+    global index_generation
+    with _registry_lock:
+        index_generation += 1
+        if documents is not None:
+            document_registry.clear()
+            for doc in documents:
+                document_registry.setdefault(document_id(doc), doc)
+    retrieval_cache.invalidate()
+    print(f"♻️ 검색 결과 캐시 초기화 (인덱스 세대 {index_generation}: {reason})")
+
+
+def retrieval_cache_key(query: str, laws: List[str]) -> Tuple:
+    """검색 전에 만들어 두어야 검색 도중 인덱스가 바뀌어도 이전 결과가 새 세대로 저장되지 않습니다."""
+    return (
+        normalize_query(query),
+        tuple(sorted(laws)),
+        settings.TOP_K_VECTOR,
+        settings.TOP_K_BM25,
+        settings.VECTOR_WEIGHT,
+        settings.BM25_WEIGHT,
+        settings.MAX_DOCS_LIMIT,
+        settings.DEDUP_ENABLED,
+        index_generation,
+    )
+
+
+def _resolve_documents(doc_ids: List[str]) -> Optional[List[Document]]:
+    docs = [document_registry.get(doc_id) for doc_id in doc_ids]
+    if any(doc is None for doc in docs):
+        return None
+    return docs
+
+
+def get_cached_retrieval(key: Tuple) -> Optional[List[Document]]:
+    """
+    캐시된 검색 결과를 문서로 되돌려 반환합니다. 없거나 문서를 찾을 수 없으면 None
+
+    캡처 중 캐시 적중은 임베딩 호출이 기록되지 않으므로 적중한 문서 ID를 대신 기록하고,
+    재생 중에는 현재 캐시 상태와 관계없이 원래 요청이 캐시를 썼을 때만 그 결과를 씁니다.
+    """
+    if is_replaying():
+        doc_ids = replay_lookup("retrieval_cache")
+        return None if doc_ids is NOT_RECORDED else _resolve_documents(doc_ids)
+
+    if not settings.RETRIEVAL_CACHE_ENABLED:
+        return None
+
+    ranked = retrieval_cache.get(key)
+    if ranked is None:
+        return None
+
+    doc_ids = [doc_id for doc_id, _ in ranked]
+    docs = _resolve_documents(doc_ids)
+    if docs is not None:
+        record_upstream("retrieval_cache", doc_ids, 0)
+    return docs
+
+
+def store_retrieval(key: Tuple, scored_docs: List[Tuple[Document, float]]):
+    """검색 결과를 (문서 ID, 점수) 순위 목록으로 저장합니다."""
+    if not settings.RETRIEVAL_CACHE_ENABLED or is_replaying():
+        return
+    # 검색 도중 인덱스가 바뀌었으면 이전 세대 결과이므로 저장하지 않습니다.
+    if key[-1] != index_generation:
+        return
+
+    register_documents([doc for doc, _ in scored_docs])
+    ranked = tuple((document_id(doc), round(score, 6)) for doc, score in scored_docs)
+    retrieval_cache.set(key, ranked)
@@ -3,19 +3,34 @@
 """
 import os
 import pickle
-from typing import List, Literal
+import threading
+from collections import defaultdict
+from itertools import chain
+from typing import TYPE_CHECKING, List, Literal, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from langchain_chroma import Chroma
-from langchain_upstage import UpstageEmbeddings
-from langchain_openai import ChatOpenAI
-from langchain_community.retrievers import BM25Retriever
-from langchain.retrievers import EnsembleRetriever
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 from pydantic import BaseModel, Field
 
 from app.config import settings, AVAILABLE_LAWS
+from app.services.embedding import QueryEmbeddingBatcher, embed_query_batch
+from app.services.tokenizer import TOKENIZER_VERSION, QueryTokenizer, get_tokenizer
+from app.services.dedup import collapse_near_duplicates, load_signatures
+from app.services.resilience import Deadline, stage_timeout, call_upstream, acall_upstream
+from app.services.tracing import trace_stage
+from app.services.capture import record_decision
+from app.services.retrieval_cache import (
+    bump_index_generation,
+    document_id,
+    get_cached_retrieval,
+    retrieval_cache_key,
+    store_retrieval,
+)
+from app.services.startup import lazy_import
+
+if TYPE_CHECKING:
+    from langchain_community.retrievers import BM25Retriever
 
 
 # ============================================================
@@ -48,8 +63,12 @@ class MultiRawRetriever(BaseModel):
 # 벡터스토어 및 BM25 전역 변수
 # ============================================================
 vector_stores = {}
+vector_collections = {}  # 법률 -> chromadb 컬렉션 (여러 쿼리 벡터를 한 번에 검색할 때 사용)
 bm25_retrievers = {}
 retriever_chain = None
+embedding_model = None
+query_embedding = None
+indexes_preloaded = False  # pre-fork 부모 프로세스에서 물려받은 인덱스 여부
 
 
 # ============================================================
@@ -57,59 +76,176 @@ retriever_chain = None
 # ============================================================
 def load_vector_stores():
     """벡터스토어를 로드합니다."""
-    global vector_stores
+    global vector_stores, vector_collections, embedding_model, query_embedding
     
     print("벡터스토어 로드 중...")
     
-    embedding = UpstageEmbeddings(model=settings.EMBEDDING_MODEL)
+    UpstageEmbeddings = lazy_import("langchain_upstage", "UpstageEmbeddings")
+    Chroma = lazy_import("langchain_chroma", "Chroma")
+    chromadb = lazy_import("chromadb")
+    
+    embedding_model = UpstageEmbeddings(
+        model=settings.EMBEDDING_MODEL,
+        timeout=settings.EMBEDDING_TIMEOUT_SECONDS
+    )
+    
+    # 동시 요청의 쿼리 임베딩을 모아서 보내는 배처 (법률별 검색의 중복 임베딩도 합쳐짐)
+    if settings.EMBEDDING_BATCH_ENABLED:
+        query_embedding = QueryEmbeddingBatcher(
+            embedding_model,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+        )
+    else:
+        query_embedding = embedding_model
     
     for folder_name in os.listdir(settings.CHROMA_BASE_DIR):
         folder_path = os.path.join(settings.CHROMA_BASE_DIR, folder_name)
         
         if os.path.isdir(folder_path):
+            # 클라이언트를 직접 만들어 넘기고, 배치 검색은 같은 클라이언트의 컬렉션으로 합니다.
+            client = chromadb.PersistentClient(path=folder_path)
             vector_stores[folder_name] = Chroma(
                 collection_name=folder_name,
-                persist_directory=folder_path,
-                embedding_function=embedding
+                client=client,
+                embedding_function=query_embedding
             )
+            vector_collections[folder_name] = client.get_collection(folder_name)
     
     print(f"✅ {len(vector_stores)}개의 Vector Store 로드 완료")
+    bump_index_generation("벡터스토어 로드")
+
+
+def list_law_collections() -> List[str]:
+    """CHROMA_BASE_DIR 아래의 법률 컬렉션 이름 목록을 반환합니다."""
+    return sorted(
+        folder_name for folder_name in os.listdir(settings.CHROMA_BASE_DIR)
+        if os.path.isdir(os.path.join(settings.CHROMA_BASE_DIR, folder_name))
+    )
+
+
+def bm25_cache_path(law_name: str) -> str:
+    """
+    토크나이저/중복 제거 설정별 BM25 캐시 경로
+    
+    저장소에는 공백 분리/중복 제거 없음 캐시({law}_bm25.pkl)만 들어 있고, 기본 설정(DEDUP_ENABLED=True)은
+    {law}_bm25_dedup.pkl을 사용합니다. 이 파일이 없으면 첫 기동 때 모든 법률의 인덱스와 청크 서명을
+    다시 만들므로 (18개 법률 기준 약 10초) Docker 이미지는 빌드 단계에서 미리 생성합니다.
+    """
+    suffixes = []
+    if settings.BM25_TOKENIZER != "whitespace":
+        suffixes.append(f"{settings.BM25_TOKENIZER}-v{TOKENIZER_VERSION}")
+    if settings.DEDUP_ENABLED:
+        suffixes.append("dedup")
+    if not suffixes:
+        return os.path.join(settings.BM25_CACHE_DIR, f"{law_name}_bm25.pkl")
+    return os.path.join(settings.BM25_CACHE_DIR, f"{law_name}_bm25_{'_'.join(suffixes)}.pkl")
+
+
+def load_bm25_source_documents(law_name: str) -> List[Document]:
+    """BM25 인덱스를 새로 만들 때 쓸 원본 문서를 불러옵니다."""
+    # 기존 공백 분리 캐시에 원본 문서가 들어 있으면 Chroma를 열지 않고 재사용합니다.
+    base_cache_path = os.path.join(settings.BM25_CACHE_DIR, f"{law_name}_bm25.pkl")
+    if os.path.exists(base_cache_path):
+        with open(base_cache_path, 'rb') as f:
+            return pickle.load(f).docs
+    
+    if law_name not in vector_stores:
+        return []
+    
+    all_docs_data = vector_stores[law_name].get()
+    return [
+        Document(
+            page_content=all_docs_data['documents'][i],
+            metadata=all_docs_data['metadatas'][i] if all_docs_data['metadatas'] else {}
+        )
+        for i in range(len(all_docs_data['documents']))
+    ]
+
+
+def build_bm25_retriever(docs_list: List[Document]) -> "BM25Retriever":
+    """설정된 토크나이저로 BM25 인덱스를 만듭니다. (근사 중복 청크는 하나만 색인)"""
+    BM25Retriever = lazy_import("langchain_community.retrievers", "BM25Retriever")
+    
+    docs_list = collapse_near_duplicates(docs_list)
+    if settings.BM25_TOKENIZER == "whitespace":
+        bm25_retriever = BM25Retriever.from_documents(docs_list)
+    else:
+        bm25_retriever = BM25Retriever.from_documents(
+            docs_list,
+            preprocess_func=get_tokenizer(settings.BM25_TOKENIZER)
+        )
+        # 질의 토큰화는 메모이즈된 토크나이저로 교체 (색인과 같은 규칙)
+        bm25_retriever.preprocess_func = QueryTokenizer(settings.BM25_TOKENIZER)
+    
+    bm25_retriever.k = settings.TOP_K_BM25
+    return bm25_retriever
 
 
 def load_bm25_retrievers():
-    """BM25 retriever를 캐시에서 로드합니다."""
+    """BM25 retriever를 캐시에서 로드합니다. (이미 로드된 법률은 건너뜀)"""
     global bm25_retrievers
     
-    print("BM25 인덱스 로드 중...")
+    print(f"BM25 인덱스 로드 중... (토크나이저: {settings.BM25_TOKENIZER})")
     
+    # pickle 로드 시 필요한 BM25Retriever 클래스를 미리 import (시간 기록용)
+    lazy_import("langchain_community.retrievers")
     os.makedirs(settings.BM25_CACHE_DIR, exist_ok=True)
+    loaded_laws = []
     
-    for law_name, vectorstore in vector_stores.items():
-        cache_path = os.path.join(settings.BM25_CACHE_DIR, f"{law_name}_bm25.pkl")
+    for law_name in list_law_collections():
+        if law_name in bm25_retrievers:
+            continue
+        
+        cache_path = bm25_cache_path(law_name)
         
         if os.path.exists(cache_path):
             with open(cache_path, 'rb') as f:
-                bm25_retrievers[law_name] = pickle.load(f)
+                bm25_retriever = pickle.load(f)
         else:
             # 캐시가 없으면 생성
-            all_docs_data = vectorstore.get()
-            docs_list = [
-                Document(
-                    page_content=all_docs_data['documents'][i],
-                    metadata=all_docs_data['metadatas'][i] if all_docs_data['metadatas'] else {}
-                )
-                for i in range(len(all_docs_data['documents']))
-            ]
+            docs_list = load_bm25_source_documents(law_name)
+            if not docs_list:
+                continue
             
-            bm25_retriever = BM25Retriever.from_documents(docs_list)
-            bm25_retriever.k = settings.TOP_K_BM25
+            bm25_retriever = build_bm25_retriever(docs_list)
+            print(
+                f"  - {law_name}: 문서 {len(docs_list)}개 -> {len(bm25_retriever.docs)}개 (근사 중복 제거), "
+                f"어휘 {len(bm25_retriever.vectorizer.idf)}개"
+            )
             
             with open(cache_path, 'wb') as f:
                 pickle.dump(bm25_retriever, f)
-            
-            bm25_retrievers[law_name] = bm25_retriever
+        
+        # 검색 결과 병합 시 O(1)로 조회할 청크 서명 (빌드 시 계산해 캐시)
+        if settings.DEDUP_ENABLED:
+            load_signatures(law_name, bm25_retriever.docs)
+        
+        bm25_retrievers[law_name] = bm25_retriever
+        loaded_laws.append(law_name)
     
     print(f"✅ {len(bm25_retrievers)}개의 BM25 인덱스 로드 완료")
+    if loaded_laws:
+        bump_index_generation(f"BM25 인덱스 로드 ({len(loaded_laws)}개)", bm25_documents())
+
+
+def bm25_documents():
+    """현재 로드된 모든 BM25 인덱스 문서"""
+    return chain.from_iterable(bm25_retriever.docs for bm25_retriever in list(bm25_retrievers.values()))
+
+
+def preload_indexes():
+    """
+    pre-fork 서버의 부모 프로세스에서 BM25 인덱스를 미리 로드합니다.
+    
+    fork된 워커는 이 메모리를 copy-on-write로 공유하므로 워커 수만큼 인덱스를
+    다시 읽거나 메모리를 늘리지 않습니다. Chroma는 fork 이후 각 워커에서 엽니다.
+    (Chroma 클라이언트와 HTTP 커넥션, 백그라운드 스레드는 fork-safe하지 않음)
+    """
+    global indexes_preloaded
+    
+    load_bm25_retrievers()
+    indexes_preloaded = True
 
 
 def setup_retriever_chain():
@@ -163,66 +299,450 @@ def setup_retriever_chain():
 # ============================================================
 # 검색 함수들
 # ============================================================
-def retrieve_from_single_law(law_name: str, query: str) -> List[Document]:
-    """단일 법률에서 하이브리드 검색을 수행합니다."""
+def fuse_ranked_scores(
+    doc_lists: List[List[Document]],
+    weights: List[float],
+    c: int = 60
+) -> List[Tuple[Document, float]]:
+    """EnsembleRetriever와 동일한 가중 RRF 방식으로 검색 결과를 합치고 (문서, RRF 점수)를 반환합니다."""
+    rrf_score = defaultdict(float)
+    for doc_list, weight in zip(doc_lists, weights):
+        for rank, doc in enumerate(doc_list, start=1):
+            rrf_score[doc.page_content] += weight / (rank + c)
+
+    seen = set()
+    unique_docs = []
+    for doc in chain.from_iterable(doc_lists):
+        if doc.page_content not in seen:
+            seen.add(doc.page_content)
+            unique_docs.append(doc)
+
+    scored_docs = [(doc, rrf_score[doc.page_content]) for doc in unique_docs]
+    return sorted(scored_docs, key=lambda pair: pair[1], reverse=True)
+
+
+def fuse_ranked_documents(
+    doc_lists: List[List[Document]],
+    weights: List[float],
+    c: int = 60
+) -> List[Document]:
+    """EnsembleRetriever와 동일한 가중 RRF 방식으로 검색 결과를 합칩니다."""
+    return [doc for doc, _ in fuse_ranked_scores(doc_lists, weights, c)]
+
+
+def rank_single_law_by_vector(
+    law_name: str,
+    query: str,
+    query_vector: Optional[List[float]],
+    top_k_vector: Optional[int] = None,
+    top_k_bm25: Optional[int] = None,
+    vector_weight: Optional[float] = None,
+    bm25_weight: Optional[float] = None
+) -> List[Tuple[Document, float]]:
+    """
+    미리 계산된 쿼리 임베딩으로 단일 법률 하이브리드 검색을 수행하고 (문서, RRF 점수)를 반환합니다.
+
+    임베딩 API를 호출하지 않으며, 공유 BM25 retriever의 k 값도 변경하지 않습니다.
+    값을 넘기지 않은 파라미터는 settings 값을 사용합니다.
+    query_vector가 None이면 (임베딩 실패) BM25 결과만 사용합니다.
+    """
     if law_name not in vector_stores or law_name not in bm25_retrievers:
         return []
+
+    top_k_vector = settings.TOP_K_VECTOR if top_k_vector is None else top_k_vector
+    top_k_bm25 = settings.TOP_K_BM25 if top_k_bm25 is None else top_k_bm25
+    vector_weight = settings.VECTOR_WEIGHT if vector_weight is None else vector_weight
+    bm25_weight = settings.BM25_WEIGHT if bm25_weight is None else bm25_weight
+
+    vector_docs = []
+    if query_vector is not None:
+        vector_docs = vector_stores[law_name].similarity_search_by_vector(query_vector, k=top_k_vector)
+
+    return fuse_with_bm25(law_name, query, vector_docs, top_k_bm25, vector_weight, bm25_weight)
+
+
+def fuse_with_bm25(
+    law_name: str,
+    query: str,
+    vector_docs: List[Document],
+    top_k_bm25: int,
+    vector_weight: float,
+    bm25_weight: float
+) -> List[Tuple[Document, float]]:
+    """벡터 검색 결과에 BM25 결과를 RRF로 합칩니다."""
+    bm25_retriever = bm25_retrievers[law_name]
+    bm25_docs = bm25_retriever.vectorizer.get_top_n(
+        bm25_retriever.preprocess_func(query),
+        bm25_retriever.docs,
+        n=top_k_bm25
+    )
+
+    return fuse_ranked_scores([vector_docs, bm25_docs], [vector_weight, bm25_weight])
+
+
+def retrieve_from_single_law_by_vector(
+    law_name: str,
+    query: str,
+    query_vector: Optional[List[float]],
+    top_k_vector: Optional[int] = None,
+    top_k_bm25: Optional[int] = None,
+    vector_weight: Optional[float] = None,
+    bm25_weight: Optional[float] = None
+) -> List[Document]:
+    """rank_single_law_by_vector의 결과에서 문서만 반환합니다."""
+    scored_docs = rank_single_law_by_vector(
+        law_name, query, query_vector, top_k_vector, top_k_bm25, vector_weight, bm25_weight
+    )
+    return [doc for doc, _ in scored_docs]
+
+
+def embed_queries(queries: List[str], deadline: Optional[Deadline] = None) -> List[Optional[List[float]]]:
+    """
+    여러 질문을 한 번의 Upstage query 모델 배치 요청으로 임베딩합니다. (요청당 최대 100개)
+
+    서킷이 열려 있거나 제한 시간을 넘기거나 실패하면 모두 None을 반환하여 BM25만 사용합니다.
+    """
+    if not queries:
+        return []
+
+    return call_upstream(
+        "embedding",
+        lambda: embed_query_batch(embedding_model, queries),
+        timeout=stage_timeout(deadline, "embedding"),
+        fallback=lambda: [None] * len(queries)
+    )
+
+
+def retrieve_batch_from_single_law(
+    law_name: str,
+    queries: List[str],
+    query_vectors: List[Optional[List[float]]]
+) -> List[List[Tuple[Document, float]]]:
+    """
+    한 법률 인덱스에서 여러 질문을 검색하고 질문별 (문서, RRF 점수)를 반환합니다.
+
+    임베딩이 있는 질문들은 한 번의 다중 벡터 쿼리로 검색하고, 임베딩이 None인 질문은 BM25만 사용합니다.
+    벡터 검색에 실패하면 이 법률의 결과는 모두 빈 목록입니다.
+    """
+    if law_name not in vector_collections or law_name not in bm25_retrievers:
+        return [[] for _ in queries]
     
     try:
-        vector_retriever = vector_stores[law_name].as_retriever(
-            search_type="similarity",
-            search_kwargs={'k': settings.TOP_K_VECTOR}
-        )
-        
-        bm25_retriever = bm25_retrievers[law_name]
-        bm25_retriever.k = settings.TOP_K_BM25
+        targets = [i for i, vector in enumerate(query_vectors) if vector is not None]
+        vector_docs = [[] for _ in queries]
+        if targets:
+            results = vector_collections[law_name].query(
+                query_embeddings=[query_vectors[i] for i in targets],
+                n_results=settings.TOP_K_VECTOR,
+                include=["documents", "metadatas"]
+            )
+            for i, ids, contents, metadatas in zip(
+                targets, results["ids"], results["documents"], results["metadatas"]
+            ):
+                vector_docs[i] = [
+                    Document(id=doc_id, page_content=content, metadata=metadata or {})
+                    for doc_id, content, metadata in zip(ids, contents, metadatas)
+                ]
         
-        ensemble = EnsembleRetriever(
-            retrievers=[vector_retriever, bm25_retriever],
-            weights=[settings.VECTOR_WEIGHT, settings.BM25_WEIGHT]
+        return [
+            fuse_with_bm25(
+                law_name, query, docs, settings.TOP_K_BM25, settings.VECTOR_WEIGHT, settings.BM25_WEIGHT
+            )
+            for query, docs in zip(queries, vector_docs)
+        ]
+    except Exception as e:
+        print(f"⚠️ {law_name} 배치 검색 실패: {e}")
+        return [[] for _ in queries]
+
+
+def collapse_ranked(scored_docs: List[Tuple[Document, float]]) -> List[Document]:
+    """
+    여러 법률의 결과를 RRF 점수 순으로 정렬한 뒤 근사 중복을 제거합니다.
+    (법률 검색이 끝난 순서와 관계없이 중복 중 점수가 가장 높은 청크가 남음)
+    """
+    ranked = sorted(scored_docs, key=lambda item: item[1], reverse=True)
+    return collapse_near_duplicates([doc for doc, _ in ranked])
+
+
+def get_retriever_batch(queries: List[str], deadline: Optional[Deadline] = None) -> List[List[Document]]:
+    """
+    여러 질문을 한꺼번에 검색합니다.
+    
+    법률 선택은 동시에 실행하고, 임베딩은 한 번의 배치 요청으로 만들며,
+    법률별로 해당 질문들을 모아 각 인덱스를 한 번의 다중 벡터 쿼리로 검색합니다.
+    임베딩에 실패하면 BM25만으로 검색하므로 스트리밍 중인 응답이 예외로 끊기지 않습니다.
+    법률 선택과 임베딩은 /ask와 같은 단계별 제한 시간(deadline)을 쓰고, 넘기면 로컬 라우터/BM25로 대체합니다.
+    """
+    def select_all():
+        selections = retriever_chain.batch(
+            [{'query': query} for query in queries],
+            config={"max_concurrency": settings.BATCH_MAX_CONCURRENCY},
+            return_exceptions=True
         )
-        
-        return ensemble.invoke(query)
+        return [None if isinstance(selection, Exception) else selection.targets for selection in selections]
+    
+    with trace_stage("law_selection") as stage:
+        selections = call_upstream(
+            "law_selection",
+            select_all,
+            timeout=stage_timeout(deadline, "law_selection"),
+            fallback=lambda: [None] * len(queries)
+        )
+        # 선택에 실패한 질문은 로컬 라우터로 대체
+        selected_laws = [
+            route_laws_locally(query) if laws is None else laws
+            for query, laws in zip(queries, selections)
+        ]
+        stage["queries"] = len(queries)
+    
+    # 법률이 선택된 질문만 임베딩
+    targets = [i for i, laws in enumerate(selected_laws) if laws]
+    with trace_stage("embedding") as stage:
+        vectors = dict(zip(targets, embed_queries([queries[i] for i in targets], deadline)))
+        stage["ok"] = sum(1 for vector in vectors.values() if vector is not None)
+    
+    law_to_queries = defaultdict(list)
+    for i in targets:
+        for law in selected_laws[i]:
+            law_to_queries[law].append(i)
+    
+    print(f"📚 배치 검색: 질문 {len(queries)}개, 법률 {len(law_to_queries)}개")
+    
+    # (질문 인덱스, 법률) -> 검색 결과
+    law_results = {}
+    if law_to_queries:
+        with ThreadPoolExecutor(max_workers=min(len(law_to_queries), settings.MAX_WORKERS)) as executor:
+            futures = {
+                executor.submit(
+                    retrieve_batch_from_single_law,
+                    law,
+                    [queries[i] for i in indices],
+                    [vectors[i] for i in indices]
+                ): (law, indices)
+                for law, indices in law_to_queries.items()
+            }
+            for future in as_completed(futures):
+                law, indices = futures[future]
+                for i, docs in zip(indices, future.result()):
+                    law_results[(i, law)] = docs
+    
+    batch_docs = []
+    for i, laws in enumerate(selected_laws):
+        unique_docs = collapse_ranked(
+            [scored for law in laws for scored in law_results.get((i, law), [])]
+        )
+        batch_docs.append(unique_docs[:settings.MAX_DOCS_LIMIT])
+    
+    return batch_docs
+
+
+# 로컬 법률 선택용 키워드 (긴 키워드부터 매칭하고, 매칭된 부분은 지워 "지방소득세"가 "소득세"로도 잡히지 않게 함)
+LOCAL_ROUTER_KEYWORDS = sorted([
+    ("국세기본", "national-tax-framework-act"),
+    ("가산세", "national-tax-framework-act"),
+    ("경정청구", "national-tax-framework-act"),
+    ("소득세", "income-tax-act"),
+    ("근로소득", "income-tax-act"),
+    ("연말정산", "income-tax-act"),
+    ("법인세", "corporate-tax-act"),
+    ("상속", "inheritance-gift-tax-act"),
+    ("증여", "inheritance-gift-tax-act"),
+    ("종합부동산세", "comprehensive-real-estate-tax-act"),
+    ("종부세", "comprehensive-real-estate-tax-act"),
+    ("부가가치세", "value-added-tax-act"),
+    ("부가세", "value-added-tax-act"),
+    ("세금계산서", "value-added-tax-act"),
+    ("개별소비세", "individual-consumption-tax-act"),
+    ("교통에너지환경세", "transportation-energy-environment-tax-act"),
+    ("교통·에너지·환경세", "transportation-energy-environment-tax-act"),
+    ("주세", "liquor-tax-act"),
+    ("증권거래세", "securities-transaction-tax-act"),
+    ("지방소득세", "local-tax-act"),
+    ("취득세", "local-tax-act"),
+    ("등록면허세", "local-tax-act"),
+    ("재산세", "local-tax-act"),
+    ("지방세기본", "local-tax-framework-act"),
+    ("지방세징수", "local-tax-collection-act"),
+    ("원천징수", "corporation_withholding-tax"),
+    ("공익법인", "corporation_public_cooperation"),
+], key=lambda item: len(item[0]), reverse=True)
+
+
+def route_laws_locally(query: str, max_laws: int = 2) -> List[str]:
+    """
+    LLM 없이 법률을 고릅니다. 법률 선택 호출이 제한 시간을 넘기거나 실패했을 때,
+    또는 서킷이 열려 있을 때 사용합니다.
+    
+    법률명 키워드를 먼저 찾고, 키워드가 없으면 BM25 최고 점수가 가장 높은 법률 하나를 고릅니다.
+    """
+    text = query.replace(" ", "")
+    selected_laws = []
+    for keyword, law_name in LOCAL_ROUTER_KEYWORDS:
+        if keyword in text:
+            text = text.replace(keyword, " ")
+            if law_name not in selected_laws:
+                selected_laws.append(law_name)
+    
+    if not selected_laws:
+        scores = {}
+        for law_name, bm25_retriever in bm25_retrievers.items():
+            law_scores = bm25_retriever.vectorizer.get_scores(bm25_retriever.preprocess_func(query))
+            if len(law_scores):
+                scores[law_name] = float(max(law_scores))
+        best = max(scores.items(), key=lambda item: item[1], default=None)
+        if best is not None and best[1] > 0:
+            selected_laws = [best[0]]
+    
+    selected_laws = [law_name for law_name in selected_laws if law_name in vector_stores or law_name in bm25_retrievers]
+    print(f"🧭 로컬 법률 선택: {selected_laws[:max_laws]}")
+    return selected_laws[:max_laws]
+
+
+def select_laws(query: str, deadline: Optional[Deadline] = None) -> List[str]:
+    """질문과 관련된 법률을 선택합니다. (실패하면 로컬 라우터로 대체)"""
+    with trace_stage("law_selection") as stage:
+        selected_laws = call_upstream(
+            "law_selection",
+            lambda: retriever_chain.invoke({'query': query}).targets,
+            timeout=stage_timeout(deadline, "law_selection"),
+            fallback=lambda: route_laws_locally(query),
+            hedge=True
+        )
+        stage["laws"] = selected_laws
+    
+    if not selected_laws:
+        print("⚠️ 선택된 법률 없음")
+    else:
+        print(f"📚 선택된 법률: {selected_laws}")
+    
+    return selected_laws
+
+
+async def aselect_laws(query: str, deadline: Optional[Deadline] = None) -> List[str]:
+    """select_laws의 비동기 버전 (요청이 취소되면 LLM 호출도 함께 중단됨)"""
+    async def select():
+        return (await retriever_chain.ainvoke({'query': query})).targets
+    
+    with trace_stage("law_selection") as stage:
+        selected_laws = await acall_upstream(
+            "law_selection",
+            select,
+            timeout=stage_timeout(deadline, "law_selection"),
+            fallback=lambda: route_laws_locally(query),
+            hedge=True
+        )
+        stage["laws"] = selected_laws
+    
+    if not selected_laws:
+        print("⚠️ 선택된 법률 없음")
+    else:
+        print(f"📚 선택된 법률: {selected_laws}")
+    
+    return selected_laws
+
+
+def embed_query_guarded(query: str, deadline: Optional[Deadline] = None) -> Optional[List[float]]:
+    """쿼리 임베딩을 만듭니다. 제한 시간을 넘기거나 실패하면 None (BM25만 사용)"""
+    return call_upstream(
+        "embedding",
+        lambda: query_embedding.embed_query(query),
+        timeout=stage_timeout(deadline, "embedding"),
+        fallback=lambda: None,
+        hedge=True
+    )
+
+
+def safe_rank_single_law(
+    law_name: str,
+    query: str,
+    query_vector: Optional[List[float]]
+) -> Optional[List[Tuple[Document, float]]]:
+    """검색에 실패하면 None을 반환합니다. (결과 없음과 구분해 불완전한 결과를 캐시하지 않음)"""
+    try:
+        return rank_single_law_by_vector(law_name, query, query_vector)
     except Exception as e:
         print(f"⚠️ {law_name} 검색 실패: {e}")
-        return []
+        return None
 
 
-def get_retriever_parallel(query: str) -> List[Document]:
-    """병렬 처리로 여러 법률에서 동시 검색합니다."""
-    try:
-        result = retriever_chain.invoke({'query': query})
-        selected_laws = result.targets
-        
-        if not selected_laws:
-            print("⚠️ 선택된 법률 없음")
-            return []
-        
-        print(f"📚 선택된 법률: {selected_laws}")
-        
-        all_docs = []
+def retrieve_from_laws(
+    query: str,
+    selected_laws: List[str],
+    cancel_event: Optional[threading.Event] = None,
+    deadline: Optional[Deadline] = None
+) -> List[Document]:
+    """
+    선택된 법률들에서 병렬로 검색하고 중복을 제거합니다.
+    
+    쿼리 임베딩은 한 번만 만들어 모든 법률 검색에 사용하고, 검색 결과 캐시에 있으면 둘 다 건너뜁니다.
+    cancel_event가 설정되면 아직 시작하지 않은 검색은 취소하고 빈 결과를 반환합니다.
+    """
+    if not selected_laws:
+        return []
+    
+    # 같은 질문/법률/설정/인덱스 세대의 결과가 캐시에 있으면 임베딩과 검색을 건너뜁니다.
+    cache_key = retrieval_cache_key(query, selected_laws)
+    with trace_stage("retrieval_cache") as stage:
+        cached_docs = get_cached_retrieval(cache_key)
+        stage["hit"] = cached_docs is not None
+    if cached_docs is not None:
+        print(f"✅ 검색 결과 캐시 사용: {len(cached_docs)}개")
+        record_decision(laws=list(selected_laws), cached=True, documents=[document_id(doc) for doc in cached_docs])
+        return cached_docs
+    
+    with trace_stage("embedding") as stage:
+        query_vector = embed_query_guarded(query, deadline)
+        stage["ok"] = query_vector is not None
+    
+    with trace_stage("retrieval") as stage:
+        stage["laws"] = len(selected_laws)
+        stage["vector_search"] = query_vector is not None
+        all_scored_docs = []
+        scores = {}
+        complete = query_vector is not None
         with ThreadPoolExecutor(max_workers=min(len(selected_laws), settings.MAX_WORKERS)) as executor:
-            futures = {executor.submit(retrieve_from_single_law, law, query): law for law in selected_laws}
+            futures = {
+                executor.submit(safe_rank_single_law, law, query, query_vector): law
+                for law in selected_laws
+            }
             
             for future in as_completed(futures):
-                try:
-                    docs = future.result()
-                    all_docs.extend(docs)
-                except Exception as e:
-                    print(f"⚠️ 검색 실패: {e}")
+                if cancel_event is not None and cancel_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    print("🛑 검색 취소됨")
+                    return []
+                scored_docs = future.result()
+                if scored_docs is None:
+                    complete = False
                     continue
+                all_scored_docs.extend(scored_docs)
+                for doc, score in scored_docs:
+                    scores[doc.page_content] = max(score, scores.get(doc.page_content, 0.0))
         
-        # 중복 제거
-        seen = set()
-        unique_docs = []
-        for doc in all_docs:
-            if doc.page_content not in seen:
-                seen.add(doc.page_content)
-                unique_docs.append(doc)
+        # 중복 제거 (법률 간 근사 중복 포함, 점수가 높은 청크를 남김)
+        unique_docs = collapse_ranked(all_scored_docs)
+        stage["candidates"] = len(all_scored_docs)
+        stage["unique"] = len(unique_docs)
         
         print(f"✅ 검색된 문서: {len(unique_docs)}개")
-        return unique_docs[:settings.MAX_DOCS_LIMIT]
+        result = unique_docs[:settings.MAX_DOCS_LIMIT]
         
+        # 임베딩이나 일부 법률 검색이 실패한 결과(BM25만 사용 등)는 캐시하지 않습니다.
+        if complete:
+            store_retrieval(cache_key, [(doc, scores[doc.page_content]) for doc in result])
+        record_decision(
+            laws=list(selected_laws),
+            vector_search=query_vector is not None,
+            documents=[document_id(doc) for doc in result]
+        )
+        return result
+
+
+def get_retriever_parallel(query: str, deadline: Optional[Deadline] = None) -> List[Document]:
+    """병렬 처리로 여러 법률에서 동시 검색합니다."""
+    try:
+        return retrieve_from_laws(query, select_laws(query, deadline), deadline=deadline)
     except Exception as e:
         print(f"⚠️ 검색 오류: {e}")
         return []
@@ -234,6 +754,8 @@ def get_retriever_parallel(query: str) -> List[Document]:
 def initialize_retriever():
     """검색 시스템을 초기화합니다."""
     load_vector_stores()
+    if indexes_preloaded:
+        print(f"♻️ 부모 프로세스에서 물려받은 BM25 인덱스 {len(bm25_retrievers)}개 사용")
     load_bm25_retrievers()
     # setup_retriever_chain()은 LLM 초기화 후에 호출되어야 함
     print("✅ 검색 시스템 초기화 완료\n")
\ No newline at end of file
@@ -0,0 +1,252 @@
+"""
+서버 측 대화 세션 저장소
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
+
+from app.config import settings
+
+
+# ============================================================
+# 세션 데이터
+# ============================================================
+@dataclass
+class Session:
+    session_id: str
+    history: List[Dict] = field(default_factory=list)
+    summary: Optional[str] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "history": self.history,
+            "summary": self.summary,
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, session_id: str, data: str, updated_at: float) -> "Session":
+        payload = json.loads(data)
+        return cls(
+            session_id=session_id,
+            history=payload.get("history", []),
+            summary=payload.get("summary"),
+            updated_at=updated_at,
+        )
+
+
+# ============================================================
+# 세션 저장소
+# ============================================================
+class SessionStore:
+    """
+    최근 대화와 누적 요약을 보관하는 LRU + TTL 세션 저장소
+
+    메모리에는 최대 max_sessions개만 유지하고, db_path가 주어지면
+    SQLite에도 기록하여 재시작이나 메모리 축출 후에도 세션을 복원합니다.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        ttl_seconds: int,
+        max_history_messages: int,
+        db_path: Optional[str] = None
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_history_messages = max_history_messages
+        self.db_path = db_path
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    # ---------- 내부 유틸 ----------
+    def _is_expired(self, session: Session, now: float) -> bool:
+        return now - session.updated_at > self.ttl_seconds
+
+    def _persist(self, session: Session):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+            (session.session_id, session.to_json(), session.updated_at)
+        )
+        self._db.commit()
+
+    def _load(self, session_id: str) -> Optional[Session]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return Session.from_json(session_id, row[0], row[1])
+
+    def _put(self, session: Session):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        # 메모리 상한을 넘으면 가장 오래 사용하지 않은 세션부터 내보냅니다 (SQLite에는 남아 있음)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _evict_expired(self, now: float):
+        # 조회만 해도 LRU 순서는 바뀌지만 updated_at은 그대로이므로 순서가 아니라 updated_at으로 찾습니다.
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if self._is_expired(session, now)
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+        if self._db is not None:
+            self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl_seconds,))
+            self._db.commit()
+
+    def _get_locked(self, session_id: str) -> Optional[Session]:
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._load(session_id)
+        if session is None:
+            return None
+        if self._is_expired(session, now):
+            self._delete_locked(session_id)
+            return None
+        self._put(session)
+        return session
+
+    def _delete_locked(self, session_id: str) -> bool:
+        removed = self._sessions.pop(session_id, None) is not None
+        if self._db is not None:
+            cursor = self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+            removed = removed or cursor.rowcount > 0
+        return removed
+
+    # ---------- 공개 API ----------
+    def create(self, session_id: Optional[str] = None) -> Session:
+        """새 세션을 만듭니다."""
+        with self._lock:
+            now = time.time()
+            self._evict_expired(now)
+            session = Session(session_id=session_id or uuid.uuid4().hex, updated_at=now)
+            self._put(session)
+            self._persist(session)
+            return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """세션을 조회합니다. 만료되었거나 없으면 None을 반환합니다."""
+        with self._lock:
+            return self._get_locked(session_id)
+
+    def get_or_create(self, session_id: str) -> Session:
+        """세션을 조회하고, 없으면 같은 ID로 새로 만듭니다."""
+        session = self.get(session_id)
+        if session is None:
+            session = self.create(session_id)
+        return session
+
+    def append_turn(self, session_id: str, question: str, answer: str) -> List[Dict]:
+        """
+        질문/답변 한 턴을 세션에 추가합니다.
+
+        Returns:
+            보관 한도를 넘어 최근 대화에서 밀려난 메시지 목록 (요약 대상)
+        """
+        with self._lock:
+            now = time.time()
+            session = self._get_locked(session_id) or Session(session_id=session_id)
+            session.history.append({"role": "user", "content": question})
+            session.history.append({"role": "assistant", "content": answer})
+
+            overflow = []
+            if len(session.history) > self.max_history_messages:
+                cut = len(session.history) - self.max_history_messages
+                overflow = session.history[:cut]
+                session.history = session.history[cut:]
+
+            session.updated_at = now
+            self._put(session)
+            self._persist(session)
+            return overflow
+
+    def set_summary(self, session_id: str, summary: str):
+        """세션의 누적 요약을 갱신합니다."""
+        with self._lock:
+            session = self._get_locked(session_id)
+            if session is None:
+                return
+            session.summary = summary
+            session.updated_at = time.time()
+            self._persist(session)
+
+    def delete(self, session_id: str) -> bool:
+        """세션을 삭제합니다."""
+        with self._lock:
+            return self._delete_locked(session_id)
+
+
+# ============================================================
+# 전역 변수
+# ============================================================
+session_store: Optional[SessionStore] = None
+
+
+# ============================================================
+# 세션 요약
+# ============================================================
+def summarize_session_overflow(session_id: str, messages: List[Dict]):
+    """
+    최근 대화에서 밀려난 메시지를 백그라운드 누적 요약에 등록합니다.
+    요약이 끝나면 세션 요약이 자동으로 갱신됩니다.
+    밀려난 메시지는 프롬프트에 더 이상 들어가지 않으므로 요약 기준(메시지/토큰 수)을 기다리지 않고 바로 요약합니다.
+    """
+    from app.services import summarization
+
+    session = session_store.get(session_id)
+    if session is None or not messages:
+        return
+
+    summarization.summary_job_manager.submit_new_messages(
+        session_id,
+        messages,
+        previous_summary=session.summary,
+        on_complete=lambda summary: session_store.set_summary(session_id, summary),
+        eager=True,
+    )
+
+
+# ============================================================
+# 초기화 함수
+# ============================================================
+def initialize_session_store():
+    """세션 저장소를 초기화합니다."""
+    global session_store
+
+    print("세션 저장소 초기화 중...")
+
+    session_store = SessionStore(
+        max_sessions=settings.SESSION_MAX_SESSIONS,
+        ttl_seconds=settings.SESSION_TTL_SECONDS,
+        max_history_messages=settings.SESSION_HISTORY_MESSAGES,
+        db_path=settings.SESSION_DB_PATH,
+    )
+
+    print("✅ 세션 저장소 초기화 완료")
+    return session_store
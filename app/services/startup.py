@@ -0,0 +1,137 @@
+"""
+서버 시작 순서 및 시작 프로파일
+
+무거운 라이브러리(langchain_chroma, langchain_openai, langchain_community, langgraph 등)는
+각 초기화 단계에서 처음 필요할 때 import하고, 서로 독립적인 단계는 동시에 실행합니다.
+import와 단계별 소요 시간은 startup_profile에 기록되어 /health/startup 으로 확인할 수 있습니다.
+"""
+import importlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from app.config import settings
+
+
+# 초기화 단계에서 lazy import되는 무거운 모듈
+HEAVY_MODULES = [
+    "langchain_chroma",
+    "langchain_upstage",
+    "langchain_openai",
+    "langchain_community.retrievers",
+    "langchain_community.tools",
+    "langgraph.graph",
+    "numpy",
+]
+
+startup_profile = {"imports": {}, "steps": {}, "total_ms": None}
+_profile_lock = threading.Lock()
+
+
+def _elapsed_ms(start_time: float) -> float:
+    return round((time.perf_counter() - start_time) * 1000, 1)
+
+
+# ============================================================
+# 프로파일링 유틸
+# ============================================================
+def lazy_import(module_name: str, attr: Optional[str] = None):
+    """
+    모듈을 처음 사용할 때 import하고, 처음 import에 걸린 시간을 기록합니다.
+    (공유 의존성은 먼저 import한 쪽의 시간에 포함됩니다)
+    """
+    already_loaded = module_name in sys.modules
+    start_time = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if not already_loaded:
+        with _profile_lock:
+            startup_profile["imports"].setdefault(module_name, _elapsed_ms(start_time))
+    return getattr(module, attr) if attr else module
+
+
+def preimport_modules():
+    """
+    pre-fork 서버의 부모 프로세스에서 무거운 모듈을 미리 import합니다.
+    워커는 fork 시 이미 import된 모듈을 물려받으므로 워커마다 다시 import하지 않습니다.
+    """
+    for module_name in HEAVY_MODULES:
+        lazy_import(module_name)
+
+
+@contextmanager
+def profile_step(name: str):
+    """초기화 단계의 소요 시간을 기록합니다."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _profile_lock:
+            startup_profile["steps"][name] = _elapsed_ms(start_time)
+
+
+def run_concurrent_steps(steps: Dict[str, Callable]):
+    """독립적인 초기화 단계를 스레드에서 동시에 실행합니다. 하나라도 실패하면 예외를 다시 던집니다."""
+    def run(name: str, step: Callable):
+        with profile_step(name):
+            step()
+
+    with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="startup") as executor:
+        futures = [executor.submit(run, name, step) for name, step in steps.items()]
+        for future in futures:
+            future.result()
+
+
+def log_startup_profile():
+    """시작 프로파일을 소요 시간이 긴 순서로 출력합니다."""
+    print("⏱️ 시작 프로파일")
+    for kind in ("imports", "steps"):
+        for name, elapsed_ms in sorted(startup_profile[kind].items(), key=lambda item: -item[1]):
+            print(f"  - [{kind}] {name}: {elapsed_ms}ms")
+    print(f"  = 합계: {startup_profile['total_ms']}ms")
+
+
+# ============================================================
+# 시작 순서
+# ============================================================
+def initialize_services():
+    """
+    모든 서비스를 초기화합니다.
+
+    1단계 (동시 실행): 벡터스토어, BM25, LLM 클라이언트, 웹 검색 도구, 그래프, 세션 저장소
+    2단계 (LLM 의존): 관련성 체크 체인, 법률 선택 체인
+    """
+    from app.services import retriever, generator, workflow, summarization, session
+
+    start_time = time.perf_counter()
+
+    def initialize_llm_clients():
+        generator.initialize_llm()
+        summarization.initialize_summary_llm()
+
+    steps = {
+        "vector_stores": retriever.load_vector_stores,
+        "bm25": retriever.load_bm25_retrievers,
+        "llm_clients": initialize_llm_clients,
+        "web_search": workflow.initialize_web_search,
+        "graph": workflow.build_graph,
+        "sessions": session.initialize_session_store,
+    }
+    if settings.STARTUP_CONCURRENT_INIT:
+        run_concurrent_steps(steps)
+    else:
+        for name, step in steps.items():
+            with profile_step(name):
+                step()
+
+    # BM25 캐시가 없는 법률은 Chroma 원본 문서로 만들어야 하므로 벡터스토어 로드 후 다시 확인합니다.
+    if set(retriever.vector_stores) - set(retriever.bm25_retrievers):
+        with profile_step("bm25_rebuild"):
+            retriever.load_bm25_retrievers()
+
+    with profile_step("chains"):
+        workflow.initialize_workflow()
+
+    startup_profile["total_ms"] = _elapsed_ms(start_time)
@@ -1,14 +1,24 @@
 """
 대화 요약 생성
 """
-from typing import List, Dict,Optional
-from langchain_openai import ChatOpenAI
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict,Optional, Callable, Tuple, AsyncGenerator
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.config import settings
+from app.services.tokens import count_tokens
+from app.services.startup import lazy_import
+from app.services.capture import defer_capture, is_replaying, record_upstream, replay_stream_lookup
 
 
 summary_llm = None
+summary_job_manager = None
 
 
 INITIAL_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
@@ -68,20 +78,40 @@ INCREMENTAL_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
 
 def initialize_summary_llm():
     """요약용 LLM을 초기화합니다."""
-    global summary_llm
+    global summary_llm, summary_job_manager
     
     print("요약 LLM 초기화 중...")
     
+    ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
+    
     summary_llm = ChatOpenAI(
         model=settings.SEARCH_MODEL,
         temperature=0.5,
-        max_tokens=1500
+        max_tokens=1500,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES
+    )
+    
+    summary_job_manager = SummaryJobManager(
+        trigger_messages=settings.SUMMARY_TRIGGER_MESSAGES,
+        trigger_tokens=settings.SUMMARY_TRIGGER_TOKENS,
+        max_entries=settings.SUMMARY_MAX_ENTRIES,
     )
     
     print("✅ 요약 LLM 초기화 완료")
     return summary_llm
 
 
+def format_conversation(messages: List[Dict]) -> str:
+    """요약 프롬프트에 넣을 대화 텍스트를 만듭니다."""
+    conversation_text = ""
+    for msg in messages:
+        role = "사용자" if msg["role"] == "user" else "AI"
+        content = msg.get("content", "")
+        conversation_text += f"{role}: {content}\n\n"
+    return conversation_text
+
+
 def generate_summary(conversation_history: List[Dict], previous_summary: Optional[str] = None) -> str:
     """대화 히스토리를 요약합니다. (누적 요약)"""
     if not conversation_history:
@@ -91,11 +121,7 @@ def generate_summary(conversation_history: List[Dict], previous_summary: Optiona
         raise RuntimeError("요약 LLM이 초기화되지 않았습니다.")
     
     # 새 대화 내용 포맷팅
-    conversation_text = ""
-    for msg in conversation_history:
-        role = "사용자" if msg["role"] == "user" else "AI"
-        content = msg.get("content", "")
-        conversation_text += f"{role}: {content}\n\n"
+    conversation_text = format_conversation(conversation_history)
     
     # 이전 요약이 있으면 누적 요약, 없으면 첫 요약
     if previous_summary:
@@ -110,4 +136,242 @@ def generate_summary(conversation_history: List[Dict], previous_summary: Optiona
             "conversation": conversation_text
         })
     
-    return response.content
\ No newline at end of file
+    return response.content
+
+# ============================================================
+# 백그라운드 누적 요약
+# ============================================================
+@dataclass
+class SummaryJob:
+    job_id: str
+    conversation_id: str
+    message_count: int
+    status: str = "pending"  # pending, running, done, failed
+    summary: Optional[str] = None
+    error: Optional[str] = None
+    chunks: List[str] = field(default_factory=list)
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+@dataclass
+class ConversationSummaryState:
+    summary: Optional[str] = None
+    # 요약됐거나 요약 대기 중인 메시지 수와 그 구간의 지문 (전체 대화를 다시 보내는 클라이언트용)
+    seen_count: int = 0
+    seen_fingerprint: str = ""
+    pending: List[Dict] = field(default_factory=list)
+    job: Optional[SummaryJob] = None
+    on_complete: Optional[Callable[[str], None]] = None
+    # 대기 메시지가 프롬프트에 더 이상 없으면 (세션 최근 대화에서 밀려난 경우) 기준과 관계없이 바로 요약
+    eager: bool = False
+
+
+def _fingerprint(messages: List[Dict]) -> str:
+    payload = json.dumps(
+        [(msg.get("role"), msg.get("content", "")) for msg in messages],
+        ensure_ascii=False
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryJobManager:
+    """
+    대화별 요약을 백그라운드에서 누적 갱신합니다.
+
+    - 아직 요약되지 않은 메시지만 INCREMENTAL_SUMMARY_PROMPT에 넣습니다.
+    - 메시지 수 또는 토큰 수가 기준을 넘을 때만 요약을 시작합니다. (eager 대화는 새 메시지가 오면 바로 시작)
+    - 대화당 동시에 하나의 작업만 실행하고, 그 사이에 들어온 메시지는 다음 작업으로 넘깁니다.
+    """
+
+    def __init__(self, trigger_messages: int, trigger_tokens: int, max_entries: int):
+        self.trigger_messages = trigger_messages
+        self.trigger_tokens = trigger_tokens
+        self.max_entries = max_entries
+        self._states: "OrderedDict[str, ConversationSummaryState]" = OrderedDict()
+        self._jobs: "OrderedDict[str, SummaryJob]" = OrderedDict()
+
+    # ---------- 내부 유틸 ----------
+    def _state(self, conversation_id: str) -> ConversationSummaryState:
+        state = self._states.get(conversation_id)
+        if state is None:
+            state = ConversationSummaryState()
+            self._states[conversation_id] = state
+        self._states.move_to_end(conversation_id)
+        while len(self._states) > self.max_entries:
+            self._states.popitem(last=False)
+        return state
+
+    def _should_trigger(self, pending: List[Dict]) -> bool:
+        if len(pending) >= self.trigger_messages:
+            return True
+        return count_tokens(format_conversation(pending), settings.SEARCH_MODEL) >= self.trigger_tokens
+
+    def _start_job(self, conversation_id: str, state: ConversationSummaryState) -> SummaryJob:
+        messages, state.pending = state.pending, []
+        job = SummaryJob(
+            job_id=uuid.uuid4().hex,
+            conversation_id=conversation_id,
+            message_count=len(messages),
+        )
+        state.job = job
+
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_entries:
+            self._jobs.popitem(last=False)
+
+        task = asyncio.create_task(self._run_job(job, state, messages, state.summary))
+        # 캡처 중인 요청이면 응답 후 끝나는 요약까지 같은 기록에 남깁니다.
+        defer_capture(task)
+        return job
+
+    async def _run_job(
+        self,
+        job: SummaryJob,
+        state: ConversationSummaryState,
+        messages: List[Dict],
+        previous_summary: Optional[str]
+    ):
+        job.status = "running"
+        conversation_text = format_conversation(messages)
+
+        try:
+            if previous_summary:
+                chain = INCREMENTAL_SUMMARY_PROMPT | summary_llm
+                inputs = {"previous_summary": previous_summary, "new_conversation": conversation_text}
+            else:
+                chain = INITIAL_SUMMARY_PROMPT | summary_llm
+                inputs = {"conversation": conversation_text}
+
+            replayed = replay_stream_lookup("summary")
+            if replayed is not None:
+                async for chunk in replayed:
+                    async with job.condition:
+                        job.chunks.append(chunk)
+                        job.condition.notify_all()
+            elif is_replaying():
+                raise RuntimeError("재생 기록에 요약이 없습니다.")
+            else:
+                started_at = time.perf_counter()
+                async for chunk in chain.astream(inputs):
+                    if chunk.content:
+                        async with job.condition:
+                            job.chunks.append(chunk.content)
+                            job.condition.notify_all()
+                record_upstream("summary", list(job.chunks), time.perf_counter() - started_at)
+
+            job.summary = "".join(job.chunks)
+            job.status = "done"
+            state.summary = job.summary
+            print(f"📝 요약 완료: {job.conversation_id} (+{job.message_count}개 메시지)")
+
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            # 실패한 메시지는 다음 작업에서 다시 요약하도록 되돌립니다.
+            state.pending = messages + state.pending
+            print(f"⚠️ 요약 실패: {job.conversation_id}: {e}")
+
+        finally:
+            async with job.condition:
+                job.condition.notify_all()
+            state.job = None
+
+        # 콜백 오류는 요약 작업의 성패와 별개로 처리합니다. (성공한 요약을 실패로 바꾸거나 다시 요약하지 않음)
+        if job.status == "done" and state.on_complete:
+            try:
+                state.on_complete(job.summary)
+            except Exception as e:
+                print(f"⚠️ 요약 완료 콜백 실패: {job.conversation_id}: {e}")
+
+        if job.status == "done" and state.pending and (state.eager or self._should_trigger(state.pending)):
+            self._start_job(job.conversation_id, state)
+
+    # ---------- 공개 API ----------
+    def submit_new_messages(
+        self,
+        conversation_id: str,
+        messages: List[Dict],
+        previous_summary: Optional[str] = None,
+        force: bool = False,
+        on_complete: Optional[Callable[[str], None]] = None,
+        eager: bool = False
+    ) -> Tuple[Optional[SummaryJob], Optional[str]]:
+        """
+        아직 요약되지 않은 새 메시지를 등록합니다.
+        eager이면 이 대화는 이후에도 대기 메시지가 생기는 대로 (실행 중인 작업이 끝나면 이어서) 요약합니다.
+
+        Returns:
+            (실행 중이거나 새로 시작한 작업 또는 None, 현재까지의 요약)
+        """
+        state = self._state(conversation_id)
+        if state.summary is None:
+            state.summary = previous_summary
+        if on_complete is not None:
+            state.on_complete = on_complete
+        state.eager = state.eager or eager
+
+        state.pending.extend(messages)
+        state.seen_count += len(messages)
+
+        if state.job is not None:
+            # 같은 대화의 요약이 이미 진행 중이면 중복 실행하지 않습니다.
+            return state.job, state.summary
+
+        if state.pending and (force or state.eager or self._should_trigger(state.pending)):
+            return self._start_job(conversation_id, state), state.summary
+
+        return None, state.summary
+
+    def submit_transcript(
+        self,
+        conversation_id: str,
+        messages: List[Dict],
+        previous_summary: Optional[str] = None,
+        force: bool = False
+    ) -> Tuple[Optional[SummaryJob], Optional[str]]:
+        """
+        전체 대화 내역을 받아 이전 호출 이후 추가된 메시지만 요약 대상으로 등록합니다.
+        이전에 본 구간과 앞부분이 다르면 새 대화로 보고 처음부터 다시 누적합니다.
+        이때 실행 중인 작업은 이전 상태에 결과를 남기고 끝나므로 새 대화의 요약/대기 메시지에 섞이지 않습니다.
+        """
+        state = self._state(conversation_id)
+        seen = messages[:state.seen_count]
+
+        if state.seen_count and len(messages) >= state.seen_count and _fingerprint(seen) == state.seen_fingerprint:
+            new_messages = messages[state.seen_count:]
+        else:
+            new_messages = messages
+            self._states[conversation_id] = state = ConversationSummaryState()
+
+        result = self.submit_new_messages(conversation_id, new_messages, previous_summary, force)
+        state.seen_count = len(messages)
+        state.seen_fingerprint = _fingerprint(messages)
+        return result
+
+    def get_job(self, job_id: str) -> Optional[SummaryJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: SummaryJob) -> SummaryJob:
+        """작업이 끝날 때까지 기다립니다."""
+        async with job.condition:
+            await job.condition.wait_for(lambda: job.finished)
+        return job
+
+    async def stream(self, job: SummaryJob) -> AsyncGenerator[str, None]:
+        """작업이 생성하는 요약 텍스트를 처음부터 순서대로 내보냅니다."""
+        index = 0
+        while True:
+            async with job.condition:
+                await job.condition.wait_for(lambda: len(job.chunks) > index or job.finished)
+                new_chunks = job.chunks[index:]
+                finished = job.finished
+            for chunk in new_chunks:
+                yield chunk
+            index += len(new_chunks)
+            if finished and index >= len(job.chunks):
+                return
+
@@ -0,0 +1,138 @@
+"""
+BM25용 한국어 토크나이저
+
+langchain BM25Retriever의 기본 전처리(공백 분리)는 "소득세는"과 "소득세"를 다른 단어로 봅니다.
+여기서는 조사/어미를 떼어내거나 문자 n-gram으로 나누어 색인과 질의를 같은 방식으로 토큰화합니다.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List
+
+
+# 긴 것부터 매칭하도록 정렬 (예: "에서"를 "서"보다 먼저)
+PARTICLES = sorted([
+    "은", "는", "이", "가", "을", "를", "의", "에", "에서", "에게", "께서", "한테",
+    "으로", "로", "으로서", "로서", "으로써", "로써", "와", "과", "도", "만", "까지", "부터",
+    "이나", "나", "이란", "란", "이라", "라", "보다", "처럼", "마다", "에는", "에서는", "으로는",
+    "로는", "과는", "와는", "이며", "이고", "인가요", "인가", "인지", "인데", "나요", "가요",
+    "은가요", "는가요", "습니까", "입니까", "입니다", "이에요", "예요", "에요", "이요", "요",
+    "합니다", "하나요", "한가요", "할까요", "되나요", "됩니까", "되는지", "하는지",
+], key=len, reverse=True)
+PARTICLE_SET = frozenset(PARTICLES)
+
+# 조사와 같은 글자로 끝나는 명사 (조사로 보고 떼면 "재평가"->"재평", "과세연도"->"과세연",
+# "공제한도"->"공제한", "초과"->"초"처럼 다른 단어가 됨)
+# "제도"는 "공제도"(공제 + 도)와 겹치므로 넣지 않습니다.
+NOUN_ENDINGS = {
+    "가": ("평가", "시가", "원가", "대가", "단가", "지가", "주가", "증가", "추가", "부가", "국가", "감가"),
+    "이": ("차이", "사이", "나이"),
+    "도": ("연도", "년도", "한도", "정도", "용도", "지도"),
+    "요": ("필요", "수요", "중요", "주요", "개요"),
+    "과": ("초과", "부과", "결과", "효과", "경과", "통과"),
+    "로": ("근로", "경로", "도로", "통로"),
+    "의": ("협의", "합의", "회의", "결의", "정의", "주의"),
+}
+
+# 토큰화 규칙이 바뀌면 올려서 이전 규칙으로 만든 BM25 캐시를 쓰지 않게 합니다.
+TOKENIZER_VERSION = 3
+
+ARTICLE_PATTERN = re.compile(r"제\s*(\d+)\s*조(?:\s*의\s*(\d+))?")
+TOKEN_PATTERN = re.compile(r"[가-힣]+|[a-z]+|\d+(?:\.\d+)?|제\d+조(?:의\d+)?")
+
+
+def normalize_text(text: str) -> str:
+    """유니코드/대소문자를 정규화하고 조항 번호 표기("제 55 조 의 2")를 "제55조의2"로 통일합니다."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return ARTICLE_PATTERN.sub(
+        lambda m: f"제{m.group(1)}조" + (f"의{m.group(2)}" if m.group(2) else ""),
+        text
+    )
+
+
+def strip_particle(token: str) -> str:
+    """
+    어간이 두 글자 이상 남는 경우에만 끝에 붙은 조사/어미를 떼어냅니다.
+
+    가장 긴 조사/어미 하나만 보고, 어간이 너무 짧으면 더 짧은 조사로 다시 떼지 않습니다.
+    ("되나요"를 "요"로 떼어 "되나"가 되지 않도록) 조사와 같은 글자로 끝나는 명사(NOUN_ENDINGS)는 그대로 둡니다.
+    """
+    for particle in PARTICLES:
+        if not token.endswith(particle):
+            continue
+        if len(token) - len(particle) < 2:
+            return token
+        if token.endswith(NOUN_ENDINGS.get(particle, ())):
+            return token
+        return token[:-len(particle)]
+    return token
+
+
+def _split(text: str) -> List[str]:
+    text = normalize_text(text)
+    tokens = []
+    for article_or_word in re.split(r"(제\d+조(?:의\d+)?)", text):
+        if ARTICLE_PATTERN.fullmatch(article_or_word):
+            tokens.append(article_or_word)
+        else:
+            # 단독으로 쓰인 조사/어미("에서", "되나요")는 버립니다.
+            tokens.extend(
+                token for token in TOKEN_PATTERN.findall(article_or_word)
+                if token not in PARTICLE_SET
+            )
+    return tokens
+
+
+def whitespace_tokenize(text: str) -> List[str]:
+    """langchain 기본 전처리와 동일한 공백 분리"""
+    return text.split()
+
+
+def morpheme_lite_tokenize(text: str) -> List[str]:
+    """조사/어미를 떼어낸 어간 단위 토큰"""
+    return [strip_particle(token) for token in _split(text)]
+
+
+def char_ngram_tokenize(text: str, n: int = 2) -> List[str]:
+    """조사를 뗀 단어를 문자 n-gram으로 나눈 토큰 (조항 번호는 그대로 유지)"""
+    tokens = []
+    for token in morpheme_lite_tokenize(text):
+        if token.startswith("제") and ARTICLE_PATTERN.fullmatch(token) or len(token) <= n:
+            tokens.append(token)
+        else:
+            tokens.extend(token[i:i + n] for i in range(len(token) - n + 1))
+    return tokens
+
+
+TOKENIZERS = {
+    "whitespace": whitespace_tokenize,
+    "morpheme": morpheme_lite_tokenize,
+    "ngram": char_ngram_tokenize,
+}
+
+
+def get_tokenizer(name: str):
+    if name not in TOKENIZERS:
+        raise ValueError(f"지원하지 않는 BM25 토크나이저입니다: {name} (가능: {', '.join(TOKENIZERS)})")
+    return TOKENIZERS[name]
+
+
+@lru_cache(maxsize=4096)
+def _tokenize_query_cached(name: str, text: str) -> tuple:
+    return tuple(TOKENIZERS[name](text))
+
+
+class QueryTokenizer:
+    """
+    BM25Retriever.preprocess_func로 쓰는 질의 토크나이저
+
+    같은 질문이 여러 법률 인덱스에서 반복 토큰화되므로 결과를 메모이즈합니다.
+    pickle로 저장될 수 있도록 토크나이저 이름만 보관합니다.
+    """
+
+    def __init__(self, name: str):
+        get_tokenizer(name)
+        self.name = name
+
+    def __call__(self, text: str) -> List[str]:
+        return list(_tokenize_query_cached(self.name, text))
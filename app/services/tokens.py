@@ -0,0 +1,26 @@
+"""
+토큰 수 계산 유틸
+"""
+from functools import lru_cache
+from typing import Optional
+
+from app.config import settings
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """텍스트의 토큰 수를 계산합니다."""
+    try:
+        return len(_get_encoding(model or settings.MAIN_MODEL).encode(text))
+    except Exception:
+        # 인코딩 파일을 받을 수 없는 환경에서는 대략적인 추정치를 사용합니다.
+        return len(text) // 2
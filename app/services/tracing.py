@@ -0,0 +1,119 @@
+"""
+느린 요청 추적
+
+요청마다 단계별(법률 선택, 검색, 관련성 체크, 웹 검색, 답변 생성) 소요 시간과
+입력 크기, 선택된 법률, 후보 문서 수, 토큰 수를 모으고,
+SLOW_REQUEST_THRESHOLD_MS를 넘긴 요청만 크기가 제한된 링 버퍼에 남깁니다.
+동시 요청의 print 출력이 섞여도 요청 하나의 흐름을 따로 볼 수 있습니다.
+"""
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+
+TRACED_PATHS = ("/ask", "/ask/stream", "/ask/batch", "/summarize")
+
+slow_traces = deque(maxlen=settings.SLOW_TRACE_BUFFER_SIZE)
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("current_trace", default=None)
+
+
+@dataclass
+class RequestTrace:
+    request_id: str
+    method: str
+    path: str
+    started_at: float
+    stages: List[Dict] = field(default_factory=list)
+    fields: Dict = field(default_factory=dict)
+    status_code: Optional[int] = None
+    response_bytes: int = 0
+    total_ms: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# ============================================================
+# 기록 API (추적 중인 요청이 없으면 아무것도 하지 않음)
+# ============================================================
+@contextmanager
+def trace_stage(name: str):
+    """
+    단계 소요 시간을 기록합니다. 반환된 dict에 단계별 정보를 넣으면 함께 저장됩니다.
+
+        with trace_stage("retrieval") as stage:
+            stage["candidates"] = len(docs)
+    """
+    trace = _current_trace.get()
+    stage = {"stage": name}
+    start_time = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        if trace is not None:
+            stage["ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+            trace.stages.append(stage)
+
+
+def annotate_trace(**fields):
+    """요청 단위 정보를 기록합니다. (예: 질문 길이, 대화 기록 수)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def count_trace(**counts):
+    """요청 단위 누적 값을 더합니다. (예: 여러 LLM 호출의 토큰 수)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        for key, value in counts.items():
+            trace.fields[key] = trace.fields.get(key, 0) + (value or 0)
+
+
+# ============================================================
+# ASGI 미들웨어
+# ============================================================
+class SlowRequestTraceMiddleware:
+    """
+    추적 대상 경로의 요청마다 RequestTrace를 만들고, 응답 본문 전송이 끝난 시점까지를
+    전체 시간으로 잽니다. (스트리밍 응답도 마지막 청크까지 포함)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in TRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(
+            request_id=uuid.uuid4().hex[:12],
+            method=scope["method"],
+            path=scope["path"],
+            started_at=time.time(),
+        )
+        start_time = time.perf_counter()
+        token = _current_trace.set(trace)
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                trace.status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                trace.response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            _current_trace.reset(token)
+            trace.total_ms = round((time.perf_counter() - start_time) * 1000, 1)
+            if trace.total_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+                slow_traces.append(trace)
+                print(f"🐢 느린 요청 기록: {trace.path} {trace.total_ms}ms (id={trace.request_id})")
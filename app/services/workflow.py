@@ -2,18 +2,26 @@
 """
 LangGraph 워크플로우
 """
-from typing import List, Literal, AsyncGenerator,Dict,Optional
+import asyncio
+import os
+import re
+import threading
+import time
+from typing import List, Literal, AsyncGenerator,Dict,Optional,Tuple
 from typing_extensions import TypedDict
 
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.tools import TavilySearchResults
-from langgraph.graph import StateGraph, START, END
 from pydantic import BaseModel, Field
 
 from app.config import settings
-from app.services.retriever import get_retriever_parallel
+from app.services.cache import TTLCache, normalize_query
+from app.services.retriever import get_retriever_parallel, get_retriever_batch, aselect_laws, retrieve_from_laws
 from app.services.generator import generate_answer, stream_generate_answer
+from app.services.startup import lazy_import
+from app.services.resilience import Deadline, stage_timeout, call_upstream, acall_upstream
+from app.services.tracing import trace_stage
+from app.services.capture import is_replaying, record_upstream
 
 # ============================================================
 # State 정의
@@ -25,6 +33,7 @@ class AgentState(TypedDict):
     is_web_search: bool
     history: List[Dict]  # 추가
     summary: Optional[str]  # 추가
+    deadline: Optional[Deadline]
 
 # ============================================================
 # 문서 관련성 체크 스키마
@@ -38,7 +47,11 @@ class RelevanceScore(BaseModel):
 # ============================================================
 # 전역 변수
 # ============================================================
+ARTICLE_PATTERN = re.compile(r"제\d+조(?:의\d+)?")
+
 tavily_search_tool = None
+web_search_cache = None
+cancellation_stats = {'cancelled_streams': 0, 'saved_completion_tokens': 0, 'by_stage': {}}
 relevance_chain = None
 graph = None
 
@@ -48,19 +61,62 @@ graph = None
 # ============================================================
 def initialize_web_search():
     """웹 검색 도구를 초기화합니다."""
-    global tavily_search_tool
+    global tavily_search_tool, web_search_cache
     
     print("웹 검색 도구 초기화 중...")
     
+    TavilySearchResults = lazy_import("langchain_community.tools", "TavilySearchResults")
     tavily_search_tool = TavilySearchResults(
         max_results=settings.TAVILY_MAX_RESULTS,
         search_depth=settings.TAVILY_SEARCH_DEPTH,
         include_answer=True,
     )
     
+    web_search_cache = TTLCache(
+        name="web_search",
+        max_entries=settings.WEB_SEARCH_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.WEB_SEARCH_CACHE_TTL_SECONDS,
+        stale_seconds=settings.WEB_SEARCH_CACHE_STALE_SECONDS,
+        db_path=settings.WEB_SEARCH_CACHE_DB_PATH,
+    )
+    
     print("✅ 웹 검색 도구 초기화 완료")
 
 
+def search_web(query: str, deadline: Optional[Deadline] = None):
+    """
+    캐시를 거쳐 웹 검색을 수행합니다. 결과가 있는 경우에만 캐시에 저장합니다.
+    
+    캐시에 없고 웹 검색이 제한 시간을 넘기거나 실패하면(또는 서킷이 열려 있으면) 빈 결과를 반환합니다.
+    """
+    loaded = False
+
+    def load():
+        nonlocal loaded
+        loaded = True
+        return call_upstream(
+            "web_search",
+            lambda: tavily_search_tool.invoke(query),
+            timeout=stage_timeout(deadline, "web_search"),
+            fallback=lambda: []
+        )
+
+    with trace_stage("web_search") as stage:
+        if is_replaying():
+            # 재생은 캐시 상태와 무관하게 기록된 검색 결과를 써야 하므로 캐시를 거치지 않습니다.
+            results = load()
+        else:
+            results = web_search_cache.get_or_load(
+                normalize_query(query),
+                load,
+                should_cache=lambda results: isinstance(results, list) and len(results) > 0
+            )
+            if not loaded:
+                record_upstream("web_search", results, 0)
+        stage["results"] = len(results) if isinstance(results, list) else 0
+    return results
+
+
 # ============================================================
 # 관련성 체크 체인 초기화
 # ============================================================
@@ -99,7 +155,7 @@ def initialize_relevance_chain():
 def retrieve_node(state: AgentState):
     """문서 검색 노드"""
     print(f"\n🔍 문서 검색 중: {state['query']}")
-    docs = get_retriever_parallel(state['query'])
+    docs = get_retriever_parallel(state['query'], state.get('deadline'))
     return {'context': docs, 'is_web_search': False}
 
 
@@ -122,7 +178,7 @@ def web_search(state: AgentState) -> AgentState:
     """웹 검색을 수행합니다."""
     query = state['query']
     print(f"\n🌐 웹 검색 중: {query}")
-    results = tavily_search_tool.invoke(query)
+    results = search_web(query, state.get('deadline'))
     return {'context': results, 'is_web_search': True}
 
 
@@ -144,20 +200,26 @@ def check_doc_relevance(state: AgentState) -> Literal['relevant', 'irrelevant']:
         return 'relevant'
     
     # 3. 문서가 1개일 때만 LLM으로 관련성 체크
-    try:
-        response = relevance_chain.invoke({
-            'question': state['query'], 
-            'documents': context[:3]
-        })
-        
-        result = 'relevant' if response.score == 0 else 'irrelevant'
-        print(f"📊 관련성 점수: {response.score} -> {result}")
-        return result
-        
-    except Exception as e:
-        # 4. 예외 발생 시 문서가 있으면 relevant로 처리 (개선)
-        print(f"⚠️ 관련성 체크 실패: {e} -> 문서 기반 답변 시도")
+    with trace_stage("relevance") as stage:
+        score = call_upstream(
+            "relevance",
+            lambda: relevance_chain.invoke({
+                'question': state['query'], 
+                'documents': context[:3]
+            }).score,
+            timeout=stage_timeout(state.get('deadline'), "relevance"),
+            fallback=lambda: None
+        )
+        stage["score"] = score
+    
+    # 4. 실패하거나 제한 시간을 넘기면 문서가 있으므로 relevant로 처리 (개선)
+    if score is None:
+        print("⚠️ 관련성 체크 실패 -> 문서 기반 답변 시도")
         return 'relevant'
+    
+    result = 'relevant' if score == 0 else 'irrelevant'
+    print(f"📊 관련성 점수: {score} -> {result}")
+    return result
 
 
 # ============================================================
@@ -169,6 +231,9 @@ def build_graph():
     
     print("LangGraph 워크플로우 구축 중...")
     
+    langgraph = lazy_import("langgraph.graph")
+    StateGraph, START, END = langgraph.StateGraph, langgraph.START, langgraph.END
+    
     graph_builder = StateGraph(AgentState)
     
     graph_builder.add_node('retrieve_node', retrieve_node)
@@ -199,7 +264,8 @@ def run_workflow(query: str, history: List[Dict] = None, summary: str = None) ->
     initial_state = {
         "query": query,
         "history": history or [],
-        "summary": summary
+        "summary": summary,
+        "deadline": Deadline()
     }
     result = graph.invoke(initial_state)
     
@@ -209,68 +275,258 @@ def run_workflow(query: str, history: List[Dict] = None, summary: str = None) ->
     }
 
 
-async def stream_workflow(query: str, history: List[Dict] = None, summary: str = None) -> AsyncGenerator[str, None]:
+async def resolve_answer_context(
+    query: str,
+    docs: List[Document],
+    deadline: Optional[Deadline] = None
+) -> Tuple[list, bool]:
     """
-    질문을 스트리밍 방식으로 처리하여 토큰 단위로 답변을 생성합니다.
+    검색된 문서로 답변할지, 웹 검색 결과로 답변할지 결정합니다.
     
-    Args:
-        query: 사용자 질문
+    관련성 체크는 비동기로 호출하므로 요청이 취소되면 LLM 호출도 함께 중단됩니다.
     
-    Yields:
-        생성되는 답변 텍스트 조각
+    Returns:
+        (답변에 사용할 context, 웹 검색 여부)
     """
-    # 1. 문서 검색
-    print(f"\n🔍 문서 검색 중: {query}")
-    docs = get_retriever_parallel(query)
+    if not docs:
+        print("⚠️ 검색된 문서 없음 -> 웹서치")
+        return await asyncio.to_thread(search_web, query, deadline), True
     
-    # 2. 문서 관련성 체크
-    is_web_search = False
-    context = docs
+    if len(docs) >= 2:
+        print(f"✅ 문서 {len(docs)}개 발견 -> 문서 기반 답변")
+        return docs, False
     
-    if not context:
-        print("⚠️ 검색된 문서 없음 -> 웹서치")
-        is_web_search = True
-        context = tavily_search_tool.invoke(query)
-    elif len(context) >= 2:
-        print(f"✅ 문서 {len(context)}개 발견 -> 문서 기반 답변")
+    # 문서가 1개일 때만 관련성 체크
+    async def check_relevance():
+        response = await relevance_chain.ainvoke({
+            'question': query, 
+            'documents': docs[:3]
+        })
+        return response.score
+
+    with trace_stage("relevance") as stage:
+        score = await acall_upstream(
+            "relevance",
+            check_relevance,
+            timeout=stage_timeout(deadline, "relevance"),
+            fallback=lambda: None
+        )
+        stage["score"] = score
+    
+    if score is None:
+        print("⚠️ 관련성 체크 실패 -> 문서 기반 답변 시도")
+    elif score == 1:
+        print("📊 관련성 낮음 -> 웹서치")
+        return await asyncio.to_thread(search_web, query, deadline), True
     else:
-        # 문서가 1개일 때만 관련성 체크
+        print("📊 관련성 충분 -> 문서 기반 답변")
+    
+    return docs, False
+
+
+def document_reference(doc: Document) -> dict:
+    """클라이언트가 답변 생성 전에 표시할 수 있는 문서 출처 정보를 만듭니다."""
+    source = doc.metadata.get('source', '') if doc.metadata else ''
+    articles = list(dict.fromkeys(ARTICLE_PATTERN.findall(doc.page_content)))
+    return {
+        'law': os.path.splitext(os.path.basename(source))[0] or None,
+        'articles': articles[:5],
+        'preview': doc.page_content[:100],
+    }
+
+
+async def stream_workflow_events(
+    query: str,
+    history: List[Dict] = None,
+    summary: str = None,
+    cancel_event: Optional[threading.Event] = None
+) -> AsyncGenerator[dict, None]:
+    """
+    질문을 처리하면서 단계별 진행 상황을 이벤트로 내보냅니다.
+    
+    클라이언트 연결이 끊겨 제너레이터가 취소되거나 닫히면 cancel_event를 설정하여
+    스레드에서 실행 중인 검색 작업에도 중단을 알리고, 진행 중인 LLM 스트림은 함께 닫힙니다.
+    
+    Yields:
+        {'event': 이벤트 이름, 'data': 내용} 형식의 이벤트
+        - start: 요청 수신 직후
+        - laws: 선택된 법률
+        - references: 검색된 문서의 법률/조항 정보
+        - web_search: 웹 검색으로 대체한 경우
+        - token: 답변 텍스트 조각
+        - done: 단계별 시간(요청 시작부터의 누적 ms)과 웹 검색 여부
+    """
+    cancel_event = cancel_event or threading.Event()
+    deadline = Deadline()
+    start_time = time.perf_counter()
+    timings = {}
+    stage = 'law_selection'
+    generated_chunks = 0
+    
+    def mark(name: str):
+        timings[name] = round((time.perf_counter() - start_time) * 1000, 1)
+    
+    try:
+        yield {'event': 'start', 'data': {'question': query}}
+        
+        # 1. 법률 선택
+        print(f"\n🔍 문서 검색 중: {query}")
         try:
-            response = relevance_chain.invoke({
-                'question': query, 
-                'documents': context[:3]
-            })
-            
-            if response.score == 1:
-                print("📊 관련성 낮음 -> 웹서치")
-                is_web_search = True
-                context = tavily_search_tool.invoke(query)
-            else:
-                print("📊 관련성 충분 -> 문서 기반 답변")
+            laws = await aselect_laws(query, deadline)
+        except Exception as e:
+            print(f"⚠️ 검색 오류: {e}")
+            laws = []
+        mark('law_selection_ms')
+        yield {'event': 'laws', 'data': {'laws': laws}}
+        
+        # 2. 문서 검색
+        stage = 'retrieval'
+        try:
+            docs = await asyncio.to_thread(retrieve_from_laws, query, laws, cancel_event, deadline)
         except Exception as e:
-            print(f"⚠️ 관련성 체크 실패: {e} -> 문서 기반 답변 시도")
+            print(f"⚠️ 검색 오류: {e}")
+            docs = []
+        mark('retrieval_ms')
+        yield {'event': 'references', 'data': {'references': [document_reference(doc) for doc in docs]}}
+        
+        # 3. 문서 관련성 체크
+        stage = 'relevance'
+        context, is_web_search = await resolve_answer_context(query, docs, deadline)
+        mark('relevance_ms')
+        if is_web_search:
+            results = context if isinstance(context, list) else []
+            yield {'event': 'web_search', 'data': {
+                'reason': 'no_documents' if not docs else 'low_relevance',
+                'urls': [result.get('url') for result in results if isinstance(result, dict)],
+            }}
+        
+        # 4. 스트리밍 답변 생성
+        stage = 'generation'
+        print(f"\n✏️ 답변 생성 중 (웹검색: {is_web_search})")
+        
+        if not context:
+            yield {'event': 'token', 'data': {'delta': "관련 정보를 찾을 수 없습니다."}}
+        else:
+            answer_stream = stream_generate_answer(query, context, is_web_search, history, summary)
+            try:
+                async for chunk in answer_stream:
+                    if 'first_token_ms' not in timings:
+                        mark('first_token_ms')
+                    generated_chunks += 1
+                    yield {'event': 'token', 'data': {'delta': chunk}}
+            finally:
+                await answer_stream.aclose()
+        
+        stage = 'done'
+        mark('total_ms')
+        yield {'event': 'done', 'data': {'is_web_search': is_web_search, 'timings': timings}}
+    
+    except (asyncio.CancelledError, GeneratorExit):
+        if stage != 'done':
+            cancel_event.set()
+            record_cancellation(stage, generated_chunks)
+        raise
+
+
+def record_cancellation(stage: str, generated_chunks: int):
+    """클라이언트 이탈로 중단된 스트림과 생성하지 않아도 된 토큰 수(추정)를 기록합니다."""
+    # OpenAI 스트림은 대체로 청크 하나가 토큰 하나이므로 MAX_TOKENS까지 남은 양을 절약분으로 봅니다.
+    # 답변 생성이 시작되기 전(첫 청크 전)에 끊기면 생성 요청 자체가 없었으므로 절약분으로 세지 않습니다.
+    saved_tokens = max(settings.MAX_TOKENS - generated_chunks, 0) if generated_chunks else 0
+    cancellation_stats['cancelled_streams'] += 1
+    cancellation_stats['saved_completion_tokens'] += saved_tokens
+    cancellation_stats['by_stage'][stage] = cancellation_stats['by_stage'].get(stage, 0) + 1
+    print(f"🛑 클라이언트 연결 종료 -> {stage} 단계에서 중단 (절약 토큰 약 {saved_tokens}개)")
+
+
+async def stream_workflow(
+    query: str,
+    history: List[Dict] = None,
+    summary: str = None,
+    cancel_event: Optional[threading.Event] = None
+) -> AsyncGenerator[str, None]:
+    """
+    질문을 스트리밍 방식으로 처리하여 토큰 단위로 답변을 생성합니다.
     
-    # 3. 스트리밍 답변 생성
-    print(f"\n✏️ 답변 생성 중 (웹검색: {is_web_search})")
+    Args:
+        query: 사용자 질문
     
-    if not context:
-        yield "관련 정보를 찾을 수 없습니다."
-        return
+    Yields:
+        생성되는 답변 텍스트 조각
+    """
+    events = stream_workflow_events(query, history, summary, cancel_event)
+    try:
+        async for event in events:
+            if event['event'] == 'token':
+                yield event['data']['delta']
+    finally:
+        await events.aclose()
+
+async def run_batch_workflow(queries: List[str]) -> AsyncGenerator[dict, None]:
+    """
+    여러 질문을 한꺼번에 처리하고, 답변이 완료되는 순서대로 결과를 내보냅니다.
     
-    async for chunk in stream_generate_answer(query, context, is_web_search, history, summary):
-        yield chunk
+    검색(법률 선택, 임베딩, 인덱스 검색)은 질문 전체를 묶어 한 번에 수행하고,
+    답변 생성은 BATCH_MAX_CONCURRENCY개까지 동시에 실행합니다.
+    검색과 관련성 체크/웹 검색은 /ask와 같은 요청 시간 예산(Deadline)으로 제한합니다.
+    """
+    start_time = time.time()
+    deadline = Deadline()
+    batch_docs = await asyncio.to_thread(get_retriever_batch, queries, deadline)
+    print(f"✅ 배치 검색 완료: {time.time() - start_time:.2f}초")
+    
+    semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+    
+    async def answer_one(query: str, docs: List[Document]) -> dict:
+        context, is_web_search = await resolve_answer_context(query, docs, deadline)
+        if not context:
+            return {'answer': "관련 정보를 찾을 수 없습니다.", 'is_web_search': is_web_search}
+        return {
+            'answer': await asyncio.to_thread(generate_answer, query, context, is_web_search),
+            'is_web_search': is_web_search
+        }
+    
+    async def run_one(index: int, query: str, docs: List[Document]) -> dict:
+        async with semaphore:
+            result = {'index': index, 'question': query}
+            try:
+                result.update(await answer_one(query, docs))
+            except Exception as e:
+                print(f"⚠️ 배치 답변 실패 ({index}): {e}")
+                result.update({'answer': None, 'is_web_search': False, 'error': str(e)})
+            result['elapsed_time'] = round(time.time() - start_time, 2)
+            return result
+    
+    tasks = [
+        asyncio.create_task(run_one(index, query, docs))
+        for index, (query, docs) in enumerate(zip(queries, batch_docs))
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
 
 # ============================================================
 # 초기화 함수
 # ============================================================
 def initialize_workflow():
-    """워크플로우를 초기화합니다."""
-    initialize_web_search()
+    """
+    LLM에 의존하는 체인을 초기화합니다.
+    
+    웹 검색 도구와 그래프는 startup.initialize_services()에서 다른 단계와 동시에 준비되며,
+    여기서는 아직 준비되지 않은 경우에만 만듭니다.
+    """
+    if tavily_search_tool is None:
+        initialize_web_search()
     initialize_relevance_chain()
     
     # retriever_chain 초기화 (LLM 의존)
     from app.services.retriever import setup_retriever_chain
     setup_retriever_chain()
     
-    build_graph()
+    if graph is None:
+        build_graph()
     print("✅ 워크플로우 초기화 완료\n")
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+
+# Settings는 API 키가 없으면 만들어지지 않으므로 테스트용 값을 넣어 둡니다. (실제 호출은 하지 않음)
+for key in ("OPENAI_API_KEY", "UPSTAGE_API_KEY", "TAVILY_API_KEY"):
+    os.environ.setdefault(key, "test")
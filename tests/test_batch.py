@@ -0,0 +1,54 @@
+"""
+/ask/batch 테스트 (검색/답변 생성은 가짜로 바꾸고 결과 순서와 부분 실패 처리를 확인)
+"""
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from app.routes import rag_router
+from app.services import workflow
+
+
+QUESTIONS = ["느린 질문", "실패하는 질문", "빠른 질문"]
+
+
+def _client(monkeypatch):
+    docs = [Document(page_content="문서 1"), Document(page_content="문서 2")]
+    monkeypatch.setattr(workflow, "get_retriever_batch", lambda queries, deadline=None: [docs for _ in queries])
+
+    def fake_generate(query, context, is_web_search):
+        if query == "느린 질문":
+            time.sleep(0.3)
+        if query == "실패하는 질문":
+            raise RuntimeError("LLM 오류")
+        return f"{query} 답변"
+
+    monkeypatch.setattr(workflow, "generate_answer", fake_generate)
+    app = FastAPI()
+    app.include_router(rag_router)
+    return TestClient(app)
+
+
+def test_batch_streams_in_completion_order_with_request_index(monkeypatch):
+    response = _client(monkeypatch).post("/ask/batch", json={"questions": QUESTIONS})
+
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    assert results[-1]["index"] == 0  # 느린 질문이 마지막에 끝남
+    for result in results:
+        assert result["question"] == QUESTIONS[result["index"]]
+
+
+def test_batch_reports_partial_failure_per_item(monkeypatch):
+    response = _client(monkeypatch).post("/ask/batch", json={"questions": QUESTIONS})
+
+    results = {result["index"]: result for result in map(json.loads, response.text.splitlines())}
+    assert results[1]["answer"] is None
+    assert results[1]["error"] == "LLM 오류"
+    assert results[0]["answer"] == "느린 질문 답변"
+    assert results[2]["answer"] == "빠른 질문 답변"
+    assert results[2]["error"] is None
@@ -0,0 +1,34 @@
+import threading
+
+from app.services.cache import TTLCache
+
+
+def test_counters_are_exact_under_concurrency():
+    cache = TTLCache(name="test", max_entries=10)
+    cache.set("hit", 1)
+
+    def worker():
+        for _ in range(2000):
+            cache.get("hit")
+            cache.get("miss")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["hits"] == 16000
+    assert stats["misses"] == 16000
+
+
+def test_get_or_load_counts_stale_hits():
+    cache = TTLCache(name="test", max_entries=10, ttl_seconds=0, stale_seconds=3600)
+    cache.set("key", "old")
+
+    assert cache.get_or_load("key", lambda: "new") == "old"
+    assert cache.get("key") is not None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["stale_hits"], stats["misses"]) == (1, 1, 0)
@@ -0,0 +1,199 @@
+"""
+트래픽 캡처 -> 재생 왕복 테스트
+
+캡처 단계에서는 가짜 LLM/업스트림으로 응답을 만들고,
+재생 단계에서는 모든 업스트림을 호출하면 실패하도록 바꾼 뒤 같은 응답이 나오는지 확인합니다.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from app.config import settings
+from app.routes import rag_router
+from app.routes import rag
+from app.services import capture, generator, session, summarization
+from app.services.replay import build_replay_request
+from app.services.resilience import acall_upstream, call_upstream
+
+
+CONTEXT = [Document(page_content="소득세법 제55조 세율 규정", metadata={"source": "income-tax-act.pdf"})]
+
+
+class UpstreamCalls:
+    def __init__(self):
+        self.count = 0
+        self.blocked = False
+
+    def __call__(self, query):
+        if self.blocked:
+            raise AssertionError("재생 중 업스트림 호출")
+        self.count += 1
+        return ["income-tax-act"]
+
+
+def _blocked_llm():
+    def fail(_):
+        raise AssertionError("재생 중 LLM 호출")
+    return RunnableLambda(fail)
+
+
+@pytest.fixture
+def harness(tmp_path, monkeypatch):
+    capture_path = tmp_path / "traffic.jsonl"
+    monkeypatch.setattr(settings, "CAPTURE_ENABLED", True)
+    monkeypatch.setattr(settings, "CAPTURE_PATH", str(capture_path))
+    monkeypatch.setattr(settings, "CAPTURE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "REPLAY_LOG_PATH", None)
+    monkeypatch.setattr(capture, "_replay_records", None)
+
+    llm = FakeListChatModel(responses=["세율은 6~45%입니다."])
+    monkeypatch.setattr(generator, "llm", llm)
+    monkeypatch.setattr(generator, "search_llm", llm)
+    monkeypatch.setattr(summarization, "summary_llm", FakeListChatModel(responses=["소득세 세율 질문 요약"]))
+    monkeypatch.setattr(summarization, "summary_job_manager", summarization.SummaryJobManager(
+        trigger_messages=settings.SUMMARY_TRIGGER_MESSAGES,
+        trigger_tokens=settings.SUMMARY_TRIGGER_TOKENS,
+        max_entries=settings.SUMMARY_MAX_ENTRIES,
+    ))
+    monkeypatch.setattr(session, "session_store", session.SessionStore(
+        max_sessions=100, ttl_seconds=3600, max_history_messages=6
+    ))
+
+    upstream = UpstreamCalls()
+
+    def fake_run_workflow(query, history=None, summary=None):
+        call_upstream("law_selection", lambda: upstream(query), timeout=5, fallback=lambda: [])
+        answer = generator.generate_answer(query, CONTEXT, False, history, summary)
+        return {"answer": answer, "is_web_search": False}
+
+    async def fake_stream_workflow(query, history=None, summary=None, cancel_event=None):
+        async def select():
+            return upstream(query)
+        await acall_upstream("law_selection", select, timeout=5, fallback=lambda: [])
+        async for chunk in generator.stream_generate_answer(query, CONTEXT, False, history, summary):
+            yield chunk
+
+    monkeypatch.setattr(rag, "run_workflow", fake_run_workflow)
+    monkeypatch.setattr(rag, "stream_workflow", fake_stream_workflow)
+
+    app = FastAPI()
+    app.add_middleware(capture.TrafficCaptureMiddleware)
+    app.include_router(rag_router)
+
+    def start_replay():
+        upstream.blocked = True
+        monkeypatch.setattr(generator, "llm", _blocked_llm())
+        monkeypatch.setattr(generator, "search_llm", _blocked_llm())
+        monkeypatch.setattr(summarization, "summary_llm", _blocked_llm())
+        monkeypatch.setattr(settings, "CAPTURE_ENABLED", False)
+        monkeypatch.setattr(settings, "REPLAY_LOG_PATH", str(capture_path))
+
+    return app, capture_path, upstream, start_replay
+
+
+def _wait_for_records(path, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists():
+            records = capture.load_capture_log(str(path))
+            if len(records) >= count:
+                return records
+        time.sleep(0.02)
+    raise AssertionError(f"기록 {count}건이 저장되지 않았습니다.")
+
+
+def _replay(client, record):
+    headers = {capture.REPLAY_HEADER.decode(): record["capture_id"]}
+    return client.post(record["path"], json=build_replay_request(record), headers=headers)
+
+
+def test_ask_round_trip(harness):
+    app, capture_path, upstream, start_replay = harness
+    with TestClient(app) as client:
+        captured = client.post("/ask", json={"question": "소득세 세율은? 010-1234-5678"}).json()
+        record, = _wait_for_records(capture_path, 1)
+
+        assert record["request"]["question"] == "소득세 세율은? <전화번호>"
+        assert record["upstream"]["law_selection"][0]["response"] == ["income-tax-act"]
+        assert upstream.count == 1
+
+        start_replay()
+        replayed = _replay(client, record).json()
+
+    assert replayed["answer"] == captured["answer"]
+
+
+def test_ask_stream_round_trip(harness):
+    app, capture_path, upstream, start_replay = harness
+    with TestClient(app) as client:
+        captured = client.post("/ask/stream", json={"question": "소득세 세율은?"}).text
+        record, = _wait_for_records(capture_path, 1)
+        assert "".join(record["upstream"]["generation"][0]["response"]) == captured
+
+        start_replay()
+        replayed = _replay(client, record).text
+
+    assert replayed == captured
+
+
+def test_session_ask_replays_recorded_context(harness):
+    app, capture_path, upstream, start_replay = harness
+    session.session_store.append_turn("room-1", "이전 질문", "이전 답변")
+    with TestClient(app) as client:
+        client.post("/ask", json={"question": "아까 그거 세율은?", "session_id": "room-1"})
+        record, = _wait_for_records(capture_path, 1)
+
+        assert record["request"]["session_id"] != "room-1"
+        assert [m["content"] for m in record["context"]["history"]] == ["이전 질문", "이전 답변"]
+
+        body = build_replay_request(record)
+        assert "session_id" not in body
+        assert body["history"] == record["context"]["history"]
+
+        sessions_before = len(session.session_store._sessions)
+        start_replay()
+        assert _replay(client, record).status_code == 200
+
+    # 재생은 세션을 새로 만들거나 기록하지 않습니다.
+    assert len(session.session_store._sessions) == sessions_before
+
+
+def test_summarize_round_trip_waits_for_background_job(harness):
+    app, capture_path, upstream, start_replay = harness
+    messages = [
+        {"role": "user", "content": "소득세율은?"},
+        {"role": "assistant", "content": "6~45%입니다."},
+    ]
+    with TestClient(app) as client:
+        response = client.post("/summarize", json={"messages": messages}).json()
+        # 기본 호출은 요약이 끝나기 전에 응답합니다.
+        assert response["job_id"] is not None
+
+        record, = _wait_for_records(capture_path, 1)
+        assert "".join(record["upstream"]["summary"][0]["response"]) == "소득세 세율 질문 요약"
+        assert record["completed_ms"] >= record["latency_ms"]
+
+        start_replay()
+        replayed = _replay(client, record).json()
+
+    assert replayed["status"] == "done"
+    assert replayed["summary"] == "소득세 세율 질문 요약"
+
+
+def test_replay_tool_imports_without_api_keys():
+    env = {key: value for key, value in os.environ.items() if not key.endswith("_API_KEY")}
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, app.services.replay; assert 'app.config' not in sys.modules"],
+        env=env, capture_output=True, text=True
+    )
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.routes import admin_router
+from app.services import cascade
+
+
+def _doc(law: str) -> Document:
+    return Document(page_content="세율은 다음과 같다.", metadata={"source": f"{law}.pdf"})
+
+
+def test_law_count_uses_only_prompt_context(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CONTEXT_DOCS", 2)
+    context = [_doc("income-tax-act"), _doc("income-tax-act"), _doc("value-added-tax-act")]
+
+    assert cascade.extract_features("소득세율은?", context)["law_count"] == 1
+
+
+def test_cascade_log_does_not_store_raw_question(monkeypatch):
+    monkeypatch.setattr(settings, "CASCADE_ENABLED", True)
+    monkeypatch.setattr(cascade, "cascade_log", cascade.deque(maxlen=10))
+    query = "홍길동 010-1234-5678 소득세율은?"
+
+    decision = cascade.choose_answer_model(query, [_doc("income-tax-act")])
+    cascade.record_cascade_result(decision, query, 0.0, 10)
+
+    entry = cascade.cascade_log[-1]
+    assert query not in str(entry)
+    assert len(entry["question_hash"]) == 16
+
+
+@pytest.fixture
+def cascade_on(monkeypatch):
+    monkeypatch.setattr(settings, "CASCADE_ENABLED", True)
+    monkeypatch.setattr(settings, "MAIN_MODEL", "main-model")
+    monkeypatch.setattr(settings, "SEARCH_MODEL", "light-model")
+    monkeypatch.setattr(cascade, "cascade_log", cascade.deque(maxlen=10))
+    monkeypatch.setattr(cascade, "cascade_stats", {"main": 0, "light": 0})
+
+
+@pytest.mark.parametrize("query, context, history, model, reason", [
+    ("세율은?", [_doc("income-tax-act"), _doc("value-added-tax-act")], None, "main-model", "multi_law"),
+    ("소득세와 부가세 차이는?", [_doc("income-tax-act")], None, "main-model", "complex_keyword"),
+    ("아까 그거 세율은?", [_doc("income-tax-act")], [{"role": "user", "content": "소득세"}], "main-model", "follow_up"),
+    ("제55조 세율은?", [Document(page_content="제55조(세율) 거주자의 종합소득", metadata={"source": "income-tax-act.pdf"})],
+     None, "light-model", "direct_article_hit"),
+    ("세율은?", [_doc("income-tax-act")], None, "light-model", "short_high_coverage"),
+    ("종합소득이 있는 거주자가 해외에서 받은 배당소득은 어떻게 과세되고 외국납부세액은 어떻게 처리되나요?",
+     [_doc("income-tax-act")], None, "main-model", "default"),
+])
+def test_choose_answer_model_routes_by_features(cascade_on, query, context, history, model, reason):
+    decision = cascade.choose_answer_model(query, context, history)
+
+    assert (decision.model, decision.reason) == (model, reason)
+    assert cascade.cascade_stats["light" if model == "light-model" else "main"] == 1
+
+
+def test_follow_up_words_without_history_are_not_follow_up(cascade_on):
+    decision = cascade.choose_answer_model("아까 그거 세율은?", [_doc("income-tax-act")])
+
+    assert decision.reason != "follow_up"
+
+
+def test_disabled_cascade_always_uses_main_model(monkeypatch):
+    monkeypatch.setattr(settings, "CASCADE_ENABLED", False)
+
+    decision = cascade.choose_answer_model("세율은?", [_doc("income-tax-act")])
+
+    assert (decision.model, decision.reason) == (settings.MAIN_MODEL, "cascade_disabled")
+
+
+def test_admin_cascade_exposes_stats_and_recent_decisions(cascade_on, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    for query in ("세율은?", "소득세와 부가세 차이는?"):
+        decision = cascade.choose_answer_model(query, [_doc("income-tax-act")])
+        cascade.record_cascade_result(decision, query, time.perf_counter(), 10)
+    app = FastAPI()
+    app.include_router(admin_router)
+    client = TestClient(app)
+
+    assert client.get("/admin/cascade").status_code == 403
+    body = client.get("/admin/cascade", headers={"X-Admin-Token": "secret"}).json()
+
+    assert body["counts"] == {"main": 1, "light": 1}
+    assert body["by_reason"]["light-model:short_high_coverage"]["count"] == 1
+    assert [d["reason"] for d in body["decisions"]] == ["complex_keyword", "short_high_coverage"]
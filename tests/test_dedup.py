@@ -0,0 +1,39 @@
+import sys
+
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services import dedup
+
+
+TEXT = "거주자의 종합소득에 대한 소득세는 해당 연도의 종합소득과세표준에 다음의 세율을 적용하여 계산한다."
+
+
+def test_simhash_imports_numpy_lazily():
+    assert dedup.simhash(TEXT) == dedup.simhash(TEXT + " ")
+    assert "np" not in vars(dedup)
+    assert "numpy" in sys.modules
+
+
+def test_collapse_keeps_first_of_near_duplicates(monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    docs = [
+        Document(page_content=TEXT, metadata={"source": "income-tax-act"}),
+        Document(page_content=f"<p>{TEXT}</p>", metadata={"source": "corporation_income"}),
+        Document(page_content="부가가치세의 세율은 10퍼센트로 한다.", metadata={"source": "value-added-tax-act"}),
+    ]
+
+    unique_docs = dedup.collapse_near_duplicates(docs)
+
+    assert [doc.metadata["source"] for doc in unique_docs] == ["income-tax-act", "value-added-tax-act"]
+
+
+def test_signature_cache_is_keyed_by_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BM25_CACHE_DIR", str(tmp_path))
+    old_docs = [Document(page_content=TEXT)]
+    new_docs = [Document(page_content="부가가치세의 세율은 10퍼센트로 한다.")]
+
+    dedup.load_signatures("law", old_docs)
+    signatures = dedup.load_signatures("law", new_docs)
+
+    assert signatures == [dedup.simhash(new_docs[0].page_content)]
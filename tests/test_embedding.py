@@ -0,0 +1,104 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from langchain_upstage import UpstageEmbeddings
+
+from app.services.embedding import QueryEmbeddingBatcher, embed_query_batch
+
+
+class FakeEmbeddingClient:
+    """입력마다 [글자 수, 호출 순번] 벡터를 돌려주는 가짜 Upstage 임베딩 클라이언트 (응답 순서는 뒤집어서 반환)"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def create(self, input, **params):
+        with self._lock:
+            self.calls.append((list(input), params))
+        if self.fail:
+            raise RuntimeError("embedding down")
+        data = [SimpleNamespace(index=i, embedding=[float(len(text)), float(i)]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+def _embedding(client, **kwargs) -> UpstageEmbeddings:
+    embedding = UpstageEmbeddings(upstage_api_key="test", **{"model": "solar-embedding-1-large", **kwargs})
+    embedding.client = client
+    return embedding
+
+
+# ============================================================
+# 배치 요청
+# ============================================================
+def test_batch_uses_wrapped_model_and_kwargs():
+    client = FakeEmbeddingClient()
+    embedding = _embedding(client, model="custom-embedding-passage", model_kwargs={"user": "tester"})
+
+    embed_query_batch(embedding, ["소득세율은?"])
+
+    assert client.calls[0][1] == {"model": "custom-embedding-query", "user": "tester"}
+
+
+def test_batch_splits_into_api_sized_chunks_and_keeps_order():
+    client = FakeEmbeddingClient()
+    queries = [f"질문{i}" for i in range(150)]
+
+    vectors = embed_query_batch(_embedding(client), queries)
+
+    assert [len(inputs) for inputs, _ in client.calls] == [100, 50]
+    assert [vector[1] for vector in vectors] == [float(i) for i in range(100)] + [float(i) for i in range(50)]
+
+
+# ============================================================
+# 마이크로 배치
+# ============================================================
+def test_concurrent_queries_are_coalesced_and_split_back():
+    client = FakeEmbeddingClient()
+    batcher = QueryEmbeddingBatcher(_embedding(client), max_batch_size=10, max_wait_ms=200)
+    queries = ["소득세율은?", "부가세율은?", "소득세율은?", "법인세율은 얼마인가요?"]
+
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        vectors = list(executor.map(batcher.embed_query, queries))
+
+    assert len(client.calls) == 1
+    assert client.calls[0][0] == ["소득세율은?", "부가세율은?", "법인세율은 얼마인가요?"]
+    assert vectors == [[6.0, 0.0], [6.0, 1.0], [6.0, 0.0], [12.0, 2.0]]
+    assert batcher.stats() == {"batches_sent": 1, "queries_embedded": 4}
+
+
+def test_single_query_is_flushed_after_max_wait():
+    client = FakeEmbeddingClient()
+    batcher = QueryEmbeddingBatcher(_embedding(client), max_batch_size=10, max_wait_ms=50)
+
+    started = time.monotonic()
+    vector = batcher.embed_query("소득세율은?")
+
+    assert vector == [6.0, 0.0]
+    assert 0.04 <= time.monotonic() - started < 1
+
+
+def test_full_batch_is_sent_without_waiting():
+    client = FakeEmbeddingClient()
+    batcher = QueryEmbeddingBatcher(_embedding(client), max_batch_size=2, max_wait_ms=10_000)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(batcher.embed_query, ["소득세율은?", "부가세율은?"]))
+
+    assert time.monotonic() - started < 1
+    assert len(client.calls) == 1
+
+
+def test_batch_failure_is_raised_to_every_caller():
+    batcher = QueryEmbeddingBatcher(_embedding(FakeEmbeddingClient(fail=True)), max_batch_size=10, max_wait_ms=100)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(batcher.embed_query, query) for query in ("소득세율은?", "부가세율은?")]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="embedding down"):
+                future.result()
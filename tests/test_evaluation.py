@@ -0,0 +1,50 @@
+from langchain_core.documents import Document
+
+from app.services import evaluation
+
+
+def _config(max_context_docs: int) -> evaluation.EvalConfig:
+    return evaluation.EvalConfig(
+        top_k_vector=2, top_k_bm25=2, vector_weight=0.6, bm25_weight=0.4,
+        max_docs_limit=8, max_context_docs=max_context_docs, context_char_limit=600,
+    )
+
+
+def test_recall_at_k_and_tokens_follow_max_context_docs(monkeypatch):
+    item = evaluation.EvalQuestion(question="소득세 세율은?", expected_law="income-tax-act", expected_article="제55조")
+    ranked = [("value-added-tax-act", Document(page_content=f"부가가치세 문서 {i}")) for i in range(3)]
+    ranked.append(("income-tax-act", Document(page_content="제55조 세율")))
+    monkeypatch.setattr(evaluation, "retrieve_for_config", lambda *args: ranked)
+    cache = {"routes": {item.question: ["income-tax-act"]}, "embeddings": {item.question: [0.0]}}
+
+    narrow = evaluation.evaluate_config([item], cache, _config(2))
+    wide = evaluation.evaluate_config([item], cache, _config(4))
+
+    assert (narrow.recall_at_k, wide.recall_at_k) == (0.0, 1.0)
+    assert narrow.avg_prompt_tokens < wide.avg_prompt_tokens
+
+
+def test_build_configs_sweeps_max_context_docs():
+    args = evaluation.parse_args(["--max-context-docs", "2,4", "--context-char-limit", "400,600"])
+
+    configs = evaluation.build_configs(args)
+
+    assert {(c.max_context_docs, c.context_char_limit) for c in configs} == {(2, 400), (2, 600), (4, 400), (4, 600)}
+
+
+def test_retrieve_for_config_ranks_by_score_and_collapses_near_duplicates(monkeypatch):
+    from app.config import settings
+    from app.services import retriever
+
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    text = "거주자의 종합소득에 대한 소득세는 해당 연도의 종합소득과세표준에 다음의 세율을 적용하여 계산한다."
+    results = {
+        "corporation_income": [(Document(page_content=f"<p>{text}</p>"), 0.2), (Document(page_content="법인세 세율"), 0.1)],
+        "income-tax-act": [(Document(page_content=text), 0.5)],
+    }
+    monkeypatch.setattr(retriever, "rank_single_law_by_vector", lambda law_name, *args, **kwargs: results[law_name])
+    item = evaluation.EvalQuestion(question="소득세 세율은?", expected_law="income-tax-act")
+
+    ranked = evaluation.retrieve_for_config(item, ["corporation_income", "income-tax-act"], [0.0], _config(4))
+
+    assert [(law, doc.page_content) for law, doc in ranked] == [("income-tax-act", text), ("corporation_income", "법인세 세율")]
@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, acall_upstream, call_upstream
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(resilience, "circuit_breakers", {})
+    monkeypatch.setattr(resilience, "latency_trackers", {})
+    monkeypatch.setattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "CIRCUIT_RESET_SECONDS", 0.05)
+
+
+def _fail():
+    raise RuntimeError("upstream down")
+
+
+def _open(name: str):
+    for _ in range(settings.CIRCUIT_FAILURE_THRESHOLD):
+        call_upstream(name, _fail, timeout=1, fallback=lambda: "fallback")
+    assert resilience.circuit_breakers[name].state == "open"
+
+
+# ============================================================
+# 서킷 브레이커 상태
+# ============================================================
+def test_breaker_opens_after_threshold_and_closes_after_successful_trial():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # 시험 호출은 하나만
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_seconds=0.05)
+    for _ in range(5):
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_open_breaker_short_circuits_without_calling():
+    _open("svc")
+    calls = []
+
+    result = call_upstream("svc", lambda: calls.append(1) or "ok", timeout=1, fallback=lambda: "fallback")
+
+    assert result == "fallback"
+    assert calls == []
+    assert resilience.circuit_breakers["svc"].short_circuited == 1
+
+
+def test_exhausted_deadline_does_not_strand_half_open_breaker():
+    _open("svc")
+    time.sleep(0.06)
+
+    assert call_upstream("svc", lambda: "ok", timeout=0, fallback=lambda: "fallback") == "fallback"
+    assert resilience.circuit_breakers["svc"].state == "open"
+
+    assert call_upstream("svc", lambda: "ok", timeout=5, fallback=lambda: "fallback") == "ok"
+    assert resilience.circuit_breakers["svc"].state == "closed"
+
+
+def test_cancelled_async_trial_releases_half_open_breaker():
+    _open("svc")
+    time.sleep(0.06)
+
+    async def slow():
+        await asyncio.sleep(10)
+        return "late"
+
+    async def fast():
+        return "ok"
+
+    async def scenario():
+        trial = asyncio.create_task(acall_upstream("svc", slow, timeout=5, fallback=lambda: "fallback"))
+        await asyncio.sleep(0.01)
+        assert resilience.circuit_breakers["svc"].state == "half_open"
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert resilience.circuit_breakers["svc"].state == "open"
+        return await acall_upstream("svc", fast, timeout=5, fallback=lambda: "fallback")
+
+    assert asyncio.run(scenario()) == "ok"
+    assert resilience.circuit_breakers["svc"].state == "closed"
+
+
+def test_timeout_counts_as_failure():
+    result = call_upstream("svc", lambda: time.sleep(0.2) or "late", timeout=0.02, fallback=lambda: "fallback")
+
+    assert result == "fallback"
+    assert resilience.circuit_breakers["svc"].failures == 1
+
+
+# ============================================================
+# 헤지 요청
+# ============================================================
+def _warm_tracker(name: str, seconds: float):
+    resilience.get_breaker(name)
+    for _ in range(settings.HEDGE_MIN_SAMPLES):
+        resilience.latency_trackers[name].record(seconds)
+
+
+def test_hedge_sends_second_call_when_first_is_slow(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", True)
+    _warm_tracker("svc", 0.01)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "hedged"
+
+    result = call_upstream("svc", fn, timeout=2, fallback=lambda: "fallback", hedge=True)
+
+    assert result == "hedged"
+    assert len(calls) == 2
+    assert resilience.latency_trackers["svc"].hedged == 1
+
+
+def test_async_hedge_uses_first_response(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", True)
+    _warm_tracker("svc", 0.01)
+    calls = []
+
+    async def make_call():
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(0.5)
+            return "slow"
+        return "hedged"
+
+    result = asyncio.run(acall_upstream("svc", make_call, timeout=2, fallback=lambda: "fallback", hedge=True))
+
+    assert result == "hedged"
+    assert resilience.latency_trackers["svc"].hedged == 1
+
+
+def test_no_hedge_without_enough_samples(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", True)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.05)
+        return "ok"
+
+    assert call_upstream("svc", fn, timeout=2, fallback=lambda: "fallback", hedge=True) == "ok"
+    assert len(calls) == 1
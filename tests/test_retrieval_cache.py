@@ -0,0 +1,66 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services import retrieval_cache, retriever
+
+
+DOC = Document(page_content="소득세법 제55조 세율 규정", metadata={"source": "income-tax-act"})
+NEW_DOC = Document(page_content="개정된 소득세법 제55조 세율 규정", metadata={"source": "income-tax-act"})
+
+
+@pytest.fixture(autouse=True)
+def clean_cache(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_CACHE_ENABLED", True)
+    retrieval_cache.bump_index_generation("테스트 초기화", [])
+    yield
+    retrieval_cache.bump_index_generation("테스트 정리", [])
+
+
+def test_index_reload_invalidates_results_and_prunes_registry():
+    key = retrieval_cache.retrieval_cache_key("소득세율은?", ["income-tax-act"])
+    retrieval_cache.store_retrieval(key, [(DOC, 0.5)])
+    assert retrieval_cache.get_cached_retrieval(key) == [DOC]
+
+    retrieval_cache.bump_index_generation("재로드", [NEW_DOC])
+
+    assert retrieval_cache.get_cached_retrieval(key) is None
+    assert retrieval_cache.retrieval_cache_key("소득세율은?", ["income-tax-act"]) != key
+    assert list(retrieval_cache.document_registry) == [retrieval_cache.document_id(NEW_DOC)]
+
+
+def test_vector_store_reload_keeps_registry_untouched():
+    retrieval_cache.bump_index_generation("BM25 로드", [DOC])
+    registered = retrieval_cache.document_registry[retrieval_cache.document_id(DOC)]
+    key = retrieval_cache.retrieval_cache_key("소득세율은?", ["income-tax-act"])
+    retrieval_cache.store_retrieval(key, [(DOC, 0.5)])
+
+    retrieval_cache.bump_index_generation("벡터스토어 로드")
+
+    assert retrieval_cache.get_cached_retrieval(key) is None
+    assert retrieval_cache.document_registry[retrieval_cache.document_id(DOC)] is registered
+
+
+def test_results_from_previous_generation_are_not_stored():
+    key = retrieval_cache.retrieval_cache_key("소득세율은?", ["income-tax-act"])
+    retrieval_cache.bump_index_generation("검색 도중 재로드")
+
+    retrieval_cache.store_retrieval(key, [(DOC, 0.5)])
+
+    assert retrieval_cache.retrieval_cache.stats()["entries"] == 0
+    assert retrieval_cache.document_registry == {}
+
+
+@pytest.mark.parametrize("query_vector, ranked, cached", [
+    ([0.1, 0.2], [(DOC, 0.5)], True),
+    (None, [(DOC, 0.5)], False),   # 임베딩 실패 (BM25만 사용)
+    ([0.1, 0.2], None, False),     # 법률 검색 실패
+])
+def test_only_complete_retrievals_are_cached(monkeypatch, query_vector, ranked, cached):
+    monkeypatch.setattr(retriever, "embed_query_guarded", lambda query, deadline=None: query_vector)
+    monkeypatch.setattr(retriever, "safe_rank_single_law", lambda law, query, vector: ranked)
+
+    retriever.retrieve_from_laws("소득세율은?", ["income-tax-act"])
+
+    key = retrieval_cache.retrieval_cache_key("소득세율은?", ["income-tax-act"])
+    assert (retrieval_cache.get_cached_retrieval(key) is not None) == cached
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.routes import rag
+from app.schemas import AskRequest
+from app.services import session, summarization
+from app.services.session import SessionStore
+
+
+def test_evicts_expired_sessions_regardless_of_lru_order():
+    store = SessionStore(max_sessions=10, ttl_seconds=60, max_history_messages=6)
+    store.create("idle")
+    store.create("active")
+    # "idle"을 조회해 LRU 맨 뒤로 옮긴 뒤 시간이 지나 만료된 상황
+    store.get("idle")
+    store._sessions["idle"].updated_at = time.time() - 120
+
+    store.create("new")
+
+    assert "idle" not in store._sessions
+    assert list(store._sessions) == ["active", "new"]
+
+
+def test_resolve_context_returns_a_copy_of_session_history(monkeypatch):
+    store = SessionStore(max_sessions=10, ttl_seconds=60, max_history_messages=6)
+    monkeypatch.setattr(session, "session_store", store)
+    store.append_turn("s", "소득세율은?", "6~45%입니다.")
+
+    history, _ = rag.resolve_context(AskRequest(question="부가세율은?", session_id="s"))
+    store.append_turn("s", "부가세율은?", "10%입니다.")
+
+    assert len(history) == 2
+    assert len(store.get("s").history) == 4
+
+
+def test_overflow_is_summarized_without_waiting_for_trigger(monkeypatch):
+    store = SessionStore(max_sessions=10, ttl_seconds=60, max_history_messages=2)
+    manager = summarization.SummaryJobManager(trigger_messages=100, trigger_tokens=100000, max_entries=10)
+    monkeypatch.setattr(session, "session_store", store)
+    monkeypatch.setattr(summarization, "summary_job_manager", manager)
+    monkeypatch.setattr(summarization, "summary_llm", FakeListChatModel(responses=["소득세율 요약", "부가세율 요약"]))
+
+    async def scenario():
+        store.append_turn("s", "소득세율은?", "6~45%입니다.")
+        session.summarize_session_overflow("s", store.append_turn("s", "부가세율은?", "10%입니다."))
+        first_job = manager._states["s"].job
+        # 첫 요약이 도는 동안 밀려난 메시지도 기준(100개)을 기다리지 않고 이어서 요약
+        session.summarize_session_overflow("s", store.append_turn("s", "법인세율은?", "9~24%입니다."))
+        await manager.wait(first_job)
+        await manager.wait(manager._states["s"].job)
+
+    asyncio.run(scenario())
+
+    assert manager._states["s"].pending == []
+    assert store.get("s").summary == "부가세율 요약"
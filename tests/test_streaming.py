@@ -0,0 +1,68 @@
+import asyncio
+
+from app.config import settings
+from app.routes.rag import stop_on_disconnect
+from app.services import workflow
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after: int):
+        self.checks = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self) -> bool:
+        self.checks += 1
+        return self.checks > self.disconnect_after
+
+
+async def _chunks(count: int):
+    for i in range(count):
+        yield i
+
+
+def _collect(request, count):
+    async def run():
+        return [item async for item in stop_on_disconnect(request, _chunks(count))]
+    return asyncio.run(run())
+
+
+def test_disconnect_is_polled_on_an_interval(monkeypatch):
+    monkeypatch.setattr(settings, "DISCONNECT_POLL_INTERVAL_SECONDS", 60)
+    request = FakeRequest(disconnect_after=0)
+
+    assert _collect(request, 100) == list(range(100))
+    assert request.checks == 0
+
+
+def test_stream_stops_after_disconnect(monkeypatch):
+    monkeypatch.setattr(settings, "DISCONNECT_POLL_INTERVAL_SECONDS", 0.01)
+    request = FakeRequest(disconnect_after=3)
+    closed = []
+
+    async def stalled():
+        # 두 항목을 보낸 뒤 검색/첫 토큰을 기다리듯 멈춘 스트림
+        try:
+            yield 0
+            yield 1
+            await asyncio.sleep(60)
+            yield 2
+        finally:
+            closed.append(True)
+
+    async def run():
+        return [item async for item in stop_on_disconnect(request, stalled())]
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=5)) == [0, 1]
+    assert closed == [True]
+    assert request.checks == 4
+
+
+def test_cancellation_before_generation_saves_no_tokens(monkeypatch):
+    monkeypatch.setattr(workflow, "cancellation_stats", {'cancelled_streams': 0, 'saved_completion_tokens': 0, 'by_stage': {}})
+
+    workflow.record_cancellation("retrieval", 0)
+    assert workflow.cancellation_stats['saved_completion_tokens'] == 0
+
+    workflow.record_cancellation("generation", 10)
+    assert workflow.cancellation_stats['saved_completion_tokens'] == settings.MAX_TOKENS - 10
+    assert workflow.cancellation_stats['cancelled_streams'] == 2
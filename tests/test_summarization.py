@@ -0,0 +1,79 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.routes import rag_router
+from app.services import summarization
+
+
+def _messages(*contents):
+    return [{"role": "user", "content": content} for content in contents]
+
+
+def test_transcript_reset_while_job_running_does_not_resummarize(monkeypatch):
+    monkeypatch.setattr(summarization, "summary_llm", FakeListChatModel(responses=["이전 대화 요약", "새 대화 요약"]))
+    manager = summarization.SummaryJobManager(trigger_messages=100, trigger_tokens=100000, max_entries=10)
+
+    async def scenario():
+        first_job, _ = manager.submit_transcript("room", _messages("소득세율은?", "부가세는?"), force=True)
+        # 첫 작업이 끝나기 전에 앞부분이 다른 대화(새 대화)가 들어옴
+        second_job, _ = manager.submit_transcript("room", _messages("법인세율은?"), force=True)
+        await manager.wait(first_job)
+        await manager.wait(second_job)
+        return first_job, second_job
+
+    first_job, second_job = asyncio.run(scenario())
+
+    state = manager._states["room"]
+    assert second_job is not first_job
+    assert second_job.message_count == 1
+    assert state.pending == []
+    assert state.seen_count == 1
+    assert state.summary == second_job.summary
+
+
+def test_transcript_only_submits_new_messages():
+    manager = summarization.SummaryJobManager(trigger_messages=100, trigger_tokens=100000, max_entries=10)
+    messages = _messages("소득세율은?", "부가세는?")
+
+    manager.submit_transcript("room", messages)
+    manager.submit_transcript("room", messages + _messages("법인세는?"))
+
+    state = manager._states["room"]
+    assert state.pending == messages + _messages("법인세는?")
+    assert state.seen_count == 3
+
+
+def test_failing_callback_does_not_fail_a_successful_job(monkeypatch):
+    monkeypatch.setattr(summarization, "summary_llm", FakeListChatModel(responses=["소득세율 요약"]))
+    manager = summarization.SummaryJobManager(trigger_messages=100, trigger_tokens=100000, max_entries=10)
+
+    def on_complete(summary):
+        raise RuntimeError("세션 저장 실패")
+
+    async def scenario():
+        job, _ = manager.submit_new_messages("room", _messages("소득세율은?"), force=True, on_complete=on_complete)
+        return await manager.wait(job)
+
+    job = asyncio.run(scenario())
+
+    assert job.status == "done"
+    assert job.summary == "소득세율 요약"
+    assert manager._states["room"].pending == []
+
+
+def test_summarize_without_conversation_id_returns_the_summary(monkeypatch):
+    monkeypatch.setattr(summarization, "summary_llm", FakeListChatModel(responses=["소득세율 요약"]))
+    monkeypatch.setattr(
+        summarization, "summary_job_manager",
+        summarization.SummaryJobManager(trigger_messages=100, trigger_tokens=100000, max_entries=10)
+    )
+    app = FastAPI()
+    app.include_router(rag_router)
+
+    response = TestClient(app).post("/summarize", json={"messages": _messages("소득세율은?")})
+
+    assert response.json()["status"] == "done"
+    assert response.json()["summary"] == "소득세율 요약"
@@ -0,0 +1,51 @@
+import pytest
+
+from app.services.tokenizer import char_ngram_tokenize, morpheme_lite_tokenize, strip_particle
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("소득세는", "소득세"),
+    ("과세표준에서", "과세표준"),
+    ("세액이", "세액"),
+    ("평가가", "평가"),
+    ("재평가", "재평가"),
+    ("공시가", "공시가"),
+    ("되나요", "되나요"),
+    ("세금", "세금"),
+    ("과세연도", "과세연도"),
+    ("귀속년도", "귀속년도"),
+    ("공제한도", "공제한도"),
+    ("과세연도도", "과세연도"),
+    ("공제한도는", "공제한도"),
+    ("세액공제도", "세액공제"),
+    ("필요", "필요"),
+    ("기준초과", "기준초과"),
+    ("일용근로", "일용근로"),
+    ("세율이요", "세율"),
+])
+def test_strip_particle(token, expected):
+    assert strip_particle(token) == expected
+
+
+def test_morpheme_keeps_nouns_ending_in_particle_like_syllables():
+    assert morpheme_lite_tokenize("재평가 대상인가요") == ["재평가", "대상"]
+    assert morpheme_lite_tokenize("공시가는 얼마") == ["공시가", "얼마"]
+
+
+def test_morpheme_drops_standalone_particles():
+    assert morpheme_lite_tokenize("서울 에서 납부") == ["서울", "납부"]
+    assert morpheme_lite_tokenize("종합소득세 신고가 되나요") == ["종합소득세", "신고"]
+
+
+def test_morpheme_normalizes_article_numbers():
+    assert morpheme_lite_tokenize("제 55 조 의 2에서 정한") == ["제55조의2", "정한"]
+
+
+def test_ngram_keeps_articles_and_short_tokens():
+    assert char_ngram_tokenize("제55조 세액을") == ["제55조", "세액"]
+    assert char_ngram_tokenize("소득세는") == ["소득", "득세"]
+
+
+def test_morpheme_keeps_tax_terms_ending_in_particle_like_syllables():
+    assert morpheme_lite_tokenize("해당 과세연도의 공제한도 초과액") == ["해당", "과세연도", "공제한도", "초과액"]
+    assert morpheme_lite_tokenize("기부금 한도초과 이월공제도 되나요") == ["기부금", "한도초과", "이월공제"]